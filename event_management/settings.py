@@ -32,7 +32,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'events.metrics.RequestMetricsMiddleware',
+    'events.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'events.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -43,6 +46,16 @@ MIDDLEWARE = [
 
 AUTH_USER_MODEL = 'events.CustomUser'
 
+# last_login is written at most this often (seconds) per user
+LAST_LOGIN_UPDATE_INTERVAL = 60 * 60
+# Login, signup and password-reset POSTs are rate limited by token buckets in
+# the cache (events.throttle); THROTTLE_LIMITS overrides the per-scope
+# (bucket, capacity, period) tuples. Set THROTTLE_PROXY_COUNT to the number of
+# reverse proxies so the client address is read from X-Forwarded-For. The
+# allowed/rejected counters are served at /metrics/ whether or not
+# REQUEST_METRICS is on.
+THROTTLE_PROXY_COUNT = config('THROTTLE_PROXY_COUNT', default=0, cast=int)
+
 ROOT_URLCONF = 'event_management.urls'
 
 TEMPLATES = [
@@ -64,6 +77,43 @@ TEMPLATES = [
 WSGI_APPLICATION = 'event_management.wsgi.application'
 
 
+# Cache
+# CACHE_BACKEND is "locmem", "file" or a dotted backend path; CACHE_LOCATION
+# is the locmem name, the file cache directory or the backend's server URL
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': config(
+            'CACHE_LOCATION',
+            default=str(BASE_DIR / 'cache') if CACHE_BACKEND == 'file' else 'event-management',
+        ),
+    }
+}
+# Rendered event rows and cards; keys are versioned, so this only bounds memory
+FRAGMENT_CACHE_TIMEOUT = config('FRAGMENT_CACHE_TIMEOUT', default=24 * 60 * 60, cast=int)
+
+# With a cache every worker shares, sessions, the signed-in user and their
+# roles are read from it (written through to the database). The locmem cache
+# is per process, so one worker would keep serving a session or role that
+# another had already changed: the database is used instead (see
+# events.checks).
+SHARED_CACHE = CACHE_BACKEND != 'locmem'
+SESSION_ENGINE = config(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.cached_db' if SHARED_CACHE else 'django.contrib.sessions.backends.db',
+)
+AUTHENTICATION_BACKENDS = [
+    'events.auth.CachedModelBackend' if SHARED_CACHE else 'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = 300
+ROLE_CACHE_TIMEOUT = 300 if SHARED_CACHE else 0
+
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -82,6 +132,17 @@ DATABASES = {
     )
 }
 
+# Optional read replica. Views marked replica_reads read from it, except for
+# visitors who wrote in the last REPLICA_STICKY_SECONDS. Tests mirror it onto
+# the primary.
+REPLICA_DATABASE_ALIAS = 'replica'
+REPLICA_DATABASE_URL = config('REPLICA_DATABASE_URL', default='')
+if REPLICA_DATABASE_URL:
+    DATABASES[REPLICA_DATABASE_ALIAS] = dj_database_url.parse(REPLICA_DATABASE_URL, conn_max_age=600)
+    DATABASES[REPLICA_DATABASE_ALIAS]['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['events.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -122,6 +183,14 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
 
+# collectstatic fingerprints and precompresses into STATIC_ROOT, which
+# events.staticfiles.StaticFilesMiddleware then serves
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'events.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -143,4 +212,25 @@ FRONTEND_URL = 'https://event-management-94bf.onrender.com'
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+# Images are served by events.views.media_file; '' sends them from Python,
+# 'x-accel-redirect' (nginx, internal location MEDIA_SENDFILE_PREFIX aliased
+# to MEDIA_ROOT) or 'x-sendfile' (Apache/lighttpd) offloads the body
+MEDIA_SENDFILE = config('MEDIA_SENDFILE', default='')
+MEDIA_SENDFILE_PREFIX = config('MEDIA_SENDFILE_PREFIX', default='/protected-media/')
+MEDIA_MAX_AGE = 30 * 24 * 60 * 60
+# Served files' size and mtime; a per-process cache misses the invalidation
+# done by other workers and build_image_variants, so keeps them only briefly
+MEDIA_METADATA_TIMEOUT = 60 * 60 if SHARED_CACHE else 60
+
+# Uploaded images are resized into WebP/JPEG variants by a background worker
+# pool; views taking images cap their size with events.images.limit_image_uploads
+MAX_IMAGE_UPLOAD_SIZE = 5 * 1024 * 1024
+IMAGE_VARIANT_WIDTHS = (64, 128, 256, 512, 1024)
+IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
+IMAGE_VARIANTS_ASYNC = True
+
+# Per-view SQL/template timing, Server-Timing headers and their histograms at
+# /metrics/ (admins, or a bearer METRICS_TOKEN)
+REQUEST_METRICS = config('REQUEST_METRICS', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
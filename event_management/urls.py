@@ -1,12 +1,19 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from events.views import media_file
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('events.urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Served by the app in every environment; set MEDIA_SENDFILE to let the
+# front-end server send the bytes
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns.append(
+        re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media_file, name='media-file'),
+    )
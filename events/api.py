@@ -0,0 +1,185 @@
+import base64
+import datetime
+import json
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Category, Deletion, Event
+from .pagination import keyset_filter
+
+API_PAGE_SIZE = getattr(settings, 'API_PAGE_SIZE', 100)
+API_MAX_PAGE_SIZE = getattr(settings, 'API_MAX_PAGE_SIZE', 5000)
+# Tombstones are kept this long; a client that last synced earlier must
+# fetch its collections in full again
+API_DELETION_RETENTION_DAYS = getattr(settings, 'API_DELETION_RETENTION_DAYS', 30)
+CHUNK_SIZE = 2000
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    """
+    A read-only API collection: public field names mapped to the columns
+    they are read from, plus optional per-field conversions. Rows are read
+    with ``values_list`` of just the requested columns, so no model
+    instances are built. ``changed_field`` is the timestamp delta sync
+    filters and walks on, along its ``(changed_field, id)`` index.
+    """
+
+    def __init__(self, model, fields, default_fields, ordering, convert=None, changed_field='updated_at'):
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.ordering = tuple(ordering)
+        self.convert = convert or {}
+        self.changed_field = changed_field
+        self.sync_ordering = (changed_field, 'id')
+
+    def parse_fields(self, value):
+        """Return the requested field names, or raise ``ValueError`` for unknown ones."""
+        if not value:
+            return list(self.default_fields)
+        names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown) or value}.")
+        return names
+
+
+EVENTS = Resource(
+    Event,
+    fields={
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'date': 'date',
+        'time': 'time',
+        'location': 'location',
+        'category': 'category_id',
+        'category_name': 'category__name',
+        'image': 'image',
+        'capacity': 'capacity',
+        'rsvp_count': 'rsvp_count',
+        'updated_at': 'updated_at',
+    },
+    default_fields=['id', 'name', 'date', 'time', 'location', 'category', 'capacity', 'rsvp_count', 'updated_at'],
+    ordering=('date', 'time', 'id'),
+    convert={'image': image_url},
+)
+
+CATEGORIES = Resource(
+    Category,
+    fields={
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'updated_at': 'updated_at',
+    },
+    default_fields=['id', 'name', 'description', 'updated_at'],
+    ordering=('name', 'id'),
+)
+
+# Ids removed from a collection, for delta sync: apply a tombstone when it
+# is newer than the row's updated_at (an RSVP may have been made again)
+DELETIONS = Resource(
+    Deletion,
+    fields={
+        'id': 'object_id',
+        'deleted_at': 'deleted_at',
+    },
+    default_fields=['id', 'deleted_at'],
+    ordering=('deleted_at', 'id'),
+    changed_field='deleted_at',
+)
+
+
+def record_deletions(kind, object_ids, user_id=None):
+    Deletion.objects.bulk_create([
+        Deletion(kind=kind, object_id=object_id, user_id=user_id) for object_id in object_ids
+    ])
+
+
+def prune_deletions(now=None):
+    """Delete tombstones past the retention window; returns how many."""
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=API_DELETION_RETENTION_DAYS)
+    return Deletion.objects.filter(deleted_at__lt=cutoff).delete()[0]
+
+
+class ApiQueryForm(forms.Form):
+    fields = forms.CharField(required=False)
+    cursor = forms.CharField(required=False)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=API_MAX_PAGE_SIZE)
+    updated_since = forms.DateTimeField(required=False)
+
+
+class ApiJSONEncoder(DjangoJSONEncoder):
+    """Keeps microseconds, so ``updated_at`` values round-trip into ``updated_since`` and cursors."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            value = o.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return super().default(o)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=ApiJSONEncoder, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(model, ordering, cursor):
+    """Return the ordering values in ``cursor``, or raise ``ValueError``."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode((cursor + '=' * (-len(cursor) % 4)).encode()))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError
+        return [model._meta.get_field(name).to_python(value) for name, value in zip(ordering, values)]
+    except (ValueError, TypeError, ValidationError):
+        raise ValueError("Invalid cursor.")
+
+
+def page_rows(resource, queryset, names, ordering, cursor_values, limit):
+    """
+    Build the page query: ``limit + 1`` rows of the requested columns plus
+    the ordering columns needed for the next cursor.
+    """
+    if cursor_values is not None:
+        queryset = queryset.filter(keyset_filter(ordering, cursor_values))
+    columns = [resource.fields[name] for name in names]
+    columns += [name for name in ordering if name not in columns]
+    rows = queryset.order_by(*ordering).values_list(*columns)[:limit + 1]
+    return rows, columns
+
+
+def stream_page(resource, rows, columns, names, ordering, limit):
+    """
+    Yield ``{"data": [...], "next_cursor": ...}`` one row at a time, read
+    with a single streaming query.
+    """
+    encoder = ApiJSONEncoder(separators=(',', ':'))
+    converters = [resource.convert.get(name) for name in names]
+    positions = [columns.index(name) for name in ordering]
+    count = len(names)
+    yield '{"data":['
+    last = None
+    for index, row in enumerate(rows.iterator(chunk_size=CHUNK_SIZE)):
+        if index == limit:
+            break
+        item = {
+            name: convert(value) if convert else value
+            for name, convert, value in zip(names, converters, row[:count])
+        }
+        yield (',' if index else '') + encoder.encode(item)
+        last = row
+    else:
+        # Ran out of rows before the limit: this is the last page
+        last = None
+    next_cursor = encode_cursor([last[position] for position in positions]) if last is not None else None
+    yield '],"next_cursor":' + encoder.encode(next_cursor) + '}'
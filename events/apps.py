@@ -6,4 +6,5 @@ class EventsConfig(AppConfig):
     name = 'events'
 
     def ready(self):
+        import events.checks
         import events.signals
\ No newline at end of file
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.utils import timezone
+
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 300)
+LAST_LOGIN_UPDATE_INTERVAL = getattr(settings, 'LAST_LOGIN_UPDATE_INTERVAL', 60 * 60)
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_users(user_ids):
+    """Drop cached user rows; called whenever a user is saved, updated or deleted."""
+    user_ids = list(user_ids)
+    if user_ids:
+        cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` whose ``get_user``/``aget_user`` -- run by
+    ``AuthenticationMiddleware`` on every authenticated request -- read the
+    user row from the cache.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # Used by request.auser() in async views
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, USER_CACHE_TIMEOUT)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+def update_last_login(sender, user, **kwargs):
+    """
+    Replacement for Django's ``update_last_login`` that records a sign-in at
+    most once per ``LAST_LOGIN_UPDATE_INTERVAL``, with an ``UPDATE`` of the
+    one column rather than a full ``save()``.
+    """
+    now = timezone.now()
+    if user.last_login and now - user.last_login < timedelta(seconds=LAST_LOGIN_UPDATE_INTERVAL):
+        return
+    user.last_login = now
+    type(user)._default_manager.filter(pk=user.pk).update(last_login=now)
+    invalidate_users([user.pk])
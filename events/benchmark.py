@@ -0,0 +1,338 @@
+import asyncio
+import gc
+import json
+import math
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import NoReverseMatch, get_resolver, reverse
+
+from . import feeds, recurrence
+from .models import Category, Event, EventSeries
+from .roles import ORGANIZER, PARTICIPANT
+from .urls import urlpatterns
+
+User = get_user_model()
+
+ROLES = ('anonymous', 'participant', 'organizer', 'admin')
+
+# Routes whose GET changes state, is refused (POST only) or needs a one-off token
+SKIP_ROUTES = {
+    'logout', 'activate', 'password_reset_confirm', 'rsvp-event', 'cancel-rsvp',
+    'event-delete', 'category-delete', 'participant-delete', 'group-delete', 'series-delete',
+    'occurrence-rsvp', 'occurrence-cancel-rsvp',
+}
+
+# Named in the project URLconf rather than events.urls
+PROJECT_ROUTES = {'media-file'}
+
+DEFAULT_THRESHOLDS = {
+    'max_query_increase': 0,
+    'max_latency_ratio': 1.5,
+    'min_latency_delta_ms': 5.0,
+    'max_memory_ratio': 1.5,
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def role_users():
+    """Pick one existing account per role to make the requests as."""
+    return {
+        'anonymous': None,
+        'participant': User.objects.filter(groups__name=PARTICIPANT, is_superuser=False).order_by('id').first(),
+        'organizer': User.objects.filter(groups__name=ORGANIZER, is_superuser=False).order_by('id').first(),
+        'admin': User.objects.filter(is_superuser=True).order_by('id').first(),
+    }
+
+
+def first_occurrence(series_id):
+    """The first date ``series_id``'s rule produces within a year of its start."""
+    series = EventSeries.objects.filter(pk=series_id).first()
+    if series is None:
+        return None
+    day = next(recurrence.rule_dates(series, series.start_date, series.start_date + timedelta(days=366)), None)
+    return day.isoformat() if day else None
+
+
+def sample_values(users):
+    """Ids and tokens of existing rows, keyed by what the URL parameters name."""
+    participant = users.get('participant')
+    series_id = EventSeries.objects.order_by('id').values_list('id', flat=True).first()
+    return {
+        'event': Event.objects.order_by('id').values_list('id', flat=True).first(),
+        'series': series_id,
+        'category': Category.objects.order_by('id').values_list('id', flat=True).first(),
+        'participant': participant.pk if participant else None,
+        'group': Group.objects.order_by('id').values_list('id', flat=True).first(),
+        'day': first_occurrence(series_id),
+        'token': feeds.feed_token(participant.pk) if participant else None,
+        'path': Event.objects.exclude(image='').order_by('id').values_list('image', flat=True).first(),
+    }
+
+
+def sample_kwargs(name, pattern, samples):
+    """Fill a route's URL parameters from ``samples``, or ``None`` if one can't be filled."""
+    kwargs = {}
+    for param in pattern.pattern.regex.groupindex:
+        if param == 'id':
+            value = next((value for prefix, value in samples.items() if name.startswith(prefix)), None)
+        elif param.endswith('_id'):
+            value = samples.get(param[:-len('_id')])
+        else:
+            value = samples.get(param)
+        if value is None:
+            return None
+        kwargs[param] = value
+    return kwargs
+
+
+def benchmark_routes():
+    """Yield (name, pattern) for every named GET route in ``events.urls``, plus media."""
+    project = [pattern for pattern in get_resolver().url_patterns if getattr(pattern, 'name', None) in PROJECT_ROUTES]
+    for pattern in [*urlpatterns, *project]:
+        if pattern.name and pattern.name not in SKIP_ROUTES:
+            yield pattern.name, pattern
+
+
+def measure(client, url, iterations):
+    def fetch():
+        response = client.get(url)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    # Count through an execute wrapper: the request_started signal clears
+    # connection.queries, which confuses CaptureQueriesContext across requests
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    # Warm caches so the numbers reflect steady state
+    response = fetch()
+    timings = []
+    for _ in range(iterations):
+        queries.clear()
+        with connection.execute_wrapper(count_query):
+            start = time.perf_counter()
+            response = fetch()
+            timings.append((time.perf_counter() - start) * 1000)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fetch()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'queries': len(queries),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run(iterations=20, roles=ROLES, routes=None, skipped=None):
+    """
+    Request every route as every role and return a dict keyed by
+    ``"<route>|<role>"`` with status, query count, p50/p95 latency and peak
+    Python memory. Routes whose parameters can't be filled from existing
+    rows are left out and, if ``skipped`` is a list, appended to it.
+    """
+    users = role_users()
+    samples = sample_values(users)
+    urls = {}
+    for name, pattern in benchmark_routes():
+        if routes and name not in routes:
+            continue
+        kwargs = sample_kwargs(name, pattern, samples)
+        try:
+            urls[name] = reverse(name, kwargs=kwargs) if kwargs is not None else None
+        except NoReverseMatch:
+            urls[name] = None
+    if skipped is not None:
+        skipped.extend(name for name, url in urls.items() if url is None)
+
+    results = {}
+    for role in roles:
+        client = Client()
+        if users.get(role):
+            client.force_login(users[role])
+        elif role != 'anonymous':
+            continue
+        for name, url in urls.items():
+            if url is not None:
+                results[f'{name}|{role}'] = measure(client, url, iterations)
+    return results
+
+
+def compare(results, baseline, thresholds=None):
+    """Return a list of human-readable regressions of ``results`` against ``baseline``."""
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    regressions = []
+    for key, current in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current['status'] != previous['status']:
+            regressions.append(f"{key}: status {previous['status']} -> {current['status']}")
+        if current['queries'] - previous['queries'] > thresholds['max_query_increase']:
+            regressions.append(f"{key}: queries {previous['queries']} -> {current['queries']}")
+        latency_delta = current['p95_ms'] - previous['p95_ms']
+        if (latency_delta > thresholds['min_latency_delta_ms']
+                and current['p95_ms'] > previous['p95_ms'] * thresholds['max_latency_ratio']):
+            regressions.append(f"{key}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if previous['peak_kb'] and current['peak_kb'] > previous['peak_kb'] * thresholds['max_memory_ratio']:
+            regressions.append(f"{key}: peak memory {previous['peak_kb']}KB -> {current['peak_kb']}KB")
+    return regressions
+
+
+def save(results, path):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def _summary(timings, errors, elapsed):
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'rps': round(len(timings) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(timings, 0.5), 3) if timings else 0.0,
+        'p95_ms': round(percentile(timings, 0.95), 3) if timings else 0.0,
+    }
+
+
+def wsgi_throughput(urls, user=None, concurrency=16, requests=200):
+    """
+    Drive the WSGI handler from ``concurrency`` threads, the way a threaded
+    WSGI server does, and return throughput and latency for ``requests``
+    requests spread round-robin over ``urls``.
+    """
+    local = threading.local()
+    lock = threading.Lock()
+    timings, errors = [], [0]
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = Client()
+            if user:
+                local.client.force_login(user)
+        return local.client
+
+    def fetch(index):
+        start = time.perf_counter()
+        response = client().get(urls[index % len(urls)])
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            timings.append(elapsed)
+            errors[0] += response.status_code >= 500
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fetch, range(requests)))
+    return _summary(timings, errors[0], time.perf_counter() - start)
+
+
+def asgi_throughput(urls, user=None, concurrency=16, requests=200):
+    """Same load through the ASGI handler: ``concurrency`` tasks on one event loop."""
+    async def main():
+        queue = asyncio.Queue()
+        for index in range(requests):
+            queue.put_nowait(urls[index % len(urls)])
+        timings, errors = [], 0
+
+        async def worker():
+            nonlocal errors
+            client = AsyncClient()
+            if user:
+                await client.aforce_login(user)
+            while not queue.empty():
+                url = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+                errors += response.status_code >= 500
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return _summary(timings, errors, time.perf_counter() - start)
+
+    return asyncio.run(main())
+
+
+def compare_deployments(urls, user=None, concurrency=16, requests=200):
+    """Run the same concurrent load through both handlers and return both summaries."""
+    # One warm-up pass so neither side pays for cold caches
+    wsgi_throughput(urls, user, concurrency=1, requests=len(urls))
+    return {
+        'wsgi': wsgi_throughput(urls, user, concurrency, requests),
+        'asgi': asgi_throughput(urls, user, concurrency, requests),
+    }
+
+
+STATIC_ENCODINGS = ('identity', 'gzip', 'br')
+
+
+def fetch_static(client, url, encoding, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+        chunks = iter(response.streaming_content) if response.streaming else iter([response.content])
+        first = next(chunks, b'')
+        timings.append((time.perf_counter() - start) * 1000)
+        size = len(first) + sum(len(chunk) for chunk in chunks)
+        response.close()
+    return {
+        'url': url,
+        'status': response.status_code,
+        'served': response.get('Content-Encoding', 'identity'),
+        'bytes': size,
+        'ttfb_p50_ms': round(percentile(timings, 0.5), 3),
+        'ttfb_p95_ms': round(percentile(timings, 0.95), 3),
+        'cache_control': response.get('Cache-Control', ''),
+    }
+
+
+def static_transfer(names, iterations=50):
+    """
+    Bytes on the wire and time to first byte per static asset, as served by
+    ``StaticFilesMiddleware``. ``before`` is the plain file name without
+    compression, as it was served previously; the other rows fetch the
+    fingerprinted name once per ``Accept-Encoding``. ``Cache-Control``
+    is recorded too: it decides whether repeat visits fetch the file at all.
+    """
+    client = Client()
+    results = {}
+    for name in names:
+        hashed_url = staticfiles_storage.base_url + staticfiles_storage.stored_name(name)
+        rows = {'before': fetch_static(client, staticfiles_storage.base_url + name, 'identity', iterations)}
+        for encoding in STATIC_ENCODINGS:
+            rows[encoding] = fetch_static(client, hashed_url, encoding, iterations)
+        results[name] = rows
+    return results
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+CACHE_BACKED_SESSIONS = ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db')
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Sessions and cached users need a cache every worker shares: with the
+    per-process locmem cache a logout, password change or role change in
+    one worker goes unseen by the others.
+    """
+    if not isinstance(caches['default'], LocMemCache):
+        return []
+    errors = []
+    if settings.SESSION_ENGINE in CACHE_BACKED_SESSIONS:
+        errors.append(Error(
+            f"SESSION_ENGINE {settings.SESSION_ENGINE!r} needs a shared cache, not locmem.",
+            hint="Configure CACHE_BACKEND (e.g. redis or memcached) or use the 'db' session engine.",
+            id='events.E001',
+        ))
+    if 'events.auth.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS:
+        errors.append(Error(
+            "events.auth.CachedModelBackend needs a shared cache, not locmem.",
+            hint="Configure CACHE_BACKEND (e.g. redis or memcached) or use ModelBackend.",
+            id='events.E002',
+        ))
+    return errors
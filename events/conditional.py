@@ -0,0 +1,91 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import stats
+from .models import Category, Event, EventSeries, WaitlistEntry
+
+
+# Totals come from the dashboard counters and the timestamps from the
+# (updated_at, id) indexes, so none of these queries grows with the tables
+COUNTERS = {'event_total': stats.EVENTS, 'category_total': stats.CATEGORIES}
+
+
+def totals(stored):
+    return {name: stored[key] for name, key in COUNTERS.items()}
+
+
+def series_aggregates():
+    return dict(
+        series_total=Count('pk', distinct=True),
+        series_changed=Max('updated_at'),
+        occurrence_total=Count('occurrences'),
+        occurrence_changed=Max('occurrences__updated_at'),
+    )
+
+
+def content_version():
+    """
+    Aggregates that change whenever anything the event pages show does:
+    saves, RSVP counts and image variants bump an event's ``updated_at``,
+    category edits bump the category's, series and their stored
+    occurrences have their own, and the counts catch deletes.
+    """
+    return {
+        **Event.objects.aggregate(event_changed=Max('updated_at')),
+        **Category.objects.aggregate(category_changed=Max('updated_at')),
+        **totals(stats.get_values(COUNTERS.values())),
+        **EventSeries.objects.aggregate(**series_aggregates()),
+    }
+
+
+async def acontent_version():
+    return {
+        **await Event.objects.aaggregate(event_changed=Max('updated_at')),
+        **await Category.objects.aaggregate(category_changed=Max('updated_at')),
+        **totals(await stats.aget_values(COUNTERS.values())),
+        **await EventSeries.objects.aaggregate(**series_aggregates()),
+    }
+
+
+async def awaitlist_version(user):
+    """A participant's own waitlist places, which are shown but don't touch the event."""
+    return await WaitlistEntry.objects.filter(user_id=user.pk).aaggregate(total=Count('pk'), last=Max('pk'))
+
+
+def validators(request, user, roles, version, *extra):
+    """
+    Strong ETag for a page built from ``version``. The ETag also covers the
+    URL and the viewer -- user, role and the name shown in the navigation --
+    so one user's page never validates another's, and the session and CSRF
+    secret, so a page whose forms carry a token from before a login is
+    never revalidated.
+
+    There is no Last-Modified: deletes, counts and the date change the page
+    without moving any timestamp, so a date alone would validate stale
+    copies.
+    """
+    viewer = f'{user.pk}:{user.get_username()}:{roles.name}' if user.is_authenticated else '-'
+    session = getattr(request, 'session', None)
+    secrets = [session.session_key if session is not None else None, request.META.get('CSRF_COOKIE')]
+    parts = [request.get_full_path(), viewer, *secrets, *sorted(version.items()), *extra]
+    return '"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def not_modified(request, user, etag):
+    """A 304 response if the client's copy is current, else ``None``."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_validators(response, user, etag)
+    return response
+
+
+def set_validators(response, user, etag):
+    response['ETag'] = etag
+    # Revalidate on every visit; signed-in pages stay out of shared caches
+    if user.is_authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
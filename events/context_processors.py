@@ -1,8 +1,12 @@
+from .roles import get_roles
+
+
 def user_roles(request):
     if request.user.is_authenticated:
+        roles = get_roles(request.user)
         return {
-            'is_admin': request.user.is_superuser,
-            'is_organizer': request.user.groups.filter(name='Organizer').exists(),
-            'is_participant': request.user.groups.filter(name='Participant').exists(),
+            'is_admin': roles.is_admin,
+            'is_organizer': roles.is_organizer,
+            'is_participant': roles.is_participant,
         }
     return {}
\ No newline at end of file
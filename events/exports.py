@@ -0,0 +1,94 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Event
+
+RSVP = Event.participants.through
+
+EXPORT_COLUMNS = {
+    'event_id': 'event_id',
+    'event_name': 'event__name',
+    'event_date': 'event__date',
+    'event_time': 'event__time',
+    'location': 'event__location',
+    'category': 'event__category__name',
+    'user_id': 'customuser_id',
+    'username': 'customuser__username',
+    'email': 'customuser__email',
+    'first_name': 'customuser__first_name',
+    'last_name': 'customuser__last_name',
+    'phone_number': 'customuser__phone_number',
+}
+ATTENDEE_COLUMNS = ['user_id', 'username', 'email', 'first_name', 'last_name', 'phone_number']
+ROSTER_COLUMNS = ['event_id', 'event_name', 'event_date', 'event_time', 'user_id', 'username', 'email']
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose ``write`` hands the value back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def parse_columns(value, default):
+    """Return the requested column names, or raise ``ValueError`` for unknown ones."""
+    if not value:
+        return list(default)
+    columns = [column.strip() for column in value.split(',') if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown) or value}.")
+    return columns
+
+
+def roster_rows(columns, event_id=None, date_from=None, date_to=None):
+    """
+    Iterate (event, attendee) rows as tuples without loading the roster into
+    memory. Rows come back in the order of the RSVP table's unique
+    (event, user) index, so the database streams them without sorting.
+    """
+    queryset = RSVP.objects.all()
+    if event_id is not None:
+        queryset = queryset.filter(event_id=event_id)
+    if date_from:
+        queryset = queryset.filter(event__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(event__date__lte=date_to)
+    queryset = queryset.order_by('event_id', 'customuser_id')
+    return queryset.values_list(*[EXPORT_COLUMNS[column] for column in columns]).iterator(chunk_size=CHUNK_SIZE)
+
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def neutralize(value):
+    """Quote user-entered text that Excel or Sheets would treat as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([neutralize(value) for value in row])
+
+
+def stream_ndjson(columns, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def stream_export(fmt, columns, rows):
+    if fmt == 'ndjson':
+        return stream_ndjson(columns, rows)
+    return stream_csv(columns, rows)
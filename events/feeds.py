@@ -0,0 +1,123 @@
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Count, Max
+
+from .models import Category
+
+User = get_user_model()
+
+FEED_SALT = 'events.feeds'
+CHUNK_SIZE = 500
+# Public category feeds may be cached by clients and proxies this long (seconds)
+FEED_MAX_AGE = getattr(settings, 'CALENDAR_FEED_MAX_AGE', 300)
+
+FEED_FIELDS = ('pk', 'name', 'description', 'date', 'time', 'location', 'category__name', 'updated_at')
+
+_signer = signing.Signer(salt=FEED_SALT, sep='.')
+
+
+def feed_token(user_id):
+    """Unguessable, URL-safe token naming one user's feed."""
+    return _signer.sign(str(user_id))
+
+
+def user_id_for_token(token):
+    """Return the user id a token was issued for, or ``None`` if it was tampered with."""
+    try:
+        value = _signer.unsign(token)
+    except signing.BadSignature:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def user_feed(user_id):
+    """
+    Name and version of an active user's feed from one aggregate query, or
+    ``None``. Edits to an event or its category bump ``updated_at`` and
+    RSVPs touch the event, so the newest timestamp and the row count
+    together change whenever the feed's content does.
+    """
+    return User.objects.filter(pk=user_id, is_active=True).annotate(
+        total=Count('rsvp_events'),
+        event_changed=Max('rsvp_events__updated_at'),
+        category_changed=Max('rsvp_events__category__updated_at'),
+    ).values('username', 'total', 'event_changed', 'category_changed').first()
+
+
+def category_feed(category_id):
+    """As ``user_feed``, for every event in a category."""
+    return Category.objects.filter(pk=category_id).annotate(
+        total=Count('events'),
+        event_changed=Max('events__updated_at'),
+    ).values('name', 'updated_at', 'total', 'event_changed').first()
+
+
+def validators(scope, total, *changed):
+    """Strong ETag and Last-Modified timestamp for a feed version."""
+    changed = [value for value in changed if value]
+    last_modified = max(changed) if changed else None
+    version = f"{scope}:{total}:{last_modified.timestamp() if last_modified else '-'}"
+    etag = '"%s"' % hashlib.md5(version.encode()).hexdigest()
+    return etag, (int(last_modified.timestamp()) if last_modified else None)
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Split content lines longer than 75 octets, as RFC 5545 requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, start = [], 0
+    limit = 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split a multi-byte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def utc_stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(event, host):
+    start = datetime.combine(event['date'], event['time'])
+    stamp = utc_stamp(event['updated_at'])
+    yield 'BEGIN:VEVENT'
+    yield f"UID:event-{event['pk']}@{host}"
+    yield f'DTSTAMP:{stamp}'
+    yield f'LAST-MODIFIED:{stamp}'
+    yield f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}"
+    yield f"SUMMARY:{escape(event['name'])}"
+    yield f"DESCRIPTION:{escape(event['description'])}"
+    yield f"LOCATION:{escape(event['location'])}"
+    yield f"CATEGORIES:{escape(event['category__name'])}"
+    yield 'END:VEVENT'
+
+
+def stream_calendar(name, events, host):
+    """
+    Yield an iCalendar document for ``events`` (a queryset), read with one
+    streaming query rather than loaded into memory.
+    """
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold('PRODID:-//EventMgmt//Events//EN')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold(f'X-WR-CALNAME:{escape(name)}')
+    rows = events.order_by('date', 'time', 'pk').values(*FEED_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+    for event in rows:
+        yield ''.join(fold(line) for line in event_lines(event, host))
+    yield fold('END:VCALENDAR')
+
@@ -1,8 +1,13 @@
 from django import forms
-from events.models import Event, Category
+from events.models import Event, EventSeries, Occurrence, Category
 from django.forms.widgets import ClearableFileInput
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm, PasswordResetForm, SetPasswordForm
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models import F, Q
+from django.utils.timezone import now
+from events.images import LimitedImageField
+from events.recurrence import WEEKDAYS, parse_weekdays
 
 CustomUser = get_user_model()
 
@@ -32,6 +37,7 @@ class EventForm(StyledFormMixin, forms.ModelForm):
     class Meta:
         model = Event
         fields = '__all__'
+        field_classes = {'image': LimitedImageField}
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date'}),
             'time': forms.TimeInput(attrs={'type': 'time'}),
@@ -42,6 +48,133 @@ class EventForm(StyledFormMixin, forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.apply_styled_widget()
 
+class EventSeriesForm(StyledFormMixin, forms.ModelForm):
+    class Meta:
+        model = EventSeries
+        fields = ['name', 'description', 'category', 'time', 'location', 'capacity',
+                  'start_date', 'frequency', 'interval', 'weekdays', 'count', 'until']
+        widgets = {
+            'start_date': forms.DateInput(attrs={'type': 'date'}),
+            'until': forms.DateInput(attrs={'type': 'date'}),
+            'time': forms.TimeInput(attrs={'type': 'time'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['interval'].widget.attrs['min'] = 1
+        self.apply_styled_widget()
+
+    def clean_weekdays(self):
+        try:
+            days = parse_weekdays(self.cleaned_data['weekdays'])
+        except ValueError as error:
+            raise forms.ValidationError(f"{error} Use {', '.join(WEEKDAYS)}.")
+        return ','.join(WEEKDAYS[day] for day in days)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, until = cleaned_data.get('start_date'), cleaned_data.get('until')
+        if start and until and until < start:
+            self.add_error('until', "The series can't end before it starts.")
+        if cleaned_data.get('interval') == 0:
+            self.add_error('interval', "Repeat at least every 1.")
+        return cleaned_data
+
+class OccurrenceForm(StyledFormMixin, forms.ModelForm):
+    class Meta:
+        model = Occurrence
+        fields = ['cancelled', 'time', 'location']
+        widgets = {
+            'time': forms.TimeInput(attrs={'type': 'time'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.apply_styled_widget()
+
+class EventFilterForm(StyledFormMixin, forms.Form):
+    q = forms.CharField(label="Search", required=False)
+    category = forms.ModelChoiceField(label="Category", queryset=Category.objects.all(), required=False, empty_label="All categories")
+    date_from = forms.DateField(label="From", required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(label="To", required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.apply_styled_widget()
+
+class UserFilterForm(StyledFormMixin, forms.Form):
+    ROLE_CHOICES = [
+        ('all', "All Roles"),
+        ('admin', "Admin"),
+        ('organizer', "Organizer"),
+        ('participant', "Participant"),
+    ]
+
+    role = forms.ChoiceField(label="Role", choices=ROLE_CHOICES, required=False)
+    q = forms.CharField(label="Username or email starts with", required=False, max_length=150)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.apply_styled_widget()
+
+class RosterAddForm(StyledFormMixin, forms.Form):
+    users = forms.CharField(label="Usernames or emails", widget=forms.Textarea,
+                            help_text="Separate with commas, spaces or new lines.")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.apply_styled_widget()
+
+    def clean_users(self):
+        """Resolve the entries to user ids with one query, keeping their order."""
+        entries = list(dict.fromkeys(self.cleaned_data['users'].replace(',', ' ').split()))
+        matches = CustomUser.objects.filter(
+            Q(username__in=entries) | Q(email__in=entries)
+        ).values_list('pk', 'username', 'email')
+        by_entry = {}
+        for pk, username, email in matches:
+            by_entry.setdefault(username, pk)
+            by_entry.setdefault(email, pk)
+        unknown = [entry for entry in entries if entry not in by_entry]
+        if unknown:
+            raise forms.ValidationError("Unknown users: %(names)s", params={'names': ', '.join(unknown)})
+        return list(dict.fromkeys(by_entry[entry] for entry in entries))
+
+class RosterMoveForm(StyledFormMixin, forms.Form):
+    # An id rather than a select of every event, so the roster page stays
+    # the same size however many events there are
+    target = forms.IntegerField(label="Target event ID", min_value=1,
+                                widget=forms.TextInput(attrs={'inputmode': 'numeric'}))
+
+    def __init__(self, *args, event=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.event = event
+        self.apply_styled_widget()
+
+    def clean_target(self):
+        """The upcoming event with free seats that ``target`` names, in one query."""
+        events = Event.objects.filter(date__gte=now().date()).filter(
+            Q(capacity__isnull=True) | Q(rsvp_count__lt=F('capacity')))
+        if self.event is not None:
+            events = events.exclude(pk=self.event.pk)
+        target = events.filter(pk=self.cleaned_data['target']).first()
+        if target is None:
+            raise forms.ValidationError("Choose another upcoming event that has free seats.")
+        return target
+
+class GroupAssignForm(StyledFormMixin, forms.Form):
+    ACTION_CHOICES = [
+        ('add', "Add to group"),
+        ('remove', "Remove from group"),
+    ]
+
+    group = forms.ModelChoiceField(label="Group", queryset=Group.objects.order_by('name'), empty_label="Choose a group")
+    action = forms.ChoiceField(label="Action", choices=ACTION_CHOICES)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.apply_styled_widget()
+
 class CategoryForm(StyledFormMixin, forms.ModelForm):
     class Meta:
         model = Category
@@ -55,6 +188,7 @@ class EditProfileForm(forms.ModelForm):
     class Meta:
         model = CustomUser
         fields = ['first_name', 'last_name', 'email', 'profile_image', 'phone_number']
+        field_classes = {'profile_image': LimitedImageField}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
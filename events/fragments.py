@@ -0,0 +1,111 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .recurrence import SeriesOccurrence
+
+FRAGMENT_CACHE_ALIAS = getattr(settings, 'FRAGMENT_CACHE_ALIAS', 'default')
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def get_cache():
+    return caches[FRAGMENT_CACHE_ALIAS]
+
+
+def event_version(event):
+    """
+    Changes whenever anything shown for ``event`` does: saves, RSVP counts
+    and image variants all bump ``updated_at``, and so do category edits.
+    ``event.category`` should come from ``select_related``.
+    """
+    return f'{event.pk}.{event.updated_at.timestamp()}.{event.category.updated_at.timestamp()}'
+
+
+def occurrence_version(occurrence):
+    """As ``event_version``, for a date of a series and its stored row, if any."""
+    stored = occurrence.stored
+    return (f'{occurrence.series.pk}.{occurrence.date}.{occurrence.series.updated_at.timestamp()}.'
+            f'{occurrence.category.updated_at.timestamp()}.{stored.updated_at.timestamp() if stored else "-"}')
+
+
+def rsvp_state(event):
+    if getattr(event, 'is_rsvped', False):
+        return 'rsvped'
+    if getattr(event, 'is_waitlisted', False):
+        return 'waitlisted'
+    return 'open'
+
+
+def render_cached(items, key_for, render, list_prefix):
+    """
+    Render ``items`` to one HTML string, one fragment per item.
+
+    Each fragment is cached under ``key_for(item)``; the joined result is
+    cached too, under a digest of every item key, so a repeated page costs a
+    single cache read. Keys embed versions, so nothing is ever invalidated
+    explicitly: edits produce new keys and stale entries simply expire.
+    """
+    cache = get_cache()
+    keys = [key_for(item) for item in items]
+    if not keys:
+        return ''
+    list_key = f'{list_prefix}:' + hashlib.md5('|'.join(keys).encode()).hexdigest()
+    html = cache.get(list_key)
+    if html is not None:
+        return mark_safe(html)
+
+    cached = cache.get_many(keys)
+    rendered = {}
+    parts = []
+    for item, key in zip(items, keys):
+        fragment = cached.get(key)
+        if fragment is None:
+            fragment = rendered[key] = render(item)
+        parts.append(fragment)
+    if rendered:
+        cache.set_many(rendered, FRAGMENT_CACHE_TIMEOUT)
+    html = ''.join(parts)
+    cache.set(list_key, html, FRAGMENT_CACHE_TIMEOUT)
+    return mark_safe(html)
+
+
+def render_event_rows(events, roles):
+    """Rows of ``event_list.html`` for a viewer with ``roles``."""
+    context = {
+        'is_admin': roles.is_admin,
+        'is_organizer': roles.is_organizer,
+        'is_participant': roles.is_participant,
+    }
+    # Only participants see their own RSVP state in the row
+    with_state = roles.is_participant and not (roles.is_admin or roles.is_organizer)
+
+    def key_for(event):
+        state = rsvp_state(event) if with_state else '-'
+        if isinstance(event, SeriesOccurrence):
+            return f'occurrence-row:{roles.name}:{state}:{occurrence_version(event)}'
+        return f'event-row:{roles.name}:{state}:{event_version(event)}'
+
+    def render(event):
+        if isinstance(event, SeriesOccurrence):
+            return render_to_string('events/partials/occurrence_row.html', {**context, 'occurrence': event})
+        return render_to_string('events/partials/event_row.html', {**context, 'event': event})
+
+    return render_cached(list(events), key_for, render, f'event-rows:{roles.name}')
+
+
+def render_event_cards(events):
+    """Event and series occurrence cards of ``participant_dashboard.html``."""
+    def key_for(event):
+        if isinstance(event, SeriesOccurrence):
+            return f'occurrence-card:{occurrence_version(event)}'
+        return f'event-card:{event_version(event)}'
+
+    def render(event):
+        if isinstance(event, SeriesOccurrence):
+            return render_to_string('events/partials/occurrence_card.html', {'occurrence': event})
+        return render_to_string('events/partials/event_card.html', {'event': event})
+
+    return render_cached(list(events), key_for, render, 'event-cards')
@@ -0,0 +1,201 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import close_old_connections, transaction
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+from . import media
+from .auth import invalidate_users
+from .models import touch
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = tuple(getattr(settings, 'IMAGE_VARIANT_WIDTHS', (64, 128, 256, 512, 1024)))
+VARIANT_FORMATS = (('webp', 'WEBP', 'image/webp'), ('jpg', 'JPEG', 'image/jpeg'))
+VARIANT_QUALITY = getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+MAX_IMAGE_UPLOAD_SIZE = getattr(settings, 'MAX_IMAGE_UPLOAD_SIZE', 5 * 1024 * 1024)
+IMAGE_WORKERS = getattr(settings, 'IMAGE_WORKERS', 2)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(name, width, ext):
+    # The source's extension stays in the path: a.png and a.jpg are different images
+    return f'variants/{name}/w{width}.{ext}'
+
+
+def existing_variants(name, storage=default_storage):
+    return [width for width in VARIANT_WIDTHS if storage.exists(variant_name(name, width, 'webp'))]
+
+
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(name, storage=default_storage):
+    """
+    Write resized WebP and JPEG copies of the stored image ``name`` and
+    return the widths that were produced. Images are never upscaled, but at
+    least the smallest width is always produced.
+    """
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image = _flatten(image)
+
+    widths, written = [], []
+    for width in VARIANT_WIDTHS:
+        if width > image.width and widths:
+            break
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for ext, pil_format, _ in VARIANT_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, format=pil_format, quality=VARIANT_QUALITY, optimize=True)
+            path = variant_name(name, width, ext)
+            if storage.exists(path):
+                storage.delete(path)
+            storage.save(path, ContentFile(buffer.getvalue()))
+            written.append(path)
+        widths.append(width)
+    # Variants are rewritten under the same names
+    media.invalidate(written)
+    return widths
+
+
+def ensure_variants(name, force=False, storage=default_storage):
+    if not name:
+        return []
+    if not force:
+        widths = existing_variants(name, storage)
+        if widths:
+            return widths
+    return render_variants(name, storage)
+
+
+def variant_update(model, variants_field, widths):
+    """``update()`` arguments recording ``widths``, bumping ``updated_at`` where the model has one."""
+    values = {variants_field: widths}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        values = touch(**values)
+    return values
+
+
+def record_variants(queryset, variants_field, widths):
+    """
+    Record ``widths`` on the rows of ``queryset``; returns the row count.
+    ``update()`` skips the signals, so cached users are dropped here.
+    """
+    model = queryset.model
+    user_ids = list(queryset.values_list('pk', flat=True)) if model is get_user_model() else []
+    updated = queryset.update(**variant_update(model, variants_field, widths))
+    invalidate_users(user_ids)
+    return updated
+
+
+def process_image_field(model, pk, field_name, variants_field):
+    """Generate variants for one row and record them, unless the image changed meanwhile."""
+    try:
+        name = model._default_manager.filter(pk=pk).values_list(field_name, flat=True).first()
+        if not name:
+            return
+        widths = ensure_variants(name)
+        record_variants(model._default_manager.filter(pk=pk, **{field_name: name}), variants_field, widths)
+    except Exception:
+        logger.exception("Could not build image variants for %s %s", model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image-variants')
+        return _executor
+
+
+def schedule_variants(instance, field_name, variants_field):
+    """Queue variant generation for ``instance`` once the current transaction commits."""
+    args = (type(instance), instance.pk, field_name, variants_field)
+    if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(process_image_field, *args))
+    else:
+        transaction.on_commit(lambda: process_image_field(*args))
+
+
+class OversizedUpload(InMemoryUploadedFile):
+    """Placeholder for an upload that was dropped for exceeding the size limit."""
+
+    def __init__(self, field_name, name, content_type, size):
+        super().__init__(BytesIO(), field_name, name, content_type, size, None)
+        self.oversized = True
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """
+    Stop buffering an upload as soon as it passes ``MAX_IMAGE_UPLOAD_SIZE``.
+
+    The remaining chunks are swallowed instead of being handed to the memory
+    or temporary-file handlers, and the form receives an ``OversizedUpload``
+    that ``LimitedImageField`` turns into a validation error.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > MAX_IMAGE_UPLOAD_SIZE:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received > MAX_IMAGE_UPLOAD_SIZE:
+            return OversizedUpload(self.field_name, self.file_name, self.content_type, self.received)
+        return None
+
+
+def limit_image_uploads(view_func):
+    """
+    Install ``MaxSizeUploadHandler`` for one view's uploads only, so other
+    uploads (CSV imports) keep their full contents. Handlers can't change
+    once ``request.POST`` has been read, which the CSRF middleware does, so
+    the CSRF check runs inside the view instead.
+    """
+    protected = csrf_protect(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers.insert(0, MaxSizeUploadHandler(request))
+        return protected(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
+
+
+class LimitedImageField(forms.ImageField):
+    def to_python(self, data):
+        if data not in self.empty_values and (getattr(data, 'oversized', False) or data.size > MAX_IMAGE_UPLOAD_SIZE):
+            raise forms.ValidationError(
+                f"Image files may not be larger than {filesizeformat(MAX_IMAGE_UPLOAD_SIZE)}.",
+                code='file_too_large',
+            )
+        return super().to_python(data)
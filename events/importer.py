@@ -0,0 +1,182 @@
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from . import stats
+from .roles import PARTICIPANT
+from .workers import setup_worker
+
+User = get_user_model()
+
+REQUIRED_COLUMNS = ('username', 'email', 'password')
+OPTIONAL_COLUMNS = ('first_name', 'last_name', 'phone_number')
+DEFAULT_CHUNK_SIZE = getattr(settings, 'IMPORT_CHUNK_SIZE', 500)
+
+username_validator = UnicodeUsernameValidator()
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+
+def make_pool(workers=None):
+    """
+    Password hashing processes. Spawned rather than forked: the import runs
+    inside server workers that have threads (the image pool) and open
+    database connections, which a forked child would inherit.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=setup_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'event_management.settings'),),
+    )
+
+
+def validate_row(row):
+    username = (row.get('username') or '').strip()
+    email = (row.get('email') or '').strip()
+    if not username:
+        return "Username is required."
+    try:
+        username_validator(username)
+    except ValidationError as exc:
+        return exc.messages[0]
+    if not email:
+        return "Email is required."
+    try:
+        validate_email(email)
+    except ValidationError:
+        return "Enter a valid email address."
+    if not row.get('password'):
+        return "Password is required."
+    if len(row.get('phone_number') or '') > 11:
+        return "Phone number must be at most 11 characters."
+    return None
+
+
+def _import_chunk(rows, participant_group, pool, result, seen_usernames, seen_emails):
+    valid = []
+    for line, row in rows:
+        error = validate_row(row)
+        if error:
+            result.add_error(line, error)
+            continue
+        username, email = row['username'].strip(), row['email'].strip()
+        if username in seen_usernames:
+            result.add_error(line, "Username appears more than once in the file.")
+        elif email.lower() in seen_emails:
+            result.add_error(line, "Email appears more than once in the file.")
+        else:
+            seen_usernames.add(username)
+            seen_emails.add(email.lower())
+            valid.append((line, username, email, row))
+
+    taken_usernames = set(User.objects.filter(
+        username__in=[username for _, username, _, _ in valid]
+    ).values_list('username', flat=True))
+    taken_emails = set(User.objects.annotate(email_lower=Lower('email')).filter(
+        email_lower__in=[email.lower() for _, _, email, _ in valid]
+    ).values_list('email_lower', flat=True))
+
+    pending = []
+    for line, username, email, row in valid:
+        if username in taken_usernames:
+            result.add_error(line, "Username already exists.")
+        elif email.lower() in taken_emails:
+            result.add_error(line, "Email is already registered.")
+        else:
+            pending.append((line, username, email, row))
+    if not pending:
+        return
+
+    passwords = [row['password'] for _, _, _, row in pending]
+    hashed = list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // 32)))
+
+    users = [
+        (line, User(
+            username=username,
+            email=email,
+            password=password,
+            first_name=(row.get('first_name') or '').strip(),
+            last_name=(row.get('last_name') or '').strip(),
+            phone_number=(row.get('phone_number') or '').strip() or None,
+            profile_image_variants=[],
+            is_participant_member=True,
+        ))
+        for (line, username, email, row), password in zip(pending, hashed)
+    ]
+    try:
+        _insert_users([user for _, user in users], participant_group)
+        result.created += len(users)
+    except IntegrityError:
+        # A signup or another import took a username after the check above;
+        # insert row by row so only the conflicting rows fail
+        for line, user in users:
+            try:
+                _insert_users([user], participant_group)
+                result.created += 1
+            except IntegrityError:
+                result.add_error(line, "Username already exists.")
+
+
+def _insert_users(users, participant_group):
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        Membership = User.groups.through
+        Membership.objects.bulk_create([
+            Membership(customuser_id=user.pk, group_id=participant_group.pk) for user in users
+        ])
+        # bulk_create skips the m2m_changed handler that keeps this counter
+        stats.bump(stats.PARTICIPANTS, len(users))
+
+
+def import_participants(stream, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, pool=None):
+    """
+    Create Participant users from CSV text in ``stream``.
+
+    Rows are read and validated ``chunk_size`` at a time, passwords are hashed
+    in a process pool, and each valid chunk is inserted with ``bulk_create``
+    in its own transaction. Invalid rows are reported in the result without
+    stopping the import.
+    """
+    result = ImportResult()
+    reader = csv.DictReader(stream)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        result.add_error(1, f"Missing column(s): {', '.join(missing)}.")
+        return result
+
+    participant_group, _ = Group.objects.get_or_create(name=PARTICIPANT)
+    rows = ((reader.line_num, row) for row in reader)
+    seen_usernames, seen_emails = set(), set()
+    own_pool = pool is None
+    pool = pool or make_pool(workers)
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            _import_chunk(chunk, participant_group, pool, result, seen_usernames, seen_emails)
+    finally:
+        if own_pool:
+            pool.shutdown()
+    result.errors.sort(key=lambda error: error[0])
+    return result
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from events import benchmark
+
+DEFAULT_ROUTES = ['public-home', 'event-list', 'participant-dashboard']
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the same concurrent load through the WSGI and the ASGI handler and "
+        "print throughput and latency side by side. Requests run in-process, so "
+        "the numbers compare the two request paths, not web servers. Run "
+        "seed_data first for a realistic dataset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--role', choices=benchmark.ROLES, default='participant')
+        parser.add_argument('--routes', nargs='+', default=DEFAULT_ROUTES, help="URL names without parameters.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        user = benchmark.role_users()[options['role']]
+        if options['role'] != 'anonymous' and user is None:
+            raise CommandError(f"No {options['role']} account to sign in as; run seed_data first.")
+        urls = [reverse(name) for name in options['routes']]
+        results = benchmark.compare_deployments(urls, user, options['concurrency'], options['requests'])
+
+        self.stdout.write(f"{options['requests']} requests, concurrency {options['concurrency']}, "
+                          f"as {options['role']}: {', '.join(urls)}")
+        self.stdout.write(f"{'':<6} {'req/s':>9} {'p50':>10} {'p95':>10} {'errors':>7}")
+        for mode in ('wsgi', 'asgi'):
+            row = results[mode]
+            self.stdout.write(
+                f"{mode:<6} {row['rps']:>9.1f} {row['p50_ms']:>8.2f}ms {row['p95_ms']:>8.2f}ms {row['errors']:>7}"
+            )
+        if options['output']:
+            benchmark.save(results, options['output'])
@@ -0,0 +1,39 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from events import benchmark
+
+DEFAULT_ASSETS = ['css/output.css']
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch static assets through the app once per Accept-Encoding and print "
+        "bytes transferred and time to first byte. Run collectstatic first; "
+        "requests run in-process, so network time is not included."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('assets', nargs='*', default=DEFAULT_ASSETS, help="Static file names.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        if not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise CommandError("STATIC_ROOT is empty; run collectstatic first.")
+        results = benchmark.static_transfer(options['assets'], options['iterations'])
+
+        for name, rows in results.items():
+            baseline = rows['before']['bytes'] or 1
+            self.stdout.write(name)
+            self.stdout.write(f"  {'request':<9} {'served':<9} {'bytes':>9} {'saved':>7} {'ttfb p50':>10} {'p95':>9}  cache-control")
+            for label, row in rows.items():
+                saved = 1 - row['bytes'] / baseline
+                self.stdout.write(
+                    f"  {label:<9} {row['served']:<9} {row['bytes']:>9} {saved:>6.0%} "
+                    f"{row['ttfb_p50_ms']:>8.3f}ms {row['ttfb_p95_ms']:>7.3f}ms  {row['cache_control']}"
+                )
+        if options['output']:
+            benchmark.save(results, options['output'])
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every route in events.urls (and media) as each role and record query count, "
+        "p50/p95 latency and peak memory. Run seed_data first for a realistic dataset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--roles', nargs='+', choices=benchmark.ROLES, default=list(benchmark.ROLES))
+        parser.add_argument('--routes', nargs='+', help="Only benchmark these URL names.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--baseline', help="Compare against a JSON file written by an earlier run.")
+        parser.add_argument('--max-query-increase', type=int,
+                            default=benchmark.DEFAULT_THRESHOLDS['max_query_increase'])
+        parser.add_argument('--max-latency-ratio', type=float,
+                            default=benchmark.DEFAULT_THRESHOLDS['max_latency_ratio'])
+        parser.add_argument('--max-memory-ratio', type=float,
+                            default=benchmark.DEFAULT_THRESHOLDS['max_memory_ratio'])
+
+    def handle(self, *args, **options):
+        skipped = []
+        results = benchmark.run(options['iterations'], options['roles'], options['routes'], skipped)
+
+        for key, row in sorted(results.items()):
+            self.stdout.write(
+                f"{key:<50} {row['status']:>4} {row['queries']:>4}q "
+                f"p50 {row['p50_ms']:>8.2f}ms p95 {row['p95_ms']:>8.2f}ms {row['peak_kb']:>9.1f}KB"
+            )
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                "Skipped, no rows to fill their URL parameters: " + ", ".join(sorted(skipped))))
+        if options['output']:
+            benchmark.save(results, options['output'])
+
+        if options['baseline']:
+            regressions = benchmark.compare(results, benchmark.load(options['baseline']), {
+                'max_query_increase': options['max_query_increase'],
+                'max_latency_ratio': options['max_latency_ratio'],
+                'max_memory_ratio': options['max_memory_ratio'],
+            })
+            if regressions:
+                raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
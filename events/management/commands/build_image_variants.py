@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from events.images import IMAGE_WORKERS, ensure_variants, record_variants
+from events.models import Event
+
+IMAGE_FIELDS = [
+    (Event, 'image', 'image_variants'),
+    (get_user_model(), 'profile_image', 'profile_image_variants'),
+]
+
+
+class Command(BaseCommand):
+    help = "Generate responsive WebP/JPEG variants for existing event and profile images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=IMAGE_WORKERS)
+        parser.add_argument('--force', action='store_true', help="Re-render variants that already exist.")
+
+    def handle(self, *args, **options):
+        force = options['force']
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for model, field_name, variants_field in IMAGE_FIELDS:
+                names = (
+                    model._default_manager.exclude(**{field_name: ''})
+                    .values_list(field_name, flat=True).distinct().order_by()
+                )
+                futures = {name: pool.submit(ensure_variants, name, force) for name in names}
+                for name, future in futures.items():
+                    try:
+                        widths = future.result()
+                    except Exception as exc:
+                        self.stderr.write(f"{name}: {exc}")
+                        continue
+                    updated = record_variants(
+                        model._default_manager.filter(**{field_name: name}), variants_field, widths)
+                    self.stdout.write(f"{name}: {len(widths)} width(s), {updated} row(s)")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from events import api
+
+
+class Command(BaseCommand):
+    help = "Delete bookkeeping rows nobody reads any more: API tombstones past their retention."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {api.prune_deletions()} tombstone(s).")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events.importer import DEFAULT_CHUNK_SIZE, import_participants
+
+
+class Command(BaseCommand):
+    help = "Create Participant accounts from a CSV file with username, email and password columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file; optional columns: first_name, last_name, phone_number.")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=None, help="Password hashing processes (default: CPU count).")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                result = import_participants(stream, chunk_size=options['chunk_size'], workers=options['workers'])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for line, message in result.errors:
+            self.stderr.write(f"Line {line}: {message}")
+        self.stdout.write(f"Created {result.created} participant(s), {len(result.errors)} row(s) rejected.")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from events import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard statistics counters from the source tables."
+
+    def handle(self, *args, **options):
+        stats.rebuild()
+        counts = stats.get_counts()
+        self.stdout.write(", ".join(f"{name}={value}" for name, value in counts.items()))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from events.seeding import SEED_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = "Generate a reproducible dataset of users, groups, categories, events and RSVPs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, default=1000)
+        parser.add_argument('--organizers', type=int, default=20)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--max-rsvps', type=int, default=50, help="Upper bound of RSVPs per event.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts = seed(
+            participants=options['participants'],
+            organizers=options['organizers'],
+            categories=options['categories'],
+            events=options['events'],
+            max_rsvps=options['max_rsvps'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(", ".join(f"{name}={value}" for name, value in counts.items()))
+        self.stdout.write(f"Seeded accounts use the password '{SEED_PASSWORD}'.")
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.outbox import (
+    DEFAULT_BACKOFF_SECONDS,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_ATTEMPTS,
+    drain_outbox,
+)
+
+
+class Command(BaseCommand):
+    help = "Send queued emails from the outbox in batches over a single mail connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+        parser.add_argument('--backoff', type=int, default=DEFAULT_BACKOFF_SECONDS,
+                            help="Base retry delay in seconds, doubled after each failed attempt.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_outbox(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                backoff=options['backoff'],
+            )
+            if sent or failed or not options['loop']:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed.")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,155 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import HttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+
+# Only uploaded images and their variants are served
+MEDIA_SERVE_PREFIXES = tuple(getattr(settings, 'MEDIA_SERVE_PREFIXES', ('events/', 'profile/', 'variants/')))
+MEDIA_MAX_AGE = getattr(settings, 'MEDIA_MAX_AGE', 30 * 24 * 60 * 60)
+# Invalidation reaches other workers only through a shared cache, so a
+# per-process cache keeps metadata briefly (see settings)
+MEDIA_METADATA_TIMEOUT = getattr(settings, 'MEDIA_METADATA_TIMEOUT', 60 * 60)
+# A missing file may be a variant another worker is still writing
+MEDIA_MISSING_TIMEOUT = getattr(settings, 'MEDIA_MISSING_TIMEOUT', 5)
+# '' serves from Python; 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache,
+# lighttpd) hand the body to the front-end server instead
+MEDIA_SENDFILE = getattr(settings, 'MEDIA_SENDFILE', '')
+# nginx ``internal`` location that maps onto MEDIA_ROOT
+MEDIA_SENDFILE_PREFIX = getattr(settings, 'MEDIA_SENDFILE_PREFIX', '/protected-media/')
+CHUNK_SIZE = 64 * 1024
+
+MISSING = 'missing'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def metadata_key(name):
+    return f'media-meta:{name}'
+
+
+def invalidate(names):
+    """Forget cached metadata after files are rewritten in place."""
+    names = list(names)
+    if names:
+        cache.delete_many([metadata_key(name) for name in names])
+
+
+def file_path(name):
+    """Absolute path of an allowed media file name, or ``None``."""
+    if not name.startswith(MEDIA_SERVE_PREFIXES):
+        return None
+    try:
+        return safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        return None
+
+
+def get_metadata(name):
+    """
+    ``(size, mtime, content_type)`` of a media file, or ``None`` if it
+    doesn't exist. Cached, so a hot image costs no ``stat`` call; misses
+    are cached too, but only for ``MEDIA_MISSING_TIMEOUT``.
+    """
+    key = metadata_key(name)
+    meta = cache.get(key)
+    if meta is None:
+        path = file_path(name)
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            stat = None
+        if stat is None or not os.path.isfile(path):
+            meta = MISSING
+        else:
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            meta = (stat.st_size, int(stat.st_mtime), content_type)
+        cache.set(key, meta, MEDIA_MISSING_TIMEOUT if meta == MISSING else MEDIA_METADATA_TIMEOUT)
+    return None if meta == MISSING else meta
+
+
+def refresh_metadata(name, handle, meta):
+    """
+    The metadata of the open file, re-cached if ``meta`` no longer matches:
+    another process may have rewritten it since it was cached.
+    """
+    stat = os.fstat(handle.fileno())
+    current = (stat.st_size, int(stat.st_mtime), meta[2])
+    if current != meta:
+        cache.set(metadata_key(name), current, MEDIA_METADATA_TIMEOUT)
+    return current
+
+
+def etag(size, mtime):
+    return f'"{mtime:x}-{size:x}"'
+
+
+def parse_range(header, size):
+    """
+    The ``(start, end)`` inclusive byte range a single-range ``Range``
+    header asks for; ``None`` to send the whole file (no header, an invalid
+    one, or a form we don't handle, such as several ranges); ``False`` if
+    unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Invalid, so ignored (RFC 9110, 14.2)
+        return None
+    if start >= size:
+        return False
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def read_range(handle, start, end):
+    """Yield bytes ``start`` to ``end`` of an open file, then close it."""
+    try:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def sendfile_response(name, path, content_type):
+    """
+    An empty response telling the front-end server to send the file
+    itself, ranges included, or ``None`` if offload isn't configured.
+    """
+    if not MEDIA_SENDFILE:
+        return None
+    response = HttpResponse(content_type=content_type)
+    if MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = MEDIA_SENDFILE_PREFIX.rstrip('/') + '/' + quote(name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def set_cache_headers(response, size, mtime):
+    response['ETag'] = etag(size, mtime)
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = f'public, max-age={MEDIA_MAX_AGE}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,290 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds; +Inf is implied
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# A statement repeated this many times in one request is reported as a likely N+1
+DUPLICATE_QUERY_THRESHOLD = getattr(settings, 'REQUEST_METRICS_DUPLICATE_THRESHOLD', 5)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, label, value):
+        series = self.series.get(label)
+        if series is None:
+            # One slot per bucket plus +Inf, then sum
+            series = self.series[label] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label, series in sorted(self.series.items()):
+            view = _escape(label)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{view="{view}"}} {_number(series[-1])}')
+            lines.append(f'{self.name}_count{{view="{view}"}} {cumulative}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, label='view'):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.series = Counter()
+
+    def inc(self, label, amount=1):
+        self.series[label] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for label, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{self.label}="{_escape(label)}"}} {value}')
+        return lines
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Per-process metric store. Each worker process serves its own numbers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.duration = Histogram(
+            'events_request_duration_seconds', 'Time spent handling the request.', SECONDS_BUCKETS)
+        self.queries = Histogram(
+            'events_request_db_queries', 'SQL statements executed per request.', QUERY_BUCKETS)
+        self.db_time = Histogram(
+            'events_request_db_seconds', 'Time spent in SQL per request.', SECONDS_BUCKETS)
+        self.template_time = Histogram(
+            'events_request_template_seconds', 'Time spent rendering templates per request.', SECONDS_BUCKETS)
+        self.response_size = Histogram(
+            'events_response_size_bytes', 'Size of non-streaming response bodies.', BYTES_BUCKETS)
+        self.duplicates = CounterMetric(
+            'events_request_duplicate_queries_total', 'SQL statements repeated within a single request.')
+        self.n_plus_one = CounterMetric(
+            'events_request_n_plus_one_total', 'Requests that repeated one statement past the N+1 threshold.')
+        self.throttle_allowed = CounterMetric(
+            'events_throttle_allowed_total', 'Rate-limited requests let through.', label='scope')
+        self.throttle_rejected = CounterMetric(
+            'events_throttle_rejected_total', 'Requests rejected by an empty token bucket.', label='bucket')
+
+    def record(self, view, sample):
+        with self.lock:
+            self.duration.observe(view, sample.total)
+            self.queries.observe(view, sample.query_count)
+            self.db_time.observe(view, sample.db_time)
+            self.template_time.observe(view, sample.template_time)
+            if sample.size is not None:
+                self.response_size.observe(view, sample.size)
+            if sample.duplicates:
+                self.duplicates.inc(view, sample.duplicates)
+            if sample.worst_repeat >= DUPLICATE_QUERY_THRESHOLD:
+                self.n_plus_one.inc(view)
+
+    def record_throttle(self, scope, rejected_by=None):
+        with self.lock:
+            if rejected_by is None:
+                self.throttle_allowed.inc(scope)
+            else:
+                self.throttle_rejected.inc(f'{scope}:{rejected_by}')
+
+    def render(self, requests=True):
+        """
+        The Prometheus text format. The throttle counters are always
+        included; the per-request metrics only with ``requests``.
+        """
+        metrics = [self.throttle_allowed, self.throttle_rejected]
+        if requests:
+            metrics[:0] = [self.duration, self.queries, self.db_time, self.template_time,
+                           self.response_size, self.duplicates, self.n_plus_one]
+        with self.lock:
+            lines = []
+            for metric in metrics:
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestSample:
+    __slots__ = ('statements', 'db_time', 'template_time', 'template_depth', 'total', 'size')
+
+    def __init__(self):
+        self.statements = Counter()
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.total = 0.0
+        self.size = None
+
+    @property
+    def query_count(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        return self.query_count - len(self.statements)
+
+    @property
+    def worst_repeat(self):
+        return max(self.statements.values(), default=0)
+
+    def __call__(self, execute, sql, params, many, context):
+        # Parameters are kept out of the key, so "same statement, different
+        # id" counts as a repeat -- the usual N+1 shape
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.statements[sql] += 1
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.query_count} queries"',
+            f'dupq;desc="{self.duplicates} duplicate queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+
+_original_render = django_backend.Template.render
+
+
+def _timed_render(self, context=None, request=None):
+    sample = _current.get()
+    if sample is None:
+        return _original_render(self, context, request)
+    # Only the outermost render is timed; includes render inside it
+    sample.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        sample.template_depth -= 1
+        if not sample.template_depth:
+            sample.template_time += time.perf_counter() - start
+
+
+def install_template_timer():
+    django_backend.Template.render = _timed_render
+
+
+def wrap_queries(sample):
+    wrappers = [conn.execute_wrapper(sample) for conn in connections.all()]
+    for wrapper in wrappers:
+        wrapper.__enter__()
+    return wrappers
+
+
+def unwrap_queries(wrappers):
+    for wrapper in reversed(wrappers):
+        wrapper.__exit__(None, None, None)
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    """
+    Opt-in (``REQUEST_METRICS = True``) per-view instrumentation: query
+    count, SQL time, repeated statements, template time and response size.
+    Each response gets a ``Server-Timing`` header and the values feed the
+    histograms served by the ``metrics`` view.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_template_timer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample = RequestSample()
+        token = _current.set(sample)
+        wrappers = wrap_queries(sample)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            sample.total = time.perf_counter() - start
+            unwrap_queries(wrappers)
+            _current.reset(token)
+        return self.finish(request, response, sample)
+
+    async def __acall__(self, request):
+        # Connections are per thread: the wrappers go on the ones of the
+        # thread that thread-sensitive sync_to_async calls (the ORM, template
+        # rendering) run in for this request
+        sample = RequestSample()
+        token = _current.set(sample)
+        wrappers = await sync_to_async(wrap_queries)(sample)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            sample.total = time.perf_counter() - start
+            await sync_to_async(unwrap_queries)(wrappers)
+            _current.reset(token)
+        return self.finish(request, response, sample)
+
+    def finish(self, request, response, sample):
+        if not response.streaming:
+            sample.size = len(response.content)
+        view = view_label(request)
+        if sample.worst_repeat >= DUPLICATE_QUERY_THRESHOLD:
+            logger.warning(
+                "%s repeated one statement %d times (likely N+1): %s",
+                view, sample.worst_repeat, sample.statements.most_common(1)[0][0],
+            )
+        registry.record(view, sample)
+        response['Server-Timing'] = sample.server_timing()
+        return response
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+# The SQL is frozen here rather than imported from events.search, so later
+# changes to the live search module can't alter what this migration does.
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS events_event_fts USING fts5("
+    "name, description, location, content='events_event', content_rowid='id')",
+    """
+    CREATE TRIGGER IF NOT EXISTS events_event_fts_ai AFTER INSERT ON events_event BEGIN
+        INSERT INTO events_event_fts(rowid, name, description, location)
+        VALUES (new.id, new.name, new.description, new.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_event_fts_ad AFTER DELETE ON events_event BEGIN
+        INSERT INTO events_event_fts(events_event_fts, rowid, name, description, location)
+        VALUES ('delete', old.id, old.name, old.description, old.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_event_fts_au AFTER UPDATE OF name, description, location ON events_event BEGIN
+        INSERT INTO events_event_fts(events_event_fts, rowid, name, description, location)
+        VALUES ('delete', old.id, old.name, old.description, old.location);
+        INSERT INTO events_event_fts(rowid, name, description, location)
+        VALUES (new.id, new.name, new.description, new.location);
+    END
+    """,
+    "INSERT INTO events_event_fts(events_event_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS events_event_fts_ai",
+    "DROP TRIGGER IF EXISTS events_event_fts_ad",
+    "DROP TRIGGER IF EXISTS events_event_fts_au",
+    "DROP TABLE IF EXISTS events_event_fts",
+]
+
+POSTGRES_INSTALL = [
+    """
+    ALTER TABLE events_event ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(location, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS event_search_vector_idx ON events_event USING GIN (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS event_search_vector_idx",
+    "ALTER TABLE events_event DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_event_capacity_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['category', 'date', 'time', 'id'], name='event_category_schedule_idx'),
+        ),
+        migrations.RunPython(
+            run({'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}),
+            run({'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+def backfill_role_flags(apps, schema_editor):
+    User = apps.get_model('events', 'CustomUser')
+    memberships = User.groups.through.objects.filter(customuser_id=models.OuterRef('pk'))
+    User.objects.update(
+        is_organizer_member=models.Exists(memberships.filter(group__name='Organizer')),
+        is_participant_member=models.Exists(memberships.filter(group__name='Participant')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('events', '0007_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='is_organizer_member',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='is_participant_member',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['is_superuser', 'username', 'id'], name='user_admin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['is_organizer_member', 'username', 'id'], name='user_organizer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['is_participant_member', 'username', 'id'], name='user_participant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['username'], name='user_username_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email'], name='user_email_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(backfill_role_flags, migrations.RunPython.noop),
+    ]
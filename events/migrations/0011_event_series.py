@@ -0,0 +1,59 @@
+# Generated by Django 5.2.3 on 2026-10-18 19:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_event_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=250)),
+                ('description', models.TextField()),
+                ('time', models.TimeField()),
+                ('location', models.CharField(max_length=250)),
+                ('capacity', models.PositiveIntegerField(blank=True, help_text='Seats per occurrence. Leave empty for unlimited seats.', null=True)),
+                ('start_date', models.DateField()),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='weekly', max_length=7)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days, weeks or months.')),
+                ('weekdays', models.CharField(blank=True, help_text="Weekly only: days such as MO,WE. Defaults to the start date's day.", max_length=20)),
+                ('count', models.PositiveIntegerField(blank=True, help_text='Stop after this many occurrences.', null=True)),
+                ('until', models.DateField(blank=True, help_text='Last possible date.', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='events.category')),
+            ],
+            options={
+                'verbose_name_plural': 'event series',
+            },
+        ),
+        migrations.CreateModel(
+            name='Occurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('cancelled', models.BooleanField(default=False)),
+                ('time', models.TimeField(blank=True, help_text='Leave empty to keep the series time.', null=True)),
+                ('location', models.CharField(blank=True, help_text='Leave empty to keep the series location.', max_length=250)),
+                ('rsvp_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('participants', models.ManyToManyField(blank=True, related_name='rsvp_occurrences', to=settings.AUTH_USER_MODEL)),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='events.eventseries')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='eventseries',
+            index=models.Index(fields=['start_date', 'until'], name='series_window_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='occurrence',
+            constraint=models.UniqueConstraint(fields=('series', 'date'), name='unique_series_occurrence'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_event_series'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['event', 'created_at', 'id'], name='waitlist_order_idx'),
+        ),
+    ]
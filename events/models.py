@@ -1,10 +1,27 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.utils import timezone
 
 class CustomUser(AbstractUser):
     profile_image = models.ImageField(upload_to='profile/', default='profile/default.jpg')
     phone_number = models.CharField(max_length=11, blank=True, null=True)
+    profile_image_variants = models.JSONField(default=list, blank=True, editable=False)
+    # Group membership summary kept in sync by signals so role filters
+    # can use an index instead of joining through the groups table
+    is_organizer_member = models.BooleanField(default=False, editable=False)
+    is_participant_member = models.BooleanField(default=False, editable=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['is_superuser', 'username', 'id'], name='user_admin_idx'),
+            models.Index(fields=['is_organizer_member', 'username', 'id'], name='user_organizer_idx'),
+            models.Index(fields=['is_participant_member', 'username', 'id'], name='user_participant_idx'),
+            # Pattern opclasses let PostgreSQL serve LIKE 'x%' from the index
+            # under any collation; other backends ignore them
+            models.Index(fields=['username'], name='user_username_prefix_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['email'], name='user_email_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.username
@@ -18,13 +35,182 @@ class Event(models.Model):
     category = models.ForeignKey('Category', on_delete=models.CASCADE, related_name="events")
     participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="rsvp_events", blank=True)
     image = models.ImageField(upload_to='events/', default='events/default.jpg')
+    image_variants = models.JSONField(default=list, blank=True, editable=False)
+    capacity = models.PositiveIntegerField(blank=True, null=True, help_text="Leave empty for unlimited seats.")
+    rsvp_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'time', 'id'], name='event_schedule_idx'),
+            models.Index(fields=['category', 'date', 'time', 'id'], name='event_category_schedule_idx'),
+            models.Index(fields=['updated_at', 'id'], name='event_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
     
+def touch(**values):
+    """``update()`` arguments that also bump ``updated_at``, which bulk updates skip."""
+    return {**values, 'updated_at': timezone.now()}
+
+class WaitlistEntry(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="waitlist")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="waitlist_entries")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'user'], name='unique_waitlist_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['event', 'created_at', 'id'], name='waitlist_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} waiting for {self.event}"
+
+class EventSeries(models.Model):
+    """
+    A recurring event, defined by an RRULE-style rule. Occurrences are not
+    stored; ``events.recurrence`` expands them for the dates being shown.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+    ]
+
+    name = models.CharField(max_length=250)
+    description = models.TextField()
+    time = models.TimeField()
+    location = models.CharField(max_length=250)
+    category = models.ForeignKey('Category', on_delete=models.CASCADE, related_name="series")
+    capacity = models.PositiveIntegerField(blank=True, null=True, help_text="Seats per occurrence. Leave empty for unlimited seats.")
+    start_date = models.DateField()
+    frequency = models.CharField(max_length=7, choices=FREQUENCY_CHOICES, default=WEEKLY)
+    interval = models.PositiveSmallIntegerField(default=1, help_text="Repeat every N days, weeks or months.")
+    weekdays = models.CharField(max_length=20, blank=True, help_text="Weekly only: days such as MO,WE. Defaults to the start date's day.")
+    count = models.PositiveIntegerField(blank=True, null=True, help_text="Stop after this many occurrences.")
+    until = models.DateField(blank=True, null=True, help_text="Last possible date.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'event series'
+        indexes = [
+            models.Index(fields=['start_date', 'until'], name='series_window_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class Occurrence(models.Model):
+    """
+    One date of a series, stored only once it has RSVPs or differs from
+    the rule: cancelled, or moved to another time or location.
+    """
+    series = models.ForeignKey(EventSeries, on_delete=models.CASCADE, related_name="occurrences")
+    date = models.DateField()
+    cancelled = models.BooleanField(default=False)
+    time = models.TimeField(blank=True, null=True, help_text="Leave empty to keep the series time.")
+    location = models.CharField(max_length=250, blank=True, help_text="Leave empty to keep the series location.")
+    participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="rsvp_occurrences", blank=True)
+    rsvp_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'date'], name='unique_series_occurrence'),
+        ]
+
+    @property
+    def is_exception(self):
+        return self.cancelled or self.time is not None or bool(self.location)
+
+    def __str__(self):
+        return f"{self.series} on {self.date}"
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='category_updated_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class Deletion(models.Model):
+    """
+    A tombstone for the API's delta sync: an event or category that was
+    deleted, or an RSVP that was cancelled (``user`` set).
+    """
+    EVENT = 'event'
+    CATEGORY = 'category'
+    RSVP = 'rsvp'
+    KIND_CHOICES = [
+        (EVENT, 'Event'),
+        (CATEGORY, 'Category'),
+        (RSVP, 'RSVP'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'user', 'deleted_at', 'id'], name='deletion_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted"
+
+class OutboundEmail(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # While sending, the lease expiry: an unfinished claim becomes due again
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    lease = models.UUIDField(blank=True, null=True, editable=False)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+
+class StatCounter(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.key}={self.value}"
@@ -0,0 +1,150 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+DEFAULT_BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+DEFAULT_MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+DEFAULT_BACKOFF_SECONDS = getattr(settings, 'OUTBOX_BACKOFF_SECONDS', 30)
+# Longer than a batch takes to send, or a slow batch is claimed twice
+DEFAULT_LEASE_SECONDS = getattr(settings, 'OUTBOX_LEASE_SECONDS', 10 * 60)
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    """
+    Store an email in the outbox. Called from signal handlers, so the row
+    is written in the same transaction as the change that triggered it.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=[r for r in recipients if r],
+    )
+
+
+def enqueue_emails(messages, from_email=None):
+    """Store many ``(subject, body, recipients)`` emails with one INSERT."""
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    return OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            subject=subject,
+            body=body,
+            from_email=from_email,
+            recipients=[r for r in recipients if r],
+        )
+        for subject, body, recipients in messages
+    ])
+
+
+def backoff_delay(attempts, base=DEFAULT_BACKOFF_SECONDS):
+    return timedelta(seconds=base * (2 ** (attempts - 1)))
+
+
+def _record_failure(email, error, max_attempts, backoff):
+    email.attempts += 1
+    email.last_error = str(error)[:2000]
+    email.lease = None
+    if email.attempts >= max_attempts:
+        email.status = OutboundEmail.STATUS_DEAD
+    else:
+        email.status = OutboundEmail.STATUS_PENDING
+        email.next_attempt_at = timezone.now() + backoff_delay(email.attempts, backoff)
+    email.save(update_fields=['attempts', 'last_error', 'lease', 'status', 'next_attempt_at'])
+
+
+def claim_batch(batch_size=DEFAULT_BATCH_SIZE, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Mark up to ``batch_size`` due emails as sending under a fresh lease and
+    return them.
+
+    The claim is a conditional UPDATE in a short transaction, so a row goes
+    to exactly one worker even without ``SKIP LOCKED`` (SQLite). Sending
+    rows whose lease ran out, e.g. after a worker crashed mid-batch, are
+    due again.
+    """
+    now = timezone.now()
+    lease = uuid.uuid4()
+    due = OutboundEmail.objects.filter(
+        status__in=[OutboundEmail.STATUS_PENDING, OutboundEmail.STATUS_SENDING],
+        next_attempt_at__lte=now,
+    )
+    with transaction.atomic():
+        candidates = due.order_by('next_attempt_at', 'id')
+        if db_connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        due.filter(id__in=ids).update(
+            status=OutboundEmail.STATUS_SENDING,
+            lease=lease,
+            next_attempt_at=now + timedelta(seconds=lease_seconds),
+        )
+    return list(OutboundEmail.objects.filter(lease=lease).order_by('next_attempt_at', 'id'))
+
+
+def drain_batch(mail_connection=None, batch_size=DEFAULT_BATCH_SIZE,
+                max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF_SECONDS):
+    """
+    Send one batch of due emails over a single mail connection.
+
+    Returns a ``(sent, failed)`` tuple. The batch is claimed first and sent
+    outside any transaction, so no locks are held while talking to the mail
+    server and several workers can drain the same outbox. A worker that
+    dies mid-batch leaves its unrecorded emails to be sent again once their
+    lease expires.
+    """
+    mail_connection = mail_connection or get_connection(fail_silently=False)
+    sent = failed = 0
+
+    batch = claim_batch(batch_size)
+    if not batch:
+        return sent, failed
+
+    try:
+        mail_connection.open()
+    except Exception as exc:
+        for email in batch:
+            _record_failure(email, exc, max_attempts, backoff)
+        return sent, len(batch)
+
+    try:
+        for email in batch:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, email.recipients,
+                connection=mail_connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                _record_failure(email, exc, max_attempts, backoff)
+                failed += 1
+            else:
+                email.status = OutboundEmail.STATUS_SENT
+                email.sent_at = timezone.now()
+                email.attempts += 1
+                email.lease = None
+                email.save(update_fields=['status', 'sent_at', 'attempts', 'lease'])
+                sent += 1
+    finally:
+        mail_connection.close()
+
+    return sent, failed
+
+
+def drain_outbox(mail_connection=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF_SECONDS):
+    """Send batches until nothing is due. Returns total ``(sent, failed)``."""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = drain_batch(mail_connection, batch_size, max_attempts, backoff)
+        total_sent += sent
+        total_failed += failed
+        if sent + failed < batch_size:
+            return total_sent, total_failed
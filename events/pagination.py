@@ -0,0 +1,132 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def keyset_filter(ordering, values, forward=True):
+    """Rows strictly after (or before) ``values`` in ``ordering``, as a ``Q``."""
+    lookup = 'gt' if forward else 'lt'
+    condition = Q()
+    for index, name in enumerate(ordering):
+        clause = Q(**{f'{name}__{lookup}': values[index]})
+        for prev_name, prev_value in zip(ordering[:index], values[:index]):
+            clause &= Q(**{prev_name: prev_value})
+        condition |= clause
+    return condition
+
+
+class CursorPage:
+    """
+    ``start_after`` holds the ordering values of the row just before the
+    page and ``end_at`` those of its last row when another page follows;
+    either is ``None`` where the page is open-ended. Together they let
+    callers slot rows from elsewhere into the same range.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, start_after=None, end_at=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.start_after = start_after
+        self.end_at = end_at
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over a queryset ordered by a unique tuple of fields.
+
+    Each page is fetched with a single ``WHERE (a, b, c) > (...) LIMIT n``
+    style query, so the cost of a page does not depend on how deep into
+    the result set it is.
+    """
+
+    def __init__(self, queryset, ordering, page_size=25):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+
+    def _field(self, name):
+        return self.queryset.model._meta.get_field(name)
+
+    def encode_cursor(self, obj):
+        values = [self._field(name).value_to_string(obj) for name in self.ordering]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                return None
+            return [self._field(name).to_python(value) for name, value in zip(self.ordering, values)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _values(self, obj):
+        return tuple(getattr(obj, name) for name in self.ordering)
+
+    def _keyset_filter(self, values, forward):
+        return keyset_filter(self.ordering, values, forward)
+
+    def _page_queryset(self, after, before):
+        """Return (queryset of page_size + 1 rows, backwards, after_values)."""
+        queryset = self.queryset
+        after_values = self.decode_cursor(after) if after else None
+        before_values = self.decode_cursor(before) if before else None
+
+        if before_values is not None:
+            queryset = queryset.filter(self._keyset_filter(before_values, forward=False))
+            queryset = queryset.order_by(*[f'-{name}' for name in self.ordering])
+            return queryset[:self.page_size + 1], True, None
+
+        if after_values is not None:
+            queryset = queryset.filter(self._keyset_filter(after_values, forward=True))
+        queryset = queryset.order_by(*self.ordering)
+        return queryset[:self.page_size + 1], False, after_values
+
+    def _build_page(self, rows, backwards, after_values):
+        has_more = len(rows) > self.page_size
+        # Fetched in reverse, the extra row is the one just before the page
+        before_page = rows[self.page_size] if backwards and has_more else None
+        rows = rows[:self.page_size]
+        if backwards:
+            rows.reverse()
+            return CursorPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1]) if rows else None,
+                previous_cursor=self.encode_cursor(rows[0]) if rows and has_more else None,
+                start_after=self._values(before_page) if before_page is not None else None,
+                end_at=self._values(rows[-1]) if rows else None,
+            )
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if rows and has_more else None,
+            previous_cursor=self.encode_cursor(rows[0]) if rows and after_values is not None else None,
+            start_after=tuple(after_values) if after_values is not None else None,
+            end_at=self._values(rows[-1]) if rows and has_more else None,
+        )
+
+    def get_page(self, after=None, before=None):
+        queryset, backwards, after_values = self._page_queryset(after, before)
+        return self._build_page(list(queryset), backwards, after_values)
+
+    async def aget_page(self, after=None, before=None):
+        queryset, backwards, after_values = self._page_queryset(after, before)
+        return self._build_page([row async for row in queryset], backwards, after_values)
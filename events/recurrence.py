@@ -0,0 +1,206 @@
+import heapq
+from datetime import timedelta
+from itertools import islice
+
+from django.db.models import Exists, OuterRef, Q
+
+from .models import EventSeries, Occurrence
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+OccurrenceRSVP = Occurrence.participants.through
+
+
+def parse_weekdays(value):
+    """``'MO,WE'`` -> ``[0, 2]``; raises ``ValueError`` for unknown days."""
+    days = set()
+    for part in value.upper().replace(' ', '').split(','):
+        if not part:
+            continue
+        if part not in WEEKDAYS:
+            raise ValueError(f"Unknown weekday: {part}.")
+        days.add(WEEKDAYS.index(part))
+    return sorted(days)
+
+
+def format_rule(series):
+    """The series rule as an iCalendar ``RRULE`` value."""
+    parts = [f'FREQ={series.frequency.upper()}']
+    if series.interval > 1:
+        parts.append(f'INTERVAL={series.interval}')
+    if series.frequency == EventSeries.WEEKLY and series.weekdays:
+        parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in parse_weekdays(series.weekdays)))
+    if series.count:
+        parts.append(f'COUNT={series.count}')
+    if series.until:
+        parts.append(f"UNTIL={series.until.strftime('%Y%m%d')}")
+    return ';'.join(parts)
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _rule_dates_from(series, first):
+    """
+    Every date the rule produces, in order and without end, starting with
+    the period (day, week or month) that contains ``first``.
+    """
+    start, step = series.start_date, series.interval
+    if series.frequency == EventSeries.DAILY:
+        period = -(-(first - start).days // step)
+        while True:
+            yield start + timedelta(days=period * step)
+            period += 1
+    elif series.frequency == EventSeries.WEEKLY:
+        week_zero = start - timedelta(days=start.weekday())
+        period = (first - week_zero).days // 7 // step
+        weekdays = parse_weekdays(series.weekdays) or [start.weekday()]
+        while True:
+            monday = week_zero + timedelta(weeks=period * step)
+            for weekday in weekdays:
+                day = monday + timedelta(days=weekday)
+                if day >= start:
+                    yield day
+            period += 1
+    else:
+        period = (_month_index(first) - _month_index(start)) // step
+        while True:
+            year, month = divmod(_month_index(start) + period * step, 12)
+            try:
+                yield start.replace(year=year, month=month + 1)
+            except ValueError:
+                pass  # no such day this month (the 31st, 29 February)
+            period += 1
+
+
+def rule_dates(series, start, end):
+    """
+    Dates of ``series`` from ``start`` to ``end`` inclusive, lazily. A rule
+    without a COUNT is entered at ``start``'s period rather than walked from
+    the series start, so the work is bounded by the window; with a COUNT it
+    is bounded by the count.
+    """
+    first = max(start, series.start_date)
+    last = min(end, series.until) if series.until else end
+    if first > last:
+        return
+    dates = _rule_dates_from(series, series.start_date if series.count else first)
+    if series.count:
+        dates = islice(dates, series.count)
+    for day in dates:
+        if day > last:
+            return
+        if day >= first:
+            yield day
+
+
+def is_occurrence(series, day):
+    return next(rule_dates(series, day, day), None) == day
+
+
+class SeriesOccurrence:
+    """
+    One date of a series, shaped like an ``Event`` for the list and card
+    templates. ``stored`` is its ``Occurrence`` row, if it has one.
+    """
+    __slots__ = ('series', 'date', 'stored')
+
+    def __init__(self, series, date, stored=None):
+        self.series = series
+        self.date = date
+        self.stored = stored
+
+    name = property(lambda self: self.series.name)
+    description = property(lambda self: self.series.description)
+    category = property(lambda self: self.series.category)
+    capacity = property(lambda self: self.series.capacity)
+
+    @property
+    def time(self):
+        return self.stored.time if self.stored and self.stored.time else self.series.time
+
+    @property
+    def location(self):
+        return self.stored.location if self.stored and self.stored.location else self.series.location
+
+    @property
+    def cancelled(self):
+        return bool(self.stored and self.stored.cancelled)
+
+    @property
+    def rsvp_count(self):
+        return self.stored.rsvp_count if self.stored else 0
+
+    participant_count = rsvp_count
+
+    @property
+    def is_rsvped(self):
+        return bool(getattr(self.stored, 'is_rsvped', False))
+
+    @property
+    def day(self):
+        return self.date.isoformat()
+
+
+def sort_key(item):
+    """Orders events and occurrences together."""
+    return item.date, item.time
+
+
+def expand(series_list, start, end, stored=(), after=None, through=None):
+    """
+    Merge the occurrences of ``series_list`` from ``start`` to ``end`` into
+    one lazy stream in date and time order, applying the ``stored``
+    exceptions and skipping cancelled dates. ``after`` and ``through`` are
+    optional ``(date, time)`` positions bounding the stream further:
+    strictly after the one, up to and including the other.
+    """
+    stored = {(occurrence.series_id, occurrence.date): occurrence for occurrence in stored}
+
+    def occurrences(series):
+        for day in rule_dates(series, start, end):
+            occurrence = SeriesOccurrence(series, day, stored.get((series.pk, day)))
+            position = (day, occurrence.time)
+            if occurrence.cancelled or (after and position <= after):
+                continue
+            if through and position > through:
+                if day > through[0]:
+                    return
+                continue
+            yield occurrence
+
+    return heapq.merge(*(occurrences(series) for series in series_list), key=sort_key)
+
+
+def active_series(start, end):
+    """Series with at least one possible date between ``start`` and ``end``."""
+    return EventSeries.objects.filter(
+        Q(until__isnull=True) | Q(until__gte=start), start_date__lte=end,
+    ).select_related('category')
+
+
+def stored_occurrences(series_ids, start, end, user=None):
+    occurrences = Occurrence.objects.filter(series_id__in=series_ids, date__range=(start, end))
+    if user is not None:
+        occurrences = occurrences.annotate(is_rsvped=Exists(
+            OccurrenceRSVP.objects.filter(occurrence_id=OuterRef('pk'), customuser_id=user.pk)))
+    return occurrences
+
+
+async def aoccurrences(series, start, end, user=None, after=None, through=None, limit=None):
+    """
+    Occurrences of the ``series`` queryset between ``start`` and ``end``, as
+    a list: one query for the series and one for the stored occurrences in
+    the window, however many dates it spans.
+    """
+    if after:
+        start = max(start, after[0])
+    if through:
+        end = min(end, through[0])
+    if start > end:
+        return []
+    series_list = [item async for item in series]
+    if not series_list:
+        return []
+    stored = [item async for item in stored_occurrences([item.pk for item in series_list], start, end, user)]
+    return list(islice(expand(series_list, start, end, stored, after, through), limit))
@@ -0,0 +1,122 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .auth import invalidate_users
+
+# 0 keeps roles out of the cross-request cache (a per-process cache could not
+# be invalidated in the other workers)
+ROLE_CACHE_TIMEOUT = getattr(settings, 'ROLE_CACHE_TIMEOUT', 300)
+
+ORGANIZER = 'Organizer'
+PARTICIPANT = 'Participant'
+
+
+class UserRoles:
+    """
+    The group names of a user, loaded once and shared by the role checkers,
+    decorators and the ``user_roles`` context processor.
+    """
+
+    def __init__(self, user, group_names=()):
+        self.user = user
+        self.group_names = frozenset(group_names)
+
+    @property
+    def is_admin(self):
+        return self.user.is_superuser
+
+    @property
+    def is_organizer(self):
+        return ORGANIZER in self.group_names
+
+    @property
+    def is_participant(self):
+        return PARTICIPANT in self.group_names
+
+    @property
+    def name(self):
+        if self.is_admin:
+            return 'admin'
+        if self.is_organizer:
+            return 'organizer'
+        if self.is_participant:
+            return 'participant'
+        return 'anonymous' if not self.user.is_authenticated else 'user'
+
+
+def role_cache_key(user_id):
+    return f'user-roles:{user_id}'
+
+
+def get_roles(user):
+    """
+    Return the ``UserRoles`` for ``user``. The result is memoised on the user
+    object, so every check made while handling one request costs at most one
+    query (none when the cross-request cache is warm).
+    """
+    roles = getattr(user, '_cached_roles', None)
+    if roles is not None:
+        return roles
+
+    if not user.is_authenticated:
+        roles = UserRoles(user)
+    else:
+        key = role_cache_key(user.pk)
+        group_names = cache.get(key) if ROLE_CACHE_TIMEOUT else None
+        if group_names is None:
+            group_names = list(user.groups.values_list('name', flat=True))
+            if ROLE_CACHE_TIMEOUT:
+                cache.set(key, group_names, ROLE_CACHE_TIMEOUT)
+        roles = UserRoles(user, group_names)
+
+    user._cached_roles = roles
+    return roles
+
+
+async def aget_roles(user):
+    """Async ``get_roles``; cache misses fall back to a threaded group lookup."""
+    roles = getattr(user, '_cached_roles', None)
+    if roles is not None:
+        return roles
+    return await sync_to_async(get_roles)(user)
+
+
+def invalidate_roles(user_ids):
+    """Drop cached roles for the given user ids after a membership change."""
+    user_ids = list(user_ids)
+    if user_ids:
+        cache.delete_many([role_cache_key(user_id) for user_id in user_ids])
+
+
+def sync_role_flags(user_ids):
+    """Recompute the denormalised role flags for the given user ids in one UPDATE."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    User = get_user_model()
+    memberships = User.groups.through.objects.filter(customuser_id=OuterRef('pk'))
+    User.objects.filter(pk__in=user_ids).update(
+        is_organizer_member=Exists(memberships.filter(group__name=ORGANIZER)),
+        is_participant_member=Exists(memberships.filter(group__name=PARTICIPANT)),
+    )
+    invalidate_users(user_ids)
+
+
+def assign_groups(user_ids, add=(), remove=()):
+    """
+    Add and remove many users to and from groups in one transaction: one
+    INSERT or DELETE per group, with the membership signals run once per
+    group for the whole batch rather than once per user.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    with transaction.atomic():
+        for group in add:
+            group.user_set.add(*user_ids)
+        for group in remove:
+            group.user_set.remove(*user_ids)
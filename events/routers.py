@@ -0,0 +1,137 @@
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DATABASE_ALIAS = getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+# After a write, the visitor reads from the primary for this long (seconds),
+# so they see their own change before it has replicated
+REPLICA_STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+PIN_COOKIE = 'db_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """
+    Per-request routing flags. The object is mutated rather than replaced,
+    so changes made in ``sync_to_async`` worker threads are seen by the
+    middleware too.
+    """
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+def replica_reads(view_func):
+    """
+    Mark a read-only view whose queries may go to the replica. Works like
+    ``csrf_exempt``: apply it outermost, or with ``method_decorator(...,
+    name='dispatch')`` on class-based views.
+    """
+    view_func.replica_reads = True
+    return view_func
+
+
+def is_session(model):
+    """
+    Sessions are saved on plain GETs (expiry refresh, messages), which says
+    nothing about the visitor's own changes, so they don't pin the visitor
+    to the primary. Instead sessions are always read from the primary.
+    """
+    return model._meta.app_label == 'sessions'
+
+
+class ReplicaRouter:
+    """
+    Reads go to the replica only inside a ``replica_reads`` view, and only
+    until the request writes or opens a transaction. Everything else --
+    writes, migrations, management commands -- uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or is_session(model):
+            return None
+        return REPLICA_DATABASE_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and not is_session(model):
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Enables replica reads for ``replica_reads`` views, unless the visitor
+    holds the pin cookie set by a recent write. Unused when no replica is
+    configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if REPLICA_DATABASE_ALIAS not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = request._db_routing = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(request, response, state)
+
+    async def __acall__(self, request):
+        state = request._db_routing = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(request, response, state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (getattr(view_func, 'replica_reads', False) and request.method in SAFE_METHODS
+                and PIN_COOKIE not in request.COOKIES):
+            request._db_routing.use_replica = True
+
+    def pin(self, request, response, state):
+        if state.wrote or request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax', secure=request.is_secure())
+        elif state.use_replica and response.streaming and not response.is_async:
+            response.streaming_content = routed(response.streaming_content, state)
+        return response
+
+
+def routed(content, state):
+    """
+    Iterate a streamed body under the view's routing: its rows are read
+    after the middleware has returned and reset the state.
+    """
+    previous = _state.get()
+    _state.set(state)
+    try:
+        yield from content
+    finally:
+        _state.set(previous)
@@ -0,0 +1,226 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed
+
+from .models import Event, Occurrence, WaitlistEntry, touch
+from .outbox import enqueue_email
+from .recurrence import SeriesOccurrence
+
+User = get_user_model()
+RSVP = Event.participants.through
+
+RSVPED = 'rsvped'
+ALREADY_RSVPED = 'already_rsvped'
+WAITLISTED = 'waitlisted'
+ALREADY_WAITLISTED = 'already_waitlisted'
+CANCELLED = 'cancelled'
+LEFT_WAITLIST = 'left_waitlist'
+NOT_RSVPED = 'not_rsvped'
+
+
+def rsvp_email(event, user):
+    """The confirmation for an RSVP to an event or a series occurrence."""
+    subject = f"RSVP Confirmation for {event.name}"
+    message = (
+        f"Hi {user.first_name or user.username},\n\n"
+        f"You have successfully RSVPed for the event '{event.name}'.\n"
+        f"Date: {event.date}\n"
+        f"Time: {event.time}\n"
+        f"Location: {event.location}\n\n"
+        f"Thank you for your interest!"
+    )
+    return subject, message, [user.email]
+
+
+class EventFull(Exception):
+    pass
+
+
+def _send_m2m(event, action, user_ids):
+    # rsvp_counted: the caller has already moved rsvp_count, so the
+    # recount receiver can skip the event
+    m2m_changed.send(
+        sender=RSVP, instance=event, action=action, reverse=False,
+        model=User, pk_set=set(user_ids), using=event._state.db, rsvp_counted=True,
+    )
+
+
+def _seat_available():
+    return Q(capacity__isnull=True) | Q(rsvp_count__lt=F('capacity'))
+
+
+def _reserve(event, user_id):
+    """
+    Insert the RSVP row and take a seat in one transaction.
+
+    The seat is taken with a conditional ``UPDATE ... WHERE rsvp_count <
+    capacity``, so concurrent requests serialise on the event row and can
+    never push the count past capacity. The unique (event, user) constraint
+    on the RSVP table makes a repeated request a no-op.
+    """
+    with transaction.atomic():
+        _send_m2m(event, 'pre_add', [user_id])
+        RSVP.objects.create(event_id=event.pk, customuser_id=user_id)
+        if not Event.objects.filter(_seat_available(), pk=event.pk).update(**touch(rsvp_count=F('rsvp_count') + 1)):
+            raise EventFull
+        _send_m2m(event, 'post_add', [user_id])
+
+
+def rsvp(event, user):
+    """RSVP ``user`` to ``event``, joining the waitlist when it is full."""
+    try:
+        _reserve(event, user.pk)
+        return RSVPED
+    except IntegrityError:
+        return ALREADY_RSVPED
+    except EventFull:
+        pass
+
+    try:
+        with transaction.atomic():
+            WaitlistEntry.objects.create(event=event, user=user)
+        return WAITLISTED
+    except IntegrityError:
+        return ALREADY_WAITLISTED
+
+
+def cancel(event, user):
+    """Cancel an RSVP or leave the waitlist, promoting the next in line."""
+    with transaction.atomic():
+        _send_m2m(event, 'pre_remove', [user.pk])
+        deleted, _ = RSVP.objects.filter(event_id=event.pk, customuser_id=user.pk).delete()
+        if deleted:
+            Event.objects.filter(pk=event.pk).update(**touch(rsvp_count=F('rsvp_count') - 1))
+            _send_m2m(event, 'post_remove', [user.pk])
+
+    if deleted:
+        promote_waitlist(event)
+        return CANCELLED
+    if WaitlistEntry.objects.filter(event=event, user=user).delete()[0]:
+        return LEFT_WAITLIST
+    return NOT_RSVPED
+
+
+def promote_waitlist(event):
+    """
+    Move waitlisted users into free seats in FIFO order. Returns the ids of
+    the users that were promoted.
+    """
+    promoted = []
+    while True:
+        with transaction.atomic():
+            entry = WaitlistEntry.objects.filter(event_id=event.pk).order_by('created_at', 'id').first()
+            if entry is None:
+                return promoted
+            claimed = WaitlistEntry.objects.filter(pk=entry.pk).delete()[0]
+            if not claimed:
+                # Another worker promoted this entry first
+                continue
+            try:
+                _reserve(event, entry.user_id)
+            except IntegrityError:
+                continue
+            except EventFull:
+                transaction.set_rollback(True)
+                return promoted
+        promoted.append(entry.user_id)
+
+
+def _locked(event):
+    """Re-read ``event`` holding its row lock, so seat counts can't change underneath."""
+    return Event.objects.select_for_update().get(pk=event.pk)
+
+
+def bulk_add(event, user_ids):
+    """
+    RSVP many users to ``event`` at once, in the order given. Users beyond
+    the free seats join the waitlist instead. Returns ``(admitted,
+    waitlisted)`` lists of user ids; users already attending are skipped.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    with transaction.atomic():
+        event = _locked(event)
+        attending = set(RSVP.objects.filter(event_id=event.pk, customuser_id__in=user_ids)
+                        .values_list('customuser_id', flat=True))
+        new = [user_id for user_id in user_ids if user_id not in attending]
+        seats = len(new) if event.capacity is None else max(0, event.capacity - event.rsvp_count)
+        admitted, waitlisted = new[:seats], new[seats:]
+        # One INSERT; the m2m signal recounts the event and queues the emails
+        event.participants.add(*admitted)
+        WaitlistEntry.objects.filter(event_id=event.pk, user_id__in=admitted).delete()
+        WaitlistEntry.objects.bulk_create(
+            [WaitlistEntry(event_id=event.pk, user_id=user_id) for user_id in waitlisted],
+            ignore_conflicts=True,
+        )
+    return admitted, waitlisted
+
+
+def _remove(event, user_ids):
+    removed = list(RSVP.objects.filter(event_id=event.pk, customuser_id__in=user_ids)
+                   .values_list('customuser_id', flat=True))
+    event.participants.remove(*removed)
+    WaitlistEntry.objects.filter(event_id=event.pk, user_id__in=user_ids).delete()
+    return removed
+
+
+def bulk_remove(event, user_ids):
+    """Cancel many RSVPs (and waitlist places) at once. Returns the ids that held a seat."""
+    with transaction.atomic():
+        removed = _remove(_locked(event), list(user_ids))
+    if removed:
+        promote_waitlist(event)
+    return removed
+
+
+def move(source, target, user_ids):
+    """
+    Move attendees of ``source`` to ``target`` in one transaction. Returns
+    ``(admitted, waitlisted)`` for ``target``, as ``bulk_add`` does.
+    """
+    with transaction.atomic():
+        moved = _remove(_locked(source), list(user_ids))
+        admitted, waitlisted = bulk_add(target, moved)
+    if moved:
+        promote_waitlist(source)
+    return admitted, waitlisted
+
+
+# Recurring series: an occurrence row is stored on the first RSVP to that
+# date and dropped again when its last RSVP goes, unless it is an exception.
+# Occurrences have no waitlist; a full one is refused.
+OCCURRENCE_FULL = 'occurrence_full'
+OCCURRENCE_CANCELLED = 'occurrence_cancelled'
+OccurrenceRSVP = Occurrence.participants.through
+
+
+def rsvp_occurrence(series, day, user):
+    """RSVP ``user`` to the ``day`` occurrence of ``series``."""
+    with transaction.atomic():
+        occurrence, _ = Occurrence.objects.select_for_update().get_or_create(series=series, date=day)
+        if occurrence.cancelled:
+            return OCCURRENCE_CANCELLED
+        if series.capacity is not None and occurrence.rsvp_count >= series.capacity:
+            return OCCURRENCE_FULL
+        try:
+            with transaction.atomic():
+                OccurrenceRSVP.objects.create(occurrence_id=occurrence.pk, customuser_id=user.pk)
+        except IntegrityError:
+            return ALREADY_RSVPED
+        Occurrence.objects.filter(pk=occurrence.pk).update(**touch(rsvp_count=F('rsvp_count') + 1))
+        enqueue_email(*rsvp_email(SeriesOccurrence(series, day, occurrence), user))
+    return RSVPED
+
+
+def cancel_occurrence(series, day, user):
+    """Cancel ``user``'s RSVP to the ``day`` occurrence of ``series``."""
+    with transaction.atomic():
+        occurrence = Occurrence.objects.select_for_update().filter(series=series, date=day).first()
+        if occurrence is None or not OccurrenceRSVP.objects.filter(
+                occurrence_id=occurrence.pk, customuser_id=user.pk).delete()[0]:
+            return NOT_RSVPED
+        if occurrence.rsvp_count <= 1 and not occurrence.is_exception:
+            occurrence.delete()
+        else:
+            Occurrence.objects.filter(pk=occurrence.pk).update(**touch(rsvp_count=F('rsvp_count') - 1))
+    return CANCELLED
@@ -0,0 +1,94 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'events_event_fts'
+SEARCH_FIELDS = ('name', 'description', 'location')
+
+SQLITE_TRIGGERS = {
+    'events_event_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS events_event_fts_ai AFTER INSERT ON events_event BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, description, location)
+            VALUES (new.id, new.name, new.description, new.location);
+        END
+    """,
+    'events_event_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS events_event_fts_ad AFTER DELETE ON events_event BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, location)
+            VALUES ('delete', old.id, old.name, old.description, old.location);
+        END
+    """,
+    'events_event_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS events_event_fts_au AFTER UPDATE OF name, description, location ON events_event BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, location)
+            VALUES ('delete', old.id, old.name, old.description, old.location);
+            INSERT INTO {FTS_TABLE}(rowid, name, description, location)
+            VALUES (new.id, new.name, new.description, new.location);
+        END
+    """,
+}
+
+
+def reinstall_search_triggers(connection):
+    """
+    Restore the SQLite FTS triggers created by migration 0006. Django
+    rebuilds a table when altering it on SQLite, which drops its triggers,
+    so this runs after every migrate and re-indexes when one had gone
+    missing. The migration owns the index itself; this never creates it.
+    """
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'events_event'")
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing.issuperset(SQLITE_TRIGGERS):
+            return
+        for sql in SQLITE_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+def search_events(queryset, query):
+    """
+    Restrict an Event queryset to rows matching every word of ``query`` (as
+    a prefix) in the name, description or location.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.filter(id__in=RawSQL(
+            "SELECT id FROM events_event WHERE search_vector @@ to_tsquery('english', %s)", [tsquery]
+        ))
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+        ))
+
+    for term in terms:
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def filter_events(queryset, q=None, category=None, date_from=None, date_to=None):
+    """Apply the event list search box and filters to an Event queryset."""
+    if category:
+        queryset = queryset.filter(category=category)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    return search_events(queryset, q)
@@ -0,0 +1,123 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils.timezone import now
+from faker import Faker
+
+from . import stats
+from .models import Category, Event
+from .roles import ORGANIZER, PARTICIPANT
+from .signals import sync_rsvp_counts
+
+User = get_user_model()
+RSVP = Event.participants.through
+Membership = User.groups.through
+
+SEED_PASSWORD = 'password'
+
+
+def _batched_create(model, objects, batch_size):
+    model.objects.bulk_create(objects, batch_size=batch_size, ignore_conflicts=True)
+
+
+@transaction.atomic
+def seed(participants=1000, organizers=20, categories=20, events=500, max_rsvps=50, seed=0, batch_size=1000):
+    """
+    Insert a reproducible dataset: the same ``seed`` always produces the same
+    users, categories, events and RSVPs. Rows are written with batched
+    ``bulk_create`` calls, and re-running with the same seed is a no-op for
+    rows that already exist. Returns a dict of row counts per table.
+    """
+    fake = Faker()
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    password = make_password(SEED_PASSWORD)
+    prefix = f'seed{seed}'
+
+    participant_group, _ = Group.objects.get_or_create(name=PARTICIPANT)
+    organizer_group, _ = Group.objects.get_or_create(name=ORGANIZER)
+    if not User.objects.filter(username=f'{prefix}-admin').exists():
+        User.objects.create_superuser(f'{prefix}-admin', f'{prefix}-admin@example.com', SEED_PASSWORD)
+
+    def make_user(kind, index):
+        username = f'{prefix}-{kind}-{index:06d}'
+        return User(
+            username=username,
+            email=f'{username}@example.com',
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            password=password,
+            profile_image_variants=[],
+            is_organizer_member=kind == 'organizer',
+            is_participant_member=kind == 'participant',
+        )
+
+    users = [make_user('participant', i) for i in range(participants)]
+    users += [make_user('organizer', i) for i in range(organizers)]
+    _batched_create(User, users, batch_size)
+    participant_ids = list(User.objects.filter(
+        username__startswith=f'{prefix}-participant-').order_by('id').values_list('id', flat=True))
+    organizer_ids = list(User.objects.filter(
+        username__startswith=f'{prefix}-organizer-').order_by('id').values_list('id', flat=True))
+    _batched_create(Membership, [
+        Membership(customuser_id=user_id, group_id=participant_group.id) for user_id in participant_ids
+    ] + [
+        Membership(customuser_id=user_id, group_id=organizer_group.id) for user_id in organizer_ids
+    ], batch_size)
+
+    # Generate every row before skipping existing ones so the random stream,
+    # and therefore the dataset, is the same on every run
+    category_rows = [
+        Category(name=f'{prefix} {fake.word().title()} {i}', description=fake.sentence())
+        for i in range(categories)
+    ]
+    existing = set(Category.objects.filter(name__startswith=f'{prefix} ').values_list('name', flat=True))
+    Category.objects.bulk_create([c for c in category_rows if c.name not in existing], batch_size=batch_size)
+    category_ids = list(Category.objects.filter(
+        name__startswith=f'{prefix} ').order_by('id').values_list('id', flat=True))
+
+    today = now().date()
+    event_rows = []
+    for i in range(events):
+        event_rows.append(Event(
+            name=f'{prefix} {fake.catch_phrase()} #{i}',
+            description=fake.paragraph(nb_sentences=4),
+            date=today + timedelta(days=rng.randint(-180, 365)),
+            time=fake.time_object().replace(second=0, microsecond=0),
+            location=fake.city(),
+            category_id=rng.choice(category_ids),
+            capacity=rng.choice([None, None, None, max_rsvps]),
+            image_variants=[],
+        ))
+    existing = set(Event.objects.filter(name__startswith=f'{prefix} ').values_list('name', flat=True))
+    Event.objects.bulk_create([e for e in event_rows if e.name not in existing], batch_size=batch_size)
+    event_ids = list(Event.objects.filter(name__startswith=f'{prefix} ').order_by('id').values_list('id', flat=True))
+
+    rsvps = []
+    for event_id in event_ids:
+        count = rng.randint(0, min(max_rsvps, len(participant_ids)))
+        rsvps.extend(
+            RSVP(event_id=event_id, customuser_id=user_id)
+            for user_id in rng.sample(participant_ids, count)
+        )
+        if len(rsvps) >= batch_size:
+            _batched_create(RSVP, rsvps, batch_size)
+            rsvps = []
+    _batched_create(RSVP, rsvps, batch_size)
+
+    # bulk_create skips the signals that maintain these denormalised values
+    for start in range(0, len(event_ids), batch_size):
+        sync_rsvp_counts(event_ids[start:start + batch_size])
+    stats.rebuild()
+
+    return {
+        'participants': len(participant_ids),
+        'organizers': len(organizer_ids),
+        'categories': len(category_ids),
+        'events': len(event_ids),
+        'rsvps': RSVP.objects.filter(event__name__startswith=f'{prefix} ').count(),
+    }
@@ -1,38 +1,41 @@
 from django.db.models.signals import m2m_changed
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import Event
+from .models import Event, Category, Deletion, Occurrence, touch
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, post_migrate
+from django.db import connections
+from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login as django_update_last_login
+from django.contrib.auth.signals import user_logged_in
+from .outbox import enqueue_email, enqueue_emails
+from .auth import invalidate_users, update_last_login
+from .roles import invalidate_roles, sync_role_flags, PARTICIPANT
+from . import stats
+from .search import reinstall_search_triggers
+from .images import schedule_variants
+from .api import record_deletions
+from .rsvp import rsvp_email
 
 User = get_user_model()
 
 @receiver(m2m_changed, sender=Event.participants.through)
-def send_rsvp_email_signal(sender, instance, action, pk_set, **kwargs):
-    if action == 'post_add':
-        for user_id in pk_set:
-            user = User.objects.get(pk=user_id)
-            subject = f"RSVP Confirmation for {instance.name}"
-            message = (
-                f"Hi {user.first_name or user.username},\n\n"
-                f"You have successfully RSVPed for the event '{instance.name}'.\n"
-                f"Date: {instance.date}\n"
-                f"Time: {instance.time}\n"
-                f"Location: {instance.location}\n\n"
-                f"Thank you for your interest!"
-            )
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False,
-            )
+def send_rsvp_email_signal(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    # One query for everyone affected, however many rows were added
+    if reverse:
+        pairs = [(event, instance) for event in Event.objects.filter(pk__in=pk_set)]
+    else:
+        users = User.objects.filter(pk__in=pk_set).only('username', 'first_name', 'email')
+        pairs = [(instance, user) for user in users]
+    enqueue_emails([rsvp_email(event, user) for event, user in pairs])
 
 @receiver(post_save, sender=User)
 def send_activation_email_signal(sender, instance, created, **kwargs):
@@ -57,10 +60,263 @@ def send_activation_email_signal(sender, instance, created, **kwargs):
         Your Team
         """
 
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [instance.email],
-            fail_silently=False,
-        )
\ No newline at end of file
+        enqueue_email(subject, message, [instance.email])
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._cleared_member_ids = list(instance.user_set.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+        instance.__dict__.pop('_cached_roles', None)
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_member_ids', [])
+    else:
+        user_ids = pk_set
+    invalidate_roles(user_ids)
+    sync_role_flags(user_ids)
+
+@receiver(post_save, sender=Group)
+def invalidate_roles_on_group_rename(sender, instance, created, **kwargs):
+    if not created:
+        member_ids = list(instance.user_set.values_list('pk', flat=True))
+        invalidate_roles(member_ids)
+        sync_role_flags(member_ids)
+
+@receiver(pre_delete, sender=Group)
+def collect_group_members(sender, instance, **kwargs):
+    instance._member_ids = list(instance.user_set.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Group)
+def invalidate_roles_on_group_delete(sender, instance, **kwargs):
+    member_ids = getattr(instance, '_member_ids', [])
+    invalidate_roles(member_ids)
+    sync_role_flags(member_ids)
+
+ROLE_FLAGS = ('is_organizer_member', 'is_participant_member')
+
+@receiver(pre_save, sender=User)
+def preserve_role_flags(sender, instance, raw, update_fields, **kwargs):
+    # The role flags are maintained by the membership signals; a save() of a
+    # stale instance must not overwrite them
+    if raw or instance._state.adding:
+        return
+    fields = [name for name in ROLE_FLAGS if update_fields is None or name in update_fields]
+    if not fields:
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*fields).first() or {}
+    for name, value in previous.items():
+        setattr(instance, name, value)
+
+# Cached users (events.auth.CachedModelBackend)
+@receiver(post_save, sender=User)
+def invalidate_saved_user(sender, instance, **kwargs):
+    invalidate_users([instance.pk])
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    invalidate_users([instance.pk])
+
+user_logged_in.disconnect(django_update_last_login, dispatch_uid='update_last_login')
+user_logged_in.connect(update_last_login, dispatch_uid='update_last_login')
+
+# Dashboard statistics
+@receiver(pre_save, sender=Event)
+def remember_event_state(sender, instance, raw, **kwargs):
+    if instance.pk and not raw:
+        previous = Event.objects.filter(pk=instance.pk).values(
+            'date', 'image', 'image_variants', 'rsvp_count',
+        ).first() or {}
+        # rsvp_count is only moved by UPDATEs; a save() of a stale instance
+        # must not write back the count it was loaded with
+        if 'rsvp_count' in previous:
+            instance.rsvp_count = previous['rsvp_count']
+        instance._previous_date = previous.get('date')
+        instance._previous_image = previous.get('image')
+        instance._previous_image_variants = previous.get('image_variants', [])
+
+@receiver(post_save, sender=Event)
+def count_saved_event(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(stats.EVENTS)
+        stats.bump(stats.day_key(instance.date))
+        return
+    previous = getattr(instance, '_previous_date', None)
+    if previous is not None and str(previous) != str(instance.date):
+        stats.bump(stats.day_key(previous), -1)
+        stats.bump(stats.day_key(instance.date))
+
+@receiver(post_delete, sender=Event)
+def count_deleted_event(sender, instance, **kwargs):
+    stats.bump(stats.EVENTS, -1)
+    stats.bump(stats.day_key(instance.date), -1)
+
+@receiver(post_save, sender=Category)
+def count_saved_category(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(stats.CATEGORIES)
+
+@receiver(post_delete, sender=Category)
+def count_deleted_category(sender, instance, **kwargs):
+    stats.bump(stats.CATEGORIES, -1)
+
+@receiver(post_save, sender=Group)
+def count_saved_group(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(stats.GROUPS)
+    else:
+        # A rename can move members into or out of the Participant group
+        stats.reset(stats.PARTICIPANTS)
+
+@receiver(post_delete, sender=Group)
+def count_deleted_group(sender, instance, **kwargs):
+    stats.bump(stats.GROUPS, -1)
+    if instance.name == PARTICIPANT:
+        stats.reset(stats.PARTICIPANTS)
+
+@receiver(m2m_changed, sender=User.groups.through)
+def count_participants(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        memberships = instance.groups.filter(name=PARTICIPANT)
+        if action == 'post_add':
+            stats.bump(stats.PARTICIPANTS, Group.objects.filter(pk__in=pk_set, name=PARTICIPANT).count())
+        elif action == 'pre_remove':
+            instance._removed_participants = memberships.filter(pk__in=pk_set).count()
+        elif action == 'pre_clear':
+            instance._removed_participants = memberships.count()
+    elif instance.name == PARTICIPANT:
+        if action == 'post_add':
+            stats.bump(stats.PARTICIPANTS, len(pk_set))
+        elif action == 'pre_remove':
+            instance._removed_participants = instance.user_set.filter(pk__in=pk_set).count()
+        elif action == 'pre_clear':
+            instance._removed_participants = instance.user_set.count()
+
+    if action in ('post_remove', 'post_clear'):
+        stats.bump(stats.PARTICIPANTS, -getattr(instance, '_removed_participants', 0))
+        instance._removed_participants = 0
+
+@receiver(pre_delete, sender=User)
+def remember_participant_membership(sender, instance, **kwargs):
+    instance._was_participant = instance.groups.filter(name=PARTICIPANT).exists()
+    instance._rsvp_event_ids = list(instance.rsvp_events.values_list('pk', flat=True))
+    instance._rsvp_occurrence_ids = list(instance.rsvp_occurrences.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=User)
+def count_deleted_participant(sender, instance, **kwargs):
+    if getattr(instance, '_was_participant', False):
+        stats.bump(stats.PARTICIPANTS, -1)
+    sync_rsvp_counts(getattr(instance, '_rsvp_event_ids', []))
+    sync_occurrence_rsvp_counts(getattr(instance, '_rsvp_occurrence_ids', []))
+
+# RSVP counts
+def sync_rsvp_counts(event_ids):
+    event_ids = list(event_ids)
+    if not event_ids:
+        return
+    total = Event.participants.through.objects.filter(event_id=OuterRef('pk')).values('event_id').annotate(
+        total=Count('*')
+    ).values('total')
+    Event.objects.filter(pk__in=event_ids).update(**touch(rsvp_count=Coalesce(Subquery(total), Value(0))))
+
+def sync_occurrence_rsvp_counts(occurrence_ids):
+    """Recount ``occurrence_ids`` and drop those left with nothing to store."""
+    occurrence_ids = list(occurrence_ids)
+    if not occurrence_ids:
+        return
+    total = Occurrence.participants.through.objects.filter(occurrence_id=OuterRef('pk')).values(
+        'occurrence_id'
+    ).annotate(total=Count('*')).values('total')
+    occurrences = Occurrence.objects.filter(pk__in=occurrence_ids)
+    occurrences.update(**touch(rsvp_count=Coalesce(Subquery(total), Value(0))))
+    # Occurrences are stored only while they have RSVPs or are exceptions
+    occurrences.filter(rsvp_count=0, cancelled=False, time__isnull=True, location='').delete()
+
+@receiver(m2m_changed, sender=Event.participants.through)
+def sync_rsvp_count_signal(sender, instance, action, reverse, pk_set, **kwargs):
+    if kwargs.get('rsvp_counted'):
+        return
+    if reverse and action == 'pre_clear':
+        instance._cleared_event_ids = list(instance.rsvp_events.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        sync_rsvp_counts([instance.pk])
+    elif action == 'post_clear':
+        sync_rsvp_counts(getattr(instance, '_cleared_event_ids', []))
+    else:
+        sync_rsvp_counts(pk_set)
+
+# API delta sync tombstones
+@receiver(post_delete, sender=Event)
+def record_event_deletion(sender, instance, **kwargs):
+    record_deletions(Deletion.EVENT, [instance.pk])
+
+@receiver(post_delete, sender=Category)
+def record_category_deletion(sender, instance, **kwargs):
+    record_deletions(Deletion.CATEGORY, [instance.pk])
+
+@receiver(m2m_changed, sender=Event.participants.through)
+def record_cancelled_rsvps(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        related = instance.rsvp_events if reverse else instance.participants
+        instance._cleared_rsvp_ids = list(related.values_list('pk', flat=True))
+        return
+    if action == 'post_remove':
+        removed = pk_set
+    elif action == 'post_clear':
+        removed = getattr(instance, '_cleared_rsvp_ids', [])
+    else:
+        return
+    if reverse:
+        record_deletions(Deletion.RSVP, removed, instance.pk)
+    else:
+        Deletion.objects.bulk_create([
+            Deletion(kind=Deletion.RSVP, object_id=instance.pk, user_id=user_id) for user_id in removed
+        ])
+
+# Full-text search
+@receiver(post_migrate)
+def ensure_search_index(sender, using, **kwargs):
+    if sender.name != 'events':
+        return
+    reinstall_search_triggers(connections[using])
+
+# Responsive image variants
+def image_changed(instance, field_name, previous):
+    return instance._state.adding or previous is None or getattr(instance, field_name).name != previous
+
+@receiver(pre_save, sender=Event)
+def reset_event_image_variants(sender, instance, raw, **kwargs):
+    instance._image_changed = not raw and image_changed(instance, 'image', getattr(instance, '_previous_image', None))
+    if instance._image_changed:
+        instance.image_variants = []
+    elif not raw:
+        # Keep variants recorded by the worker since this instance was loaded
+        instance.image_variants = instance._previous_image_variants
+
+@receiver(post_save, sender=Event)
+def build_event_image_variants(sender, instance, **kwargs):
+    if getattr(instance, '_image_changed', False):
+        schedule_variants(instance, 'image', 'image_variants')
+
+@receiver(pre_save, sender=User)
+def reset_profile_image_variants(sender, instance, raw, update_fields, **kwargs):
+    instance._image_changed = False
+    if raw or (update_fields is not None and 'profile_image' not in update_fields):
+        return
+    previous = {}
+    if not instance._state.adding:
+        previous = User.objects.filter(pk=instance.pk).values('profile_image', 'profile_image_variants').first() or {}
+    if image_changed(instance, 'profile_image', previous.get('profile_image')):
+        instance._image_changed = True
+        instance.profile_image_variants = []
+    else:
+        instance.profile_image_variants = previous['profile_image_variants']
+
+@receiver(post_save, sender=User)
+def build_profile_image_variants(sender, instance, **kwargs):
+    if getattr(instance, '_image_changed', False):
+        schedule_variants(instance, 'profile_image', 'profile_image_variants')
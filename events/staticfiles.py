@@ -0,0 +1,203 @@
+import gzip
+import json
+import mimetypes
+import os
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional; .br files are skipped without it
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.svg', '.txt', '.html', '.json', '.xml', '.ico'}
+# A variant is kept only if it saves at least this fraction of the original
+MIN_SAVING = 0.05
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Unhashed names may change in place, so clients revalidate them
+MUTABLE_MAX_AGE = getattr(settings, 'STATIC_MUTABLE_MAX_AGE', 60)
+
+# Best first; the served file is name + suffix
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compressors():
+    yield 'gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield 'br', '.br', lambda data: brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ``collectstatic`` storage that fingerprints file names (``output.css`` ->
+    ``output.<hash>.css``) and writes ``.gz`` and, when the ``brotli``
+    package is installed, ``.br`` variants of text assets next to them.
+
+    Names that were never collected (development, tests) resolve to the
+    plain file instead of raising.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(self.hashed_files) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1] in COMPRESSIBLE_EXTENSIONS and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        path = Path(self.path(name))
+        data = path.read_bytes()
+        for _, suffix, compress in compressors():
+            target = path.with_name(path.name + suffix)
+            compressed = compress(data)
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                target.write_bytes(compressed)
+            elif target.exists():
+                target.unlink()
+
+
+class StaticAsset:
+    __slots__ = ('path', 'content_type', 'size', 'etag', 'last_modified', 'variants', 'immutable')
+
+    def __init__(self, path, immutable):
+        stat = path.stat()
+        self.path = path
+        self.content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        self.size = stat.st_size
+        self.etag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+        self.last_modified = http_date(stat.st_mtime)
+        self.immutable = immutable
+        self.variants = [
+            (encoding, path.with_name(path.name + suffix))
+            for encoding, suffix in ENCODINGS
+            if path.with_name(path.name + suffix).exists()
+        ]
+
+    def select(self, accept_encoding):
+        """The smallest variant the client accepts: (path, encoding or None)."""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, path in self.variants:
+            if accepted(encoding):
+                return path, encoding
+        return self.path, None
+
+
+def accepted_encodings(header):
+    """
+    A predicate for the content codings ``header`` accepts: those listed,
+    or covered by ``*``, with a quality above zero.
+    """
+    qualities = {}
+    for part in header.split(','):
+        coding, *params = [piece.strip() for piece in part.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return lambda encoding: qualities.get(encoding, qualities.get('*', 0.0)) > 0
+
+
+def index_static_root(root):
+    """
+    Map every collected file under ``root`` to a ``StaticAsset``, once, at
+    startup. Files named in the manifest by their hashed name are marked
+    immutable.
+    """
+    root = Path(root)
+    hashed = set()
+    manifest = root / ManifestStaticFilesStorage.manifest_name
+    if manifest.exists():
+        hashed = set(json.loads(manifest.read_text()).get('paths', {}).values())
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    assets = {}
+    for path in root.rglob('*'):
+        if not path.is_file() or path.name.endswith(suffixes) or path == manifest:
+            continue
+        name = path.relative_to(root).as_posix()
+        assets[name] = StaticAsset(path, name in hashed)
+    return assets
+
+
+class StaticFilesMiddleware:
+    """
+    Serves ``STATIC_ROOT`` from the app: the best precompressed variant for
+    the client's ``Accept-Encoding``, ``Cache-Control: immutable`` for
+    fingerprinted names and validators for the rest. Requests for static
+    files return before sessions, auth or routing run. Unused until
+    ``collectstatic`` has been run.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        root = getattr(settings, 'STATIC_ROOT', None)
+        prefix = settings.STATIC_URL or ''
+        if not root or not os.path.isdir(root) or '://' in prefix:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = '/' + prefix.lstrip('/')
+        self.assets = index_static_root(root)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        asset = self.find(request)
+        if asset is not None:
+            return self.serve(request, asset)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        asset = self.find(request)
+        if asset is not None:
+            return self.serve(request, asset)
+        return await self.get_response(request)
+
+    def find(self, request):
+        if request.path_info.startswith(self.prefix) and request.method in ('GET', 'HEAD'):
+            return self.assets.get(request.path_info[len(self.prefix):])
+        return None
+
+    def serve(self, request, asset):
+        path, encoding = asset.select(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        # Each encoding is a different body, so it gets its own validator
+        etag = f'"{asset.etag}-{encoding}"' if encoding else f'"{asset.etag}"'
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(path.open('rb'), content_type=asset.content_type)
+            del response['Content-Disposition']
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = asset.last_modified
+        response['ETag'] = etag
+        if asset.variants:
+            response['Vary'] = 'Accept-Encoding'
+        if asset.immutable:
+            response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={MUTABLE_MAX_AGE}'
+        return response
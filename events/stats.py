@@ -0,0 +1,113 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils.timezone import now
+
+from .models import Category, Event, StatCounter
+from .roles import PARTICIPANT
+
+User = get_user_model()
+
+EVENTS = 'events'
+CATEGORIES = 'categories'
+PARTICIPANTS = 'participants'
+GROUPS = 'groups'
+DAY_PREFIX = 'events_on:'
+
+
+def day_key(day):
+    return f'{DAY_PREFIX}{day}'
+
+
+def compute(key):
+    """Count ``key`` from scratch. Used to seed a missing counter and by rebuild."""
+    if key == EVENTS:
+        return Event.objects.count()
+    if key == CATEGORIES:
+        return Category.objects.count()
+    if key == PARTICIPANTS:
+        return User.objects.filter(groups__name=PARTICIPANT).count()
+    if key == GROUPS:
+        return Group.objects.count()
+    if key.startswith(DAY_PREFIX):
+        return Event.objects.filter(date=key[len(DAY_PREFIX):]).count()
+    raise KeyError(key)
+
+
+def bump(key, delta=1):
+    """
+    Atomically add ``delta`` to a counter. A counter that does not exist yet
+    is seeded from the database, which already reflects the change.
+    """
+    if not delta:
+        return
+    if StatCounter.objects.filter(key=key).update(value=F('value') + delta):
+        return
+    StatCounter.objects.get_or_create(key=key, defaults={'value': compute(key)})
+
+
+def reset(key):
+    StatCounter.objects.update_or_create(key=key, defaults={'value': compute(key)})
+
+
+def count_keys(day):
+    return {
+        EVENTS: EVENTS,
+        CATEGORIES: CATEGORIES,
+        PARTICIPANTS: PARTICIPANTS,
+        GROUPS: GROUPS,
+        'today_events': day_key(day),
+    }
+
+
+def get_values(keys):
+    """
+    Return ``{key: value}`` for the counters ``keys`` in a single query.
+    Counters that have never been seeded are computed and stored on first
+    read.
+    """
+    keys = list(keys)
+    stored = dict(StatCounter.objects.filter(key__in=keys).values_list('key', 'value'))
+    for key in keys:
+        if key not in stored:
+            stored[key] = StatCounter.objects.get_or_create(key=key, defaults={'value': compute(key)})[0].value
+    return stored
+
+
+async def aget_values(keys):
+    """Async ``get_values``; seeding a missing counter falls back to the sync path."""
+    keys = list(keys)
+    stored = {
+        key: value
+        async for key, value in StatCounter.objects.filter(key__in=keys).values_list('key', 'value')
+    }
+    if any(key not in stored for key in keys):
+        return await sync_to_async(get_values)(keys)
+    return stored
+
+
+def get_counts(day=None):
+    """Return dashboard totals in a single query."""
+    keys = count_keys(day or now().date())
+    stored = get_values(keys.values())
+    return {name: stored[key] for name, key in keys.items()}
+
+
+async def aget_counts(day=None):
+    keys = count_keys(day or now().date())
+    stored = await aget_values(keys.values())
+    return {name: stored[key] for name, key in keys.items()}
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute every counter from the source tables to correct drift."""
+    for key in (EVENTS, CATEGORIES, PARTICIPANTS, GROUPS):
+        reset(key)
+    StatCounter.objects.filter(key__startswith=DAY_PREFIX).delete()
+    StatCounter.objects.bulk_create([
+        StatCounter(key=day_key(row['date']), value=row['total'])
+        for row in Event.objects.values('date').annotate(total=Count('id')).order_by()
+    ])
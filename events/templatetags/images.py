@@ -0,0 +1,34 @@
+from django import template
+from django.utils.html import format_html
+
+from events.images import variant_name
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, variants, width, alt='', css_class=''):
+    """
+    Render ``image`` as a ``<picture>`` offering its WebP and JPEG variants
+    through ``srcset``. ``width`` is the displayed CSS width in pixels; the
+    plain ``src`` falls back to the smallest JPEG that covers it at 2x.
+    """
+    if not image:
+        return ''
+    if not variants:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', image.url, alt, css_class)
+
+    storage = image.storage
+
+    def srcset(ext):
+        return ', '.join(f'{storage.url(variant_name(image.name, w, ext))} {w}w' for w in variants)
+
+    fallback = next((w for w in variants if w >= width * 2), variants[-1])
+    sizes = f'{width}px'
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        srcset('webp'), sizes,
+        storage.url(variant_name(image.name, fallback, 'jpg')), srcset('jpg'), sizes,
+        alt, css_class,
+    )
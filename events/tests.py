@@ -1,3 +1,1901 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time as clock
+from datetime import date, time, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, router
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import api, auth, benchmark, checks, feeds, fragments, images, importer, media, metrics, outbox, recurrence, routers, rsvp, staticfiles, stats, throttle
+from .forms import RosterMoveForm
+from .importer import import_participants
+from .seeding import seed
+from .search import filter_events
+from .models import Category, Deletion, Event, EventSeries, Occurrence, OutboundEmail, StatCounter, WaitlistEntry
+from .outbox import drain_outbox
+from .roles import get_roles
+
+User = get_user_model()
+
+
+def make_participant(username, **extra):
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', password='pass12345', **extra)
+    group, _ = Group.objects.get_or_create(name='Participant')
+    user.groups.add(group)
+    return user
+
+
+def shared_cache(test):
+    """Run ``test`` as deployed with a shared cache: sessions, users and roles are cached."""
+    test = mock.patch('events.roles.ROLE_CACHE_TIMEOUT', 300)(test)
+    return override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+        AUTHENTICATION_BACKENDS=['events.auth.CachedModelBackend'],
+    )(test)
+
+
+@shared_cache
+class EventListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_participant('alice')
+        cls.other = make_participant('bob')
+        cls.category = Category.objects.create(name='Tech', description='Tech talks')
+        start = date(2030, 1, 1)
+        cls.events = [
+            Event.objects.create(
+                name=f'Event {i}', description='-', date=start + timedelta(days=i // 3),
+                time=time(9 + i % 3), location='Hall', category=cls.category,
+            )
+            for i in range(30)
+        ]
+        cls.events[0].participants.add(cls.user, cls.other)
+        cls.events[1].participants.add(cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_first_page_is_annotated(self):
+        response = self.client.get(reverse('event-list'))
+        page = response.context['page']
+        self.assertEqual(len(page), 25)
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+        first, second = page.object_list[:2]
+        self.assertEqual((first.participant_count, first.is_rsvped), (2, True))
+        self.assertEqual((second.participant_count, second.is_rsvped), (1, False))
+
+    def test_cursor_walks_forward_and_back(self):
+        first = self.client.get(reverse('event-list')).context['page']
+        second = self.client.get(reverse('event-list'), {'after': first.next_cursor}).context['page']
+        self.assertEqual([e.id for e in second], [e.id for e in self.events[25:]])
+        self.assertFalse(second.has_next)
+        back = self.client.get(reverse('event-list'), {'before': second.previous_cursor}).context['page']
+        self.assertEqual([e.id for e in back], [e.id for e in first])
+
+    def test_page_query_count_is_constant(self):
+        self.client.get(reverse('event-list'))
+        # the five validator queries (counters, three aggregates and the
+        # waitlist), category filter options and one query for the page
+        # itself; with no series, none are expanded; the session, user and
+        # roles are cached
+        with self.assertNumQueries(7):
+            self.client.get(reverse('event-list'))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('event-list'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.context['page'].object_list[0].id, self.events[0].id)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("SMTP server unavailable")
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Tech', description='-')
+        self.event = Event.objects.create(
+            name='Launch', description='-', date=date(2030, 1, 1), time=time(10),
+            location='Hall', category=self.category,
+        )
+
+    def test_signup_and_rsvp_are_queued_not_sent(self):
+        user = User.objects.create_user(username='carol', email='carol@example.com', password='x', is_active=False)
+        self.event.participants.add(user)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(OutboundEmail.objects.values_list('subject', flat=True)),
+            ['Activate your account', 'RSVP Confirmation for Launch'],
+        )
+
+    def test_drain_sends_batches_over_one_connection(self):
+        users = [User.objects.create_user(username=f'u{i}', email=f'u{i}@example.com') for i in range(5)]
+        self.event.participants.add(*users)
+        sent, failed = drain_outbox(mail_connection=LocmemBackend(), batch_size=2)
+        self.assertEqual((sent, failed), (5, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+
+    def test_failures_back_off_then_dead_letter(self):
+        user = User.objects.create_user(username='dave', email='dave@example.com')
+        self.event.participants.add(user)
+        email = OutboundEmail.objects.get()
+
+        drain_outbox(mail_connection=FailingEmailBackend(), max_attempts=3, backoff=60)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.STATUS_PENDING, 1))
+        self.assertIn('SMTP server unavailable', email.last_error)
+        self.assertEqual(drain_outbox(mail_connection=FailingEmailBackend()), (0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        for _ in range(2):
+            drain_outbox(mail_connection=FailingEmailBackend(), max_attempts=3, backoff=0)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.STATUS_DEAD, 3))
+
+    def test_claimed_emails_go_to_one_worker_until_the_lease_expires(self):
+        self.event.participants.add(User.objects.create_user(username='fay', email='fay@example.com'))
+        claimed = outbox.claim_batch()
+        self.assertEqual([e.status for e in claimed], [OutboundEmail.STATUS_SENDING])
+        self.assertEqual(outbox.claim_batch(), [])
+        self.assertEqual(drain_outbox(mail_connection=LocmemBackend()), (0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(mail_connection=LocmemBackend()), (1, 0))
+        self.assertEqual(OutboundEmail.objects.get().lease, None)
+
+    def test_mail_is_sent_outside_the_claim_transaction(self):
+        self.event.participants.add(User.objects.create_user(username='gus', email='gus@example.com'))
+        blocks = []
+
+        class RecordingBackend(LocmemBackend):
+            def send_messages(self, messages):
+                blocks.extend(b for b in connection.atomic_blocks if not b._from_testcase)
+                return super().send_messages(messages)
+
+        self.assertEqual(drain_outbox(mail_connection=RecordingBackend()), (1, 0))
+        self.assertEqual(blocks, [])
+
+    def test_send_outbox_command(self):
+        self.event.participants.add(User.objects.create_user(username='erin', email='erin@example.com'))
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@shared_cache
+class RoleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='root', email='root@example.com', password='x')
+        self.organizers = Group.objects.create(name='Organizer')
+        self.user = make_participant('frank')
+
+    def test_roles_are_loaded_once_per_request(self):
+        self.client.force_login(self.user)
+        # user, group names, the RSVP list and the RSVPed series dates (the
+        # session is already cached); the decorators and context processor
+        # share the single group lookup
+        with self.assertNumQueries(4):
+            self.client.get(reverse('participant-dashboard'))
+
+    def test_cache_is_invalidated_on_membership_change(self):
+        self.assertTrue(get_roles(User.objects.get(pk=self.user.pk)).is_participant)
+        self.client.force_login(self.admin)
+        self.client.post(reverse('participant-edit', args=[self.user.id]), {
+            'username': 'frank', 'email': 'frank@example.com', 'first_name': '', 'last_name': '', 'groups': [self.organizers.id],
+        })
+        roles = get_roles(User.objects.get(pk=self.user.pk))
+        self.assertTrue(roles.is_organizer)
+        self.assertFalse(roles.is_participant)
+
+    def test_cache_is_invalidated_on_group_rename_and_delete(self):
+        participants = Group.objects.get(name='Participant')
+        self.assertTrue(get_roles(User.objects.get(pk=self.user.pk)).is_participant)
+        self.client.force_login(self.admin)
+        self.client.post(reverse('group-update', args=[participants.id]), {'name': 'Organizer2'})
+        self.assertEqual(get_roles(User.objects.get(pk=self.user.pk)).group_names, {'Organizer2'})
+        self.client.post(reverse('group-delete', args=[participants.id]))
+        self.assertEqual(get_roles(User.objects.get(pk=self.user.pk)).group_names, set())
+
+
+class StatsTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Tech', description='-')
+        self.today = timezone.now().date()
+
+    def expected(self):
+        return {
+            'events': Event.objects.count(),
+            'categories': Category.objects.count(),
+            'participants': User.objects.filter(groups__name='Participant').count(),
+            'groups': Group.objects.count(),
+            'today_events': Event.objects.filter(date=self.today).count(),
+        }
+
+    def test_counters_follow_writes(self):
+        event = Event.objects.create(name='A', description='-', date=self.today, time=time(9),
+                                     location='X', category=self.category)
+        Event.objects.create(name='B', description='-', date=date(2030, 1, 1), time=time(9),
+                             location='X', category=self.category)
+        alice, bob = make_participant('alice'), make_participant('bob')
+        participants = Group.objects.get(name='Participant')
+        participants.user_set.remove(alice, User.objects.create_user(username='nobody'))
+        bob.groups.clear()
+        participants.user_set.add(alice, bob)
+        bob.delete()
+        event.date = date(2030, 1, 2)
+        event.save()
+        Group.objects.create(name='Organizer')
+        self.assertEqual(stats.get_counts(self.today), self.expected())
+
+        self.category.delete()
+        participants.delete()
+        self.assertEqual(stats.get_counts(self.today), self.expected())
+
+    def test_dashboard_read_is_one_query(self):
+        stats.get_counts(self.today)
+        with self.assertNumQueries(1):
+            stats.get_counts(self.today)
+
+    def test_rebuild_corrects_drift(self):
+        Event.objects.create(name='A', description='-', date=self.today, time=time(9),
+                             location='X', category=self.category)
+        stats.get_counts(self.today)
+        StatCounter.objects.update(value=999)
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertEqual(stats.get_counts(self.today), self.expected())
+
+
+class RSVPTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Tech', description='-')
+        self.event = Event.objects.create(name='Meetup', description='-', date=date(2030, 1, 1), time=time(18),
+                                          location='Hall', category=self.category, capacity=2)
+        self.users = [make_participant(f'p{i}') for i in range(4)]
+
+    def test_rsvp_is_idempotent_and_respects_capacity(self):
+        a, b, c, d = self.users
+        self.assertEqual(rsvp.rsvp(self.event, a), rsvp.RSVPED)
+        self.assertEqual(rsvp.rsvp(self.event, a), rsvp.ALREADY_RSVPED)
+        self.assertEqual(rsvp.rsvp(self.event, b), rsvp.RSVPED)
+        self.assertEqual(rsvp.rsvp(self.event, c), rsvp.WAITLISTED)
+        self.assertEqual(rsvp.rsvp(self.event, d), rsvp.WAITLISTED)
+        self.assertEqual(rsvp.rsvp(self.event, c), rsvp.ALREADY_WAITLISTED)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rsvp_count, 2)
+        self.assertEqual(set(self.event.participants.all()), {a, b})
+
+    def test_single_rsvp_does_not_recount_the_event(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rsvp.rsvp(self.event, self.users[0])
+            rsvp.cancel(self.event, self.users[0])
+        self.assertFalse([query for query in ctx.captured_queries if 'COUNT(' in query['sql'].upper()])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rsvp_count, 0)
+
+    def test_cancel_promotes_waitlist_in_order(self):
+        a, b, c, d = self.users
+        for user in self.users:
+            rsvp.rsvp(self.event, user)
+        self.assertEqual(rsvp.cancel(self.event, a), rsvp.CANCELLED)
+        self.assertEqual(rsvp.cancel(self.event, a), rsvp.NOT_RSVPED)
+        self.assertEqual(set(self.event.participants.all()), {b, c})
+        self.assertEqual(rsvp.cancel(self.event, d), rsvp.LEFT_WAITLIST)
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_raising_capacity_promotes_waitlist(self):
+        for user in self.users:
+            rsvp.rsvp(self.event, user)
+        self.event.capacity = 10
+        self.event.save()
+        self.assertEqual(len(rsvp.promote_waitlist(self.event)), 2)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rsvp_count, 4)
+
+    def test_views_use_the_service(self):
+        self.client.force_login(self.users[0])
+        self.client.get(reverse('rsvp-event', args=[self.event.id]))
+        self.assertTrue(self.event.participants.filter(pk=self.users[0].pk).exists())
+        self.client.post(reverse('cancel-rsvp', args=[self.event.id]))
+        self.assertFalse(self.event.participants.exists())
+
+
+class BulkRosterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Tech', description='-')
+        self.event = Event.objects.create(name='Meetup', description='-', date=date(2030, 1, 1), time=time(18),
+                                          location='Hall', category=self.category, capacity=2)
+        self.other = Event.objects.create(name='Workshop', description='-', date=date(2030, 1, 2), time=time(18),
+                                          location='Lab', category=self.category)
+        self.users = [make_participant(f'p{i}') for i in range(4)]
+        self.ids = [user.pk for user in self.users]
+
+    def test_bulk_add_fills_seats_then_waitlist(self):
+        OutboundEmail.objects.all().delete()
+        admitted, waitlisted = rsvp.bulk_add(self.event, self.ids + self.ids[:1])
+        self.assertEqual((admitted, waitlisted), (self.ids[:2], self.ids[2:]))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rsvp_count, 2)
+        self.assertEqual(list(self.event.waitlist.values_list('user_id', flat=True)), self.ids[2:])
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+        # Already attending users are skipped
+        self.assertEqual(rsvp.bulk_add(self.event, self.ids[:1]), ([], []))
+
+    def test_bulk_add_cost_does_not_grow_with_batch_size(self):
+        def queries(event, user_ids):
+            with CaptureQueriesContext(connection) as ctx:
+                rsvp.bulk_add(event, user_ids)
+            return len(ctx)
+
+        single = queries(self.other, self.ids[:1])
+        self.assertEqual(queries(Event.objects.create(name='Again', description='-', date=date(2030, 1, 3),
+                                                      time=time(18), location='Lab', category=self.category),
+                                 self.ids), single)
+
+    def test_bulk_remove_promotes_waitlist(self):
+        rsvp.bulk_add(self.event, self.ids)
+        self.assertEqual(rsvp.bulk_remove(self.event, self.ids[:2] + self.ids[3:]), self.ids[:2])
+        self.assertEqual(list(self.event.participants.values_list('pk', flat=True)), self.ids[2:3])
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rsvp_count, 1)
+
+    def test_move_between_events(self):
+        rsvp.bulk_add(self.event, self.ids)
+        self.assertEqual(rsvp.move(self.event, self.other, self.ids[:1]), (self.ids[:1], []))
+        self.assertEqual(set(self.event.participants.values_list('pk', flat=True)), set(self.ids[1:3]))
+        self.assertEqual(list(self.other.participants.values_list('pk', flat=True)), self.ids[:1])
+        self.event.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.event.rsvp_count, self.other.rsvp_count), (2, 1))
+
+    def test_roster_view(self):
+        organizer = User.objects.create_user('org', 'org@example.com', 'pass12345')
+        organizer.groups.add(Group.objects.create(name='Organizer'))
+        self.client.force_login(organizer)
+        url = reverse('event-roster', args=[self.event.id])
+
+        response = self.client.post(url, {'action': 'add', 'users': 'p0, p1@example.com\nghost'})
+        self.assertContains(response, 'Unknown users: ghost')
+        self.client.post(url, {'action': 'add', 'users': 'p0, p1@example.com p2'})
+        self.assertEqual(set(self.event.participants.values_list('pk', flat=True)), set(self.ids[:2]))
+
+        self.client.post(url, {'action': 'move', 'target': self.other.id, 'users': [self.ids[0]]})
+        self.assertEqual(set(self.event.participants.values_list('pk', flat=True)), set(self.ids[1:3]))
+        self.client.post(url, {'action': 'remove', 'users': [str(pk) for pk in self.ids]})
+        self.assertFalse(self.event.participants.exists())
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_move_target_must_be_upcoming_with_free_seats(self):
+        past = Event.objects.create(name='Past', description='-', date=date(2000, 1, 1), time=time(18),
+                                    location='Lab', category=self.category)
+        rsvp.bulk_add(self.event, self.ids[:2])
+        form = RosterMoveForm({'target': self.other.id}, event=past)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['target'], self.other)
+        # past, full, the source itself and a missing event
+        for target_id in (past.id, self.event.id, self.other.id, 999999):
+            self.assertFalse(RosterMoveForm({'target': target_id}, event=self.other).is_valid(), target_id)
+
+    def test_roster_waitlist_is_paginated(self):
+        organizer = User.objects.create_user('org', 'org@example.com', 'pass12345')
+        organizer.groups.add(Group.objects.create(name='Organizer'))
+        self.client.force_login(organizer)
+        rsvp.bulk_add(self.event, self.ids)
+        url = reverse('event-roster', args=[self.event.id])
+        with mock.patch('events.views.ROSTER_PAGE_SIZE', 1):
+            response = self.client.get(url)
+            first = response.context['waitlist']
+            self.assertEqual([entry.user_id for entry in first], self.ids[2:3])
+            self.assertContains(response, '2 waiting')
+            rest = self.client.get(url, {'waitlist_after': first.next_cursor}).context['waitlist']
+        self.assertEqual([entry.user_id for entry in rest], self.ids[3:])
+        self.assertFalse(rest.has_next)
+
+    def test_bulk_group_assignment(self):
+        admin = User.objects.create_superuser('root', 'root@example.com', 'pass12345')
+        organizers = Group.objects.create(name='Organizer')
+        self.client.force_login(admin)
+        stats.get_counts(timezone.now().date())
+
+        self.client.post(reverse('user-groups-assign'),
+                         {'group': organizers.id, 'action': 'add', 'users': self.ids[:3]})
+        self.assertEqual(User.objects.filter(is_organizer_member=True).count(), 3)
+        self.assertTrue(get_roles(User.objects.get(pk=self.ids[0])).is_organizer)
+
+        participants = Group.objects.get(name='Participant')
+        self.client.post(reverse('user-groups-assign'),
+                         {'group': participants.id, 'action': 'remove', 'users': self.ids[:2]})
+        self.assertEqual(User.objects.filter(is_participant_member=True).count(), 2)
+        self.assertEqual(stats.get_counts(timezone.now().date())['participants'], 2)
+
+    def test_participant_edit_sets_groups(self):
+        admin = User.objects.create_superuser('root', 'root@example.com', 'pass12345')
+        organizers = Group.objects.create(name='Organizer')
+        self.client.force_login(admin)
+        user = self.users[0]
+        self.client.post(reverse('participant-edit', args=[user.id]), {
+            'username': user.username, 'email': user.email, 'first_name': '', 'last_name': '',
+            'groups': [str(organizers.id), '999', 'x'],
+        })
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['Organizer'])
+        user.refresh_from_db()
+        self.assertEqual((user.is_organizer_member, user.is_participant_member), (True, False))
+
+
+class ConcurrentRSVPTests(TransactionTestCase):
+    def test_concurrent_rsvps_never_overbook(self):
+        category = Category.objects.create(name='Tech', description='-')
+        # Blank images keep the variant worker from running on commit
+        event = Event.objects.create(name='Drop', description='-', date=date(2030, 1, 1), time=time(18),
+                                     location='Hall', category=category, capacity=5, image='')
+        users = [User.objects.create_user(username=f'fan{i}', profile_image='') for i in range(20)]
+        outcomes = []
+        barrier = threading.Barrier(len(users))
+
+        def attempt(user):
+            barrier.wait()
+            try:
+                for attempt_number in range(100):
+                    try:
+                        outcomes.append(rsvp.rsvp(Event.objects.get(pk=event.pk), user))
+                        return
+                    except OperationalError:
+                        # SQLite's shared in-memory test database reports lock
+                        # contention instead of blocking like PostgreSQL does
+                        clock.sleep(0.005 * (attempt_number % 10 + 1))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        event.refresh_from_db()
+        self.assertEqual(len(outcomes), len(users))
+        self.assertEqual(outcomes.count(rsvp.RSVPED), 5)
+        self.assertEqual(outcomes.count(rsvp.WAITLISTED), 15)
+        self.assertEqual(event.participants.count(), 5)
+        self.assertEqual(event.rsvp_count, 5)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tech = Category.objects.create(name='Tech', description='-')
+        cls.music = Category.objects.create(name='Music', description='-')
+        cls.python = Event.objects.create(name='Python Meetup', description='Talks about Django', date=date(2030, 1, 5),
+                                          time=time(18), location='Dhaka Hub', category=cls.tech)
+        cls.jazz = Event.objects.create(name='Jazz Night', description='Live music', date=date(2030, 2, 1),
+                                        time=time(20), location='Dhaka Club', category=cls.music)
+
+    def search(self, **filters):
+        return set(filter_events(Event.objects.all(), **filters))
+
+    def test_matches_name_description_and_location_prefixes(self):
+        self.assertEqual(self.search(q='pyth'), {self.python})
+        self.assertEqual(self.search(q='django'), {self.python})
+        self.assertEqual(self.search(q='dhaka'), {self.python, self.jazz})
+        self.assertEqual(self.search(q='dhaka live'), {self.jazz})
+        self.assertEqual(self.search(q='"OR" *'), set())
+
+    def test_index_follows_updates_and_deletes(self):
+        self.jazz.name = 'Blues Night'
+        self.jazz.save()
+        self.assertEqual(self.search(q='jazz'), set())
+        self.assertEqual(self.search(q='blues'), {self.jazz})
+        self.python.delete()
+        self.assertEqual(self.search(q='dhaka'), {self.jazz})
+
+    def test_category_and_date_filters(self):
+        self.assertEqual(self.search(category=self.music), {self.jazz})
+        self.assertEqual(self.search(date_from=date(2030, 1, 10)), {self.jazz})
+        self.assertEqual(self.search(q='dhaka', date_to=date(2030, 1, 10)), {self.python})
+
+    def test_event_list_applies_filters(self):
+        self.client.force_login(make_participant('gina'))
+        response = self.client.get(reverse('event-list'), {'q': 'night', 'category': self.music.id})
+        self.assertEqual([e.id for e in response.context['page']], [self.jazz.id])
+
+
+def make_image(width=800, height=600, fmt='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 60)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_VARIANTS_ASYNC=False)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = Category.objects.create(name='Tech', description='-')
+        self.admin = User.objects.create_superuser(username='root', email='root@example.com', password='x',
+                                                   profile_image='')
+        self.client.force_login(self.admin)
+
+    def post_event(self, upload):
+        return self.client.post(reverse('event-create'), {
+            'name': 'Gallery', 'description': '-', 'date': '2030-01-01', 'time': '10:00',
+            'location': 'Hall', 'category': self.category.id, 'image': upload,
+        })
+
+    def test_upload_builds_variants_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_event(SimpleUploadedFile('photo.jpg', make_image(), content_type='image/jpeg'))
+        event = Event.objects.get()
+        self.assertEqual(event.image_variants, [64, 128, 256, 512])
+        for width in event.image_variants:
+            for ext in ('webp', 'jpg'):
+                with Image.open(event.image.storage.path(images.variant_name(event.image.name, width, ext))) as variant:
+                    self.assertEqual(variant.width, width)
+
+        html = Template('{% load images %}{% responsive_image event.image event.image_variants 64 %}').render(
+            Context({'event': event})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('/w128.jpg"', html)
+        self.assertIn('w512.webp 512w', html)
+
+    def test_oversized_upload_is_rejected_while_streaming(self):
+        with mock.patch.object(images, 'MAX_IMAGE_UPLOAD_SIZE', 1024):
+            response = self.post_event(SimpleUploadedFile('big.jpg', make_image(), content_type='image/jpeg'))
+        self.assertContains(response, 'Image files may not be larger than')
+        self.assertFalse(Event.objects.exists())
+
+    def test_image_views_still_check_csrf(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        client.force_login(self.admin)
+        self.assertEqual(client.post(reverse('event-create'), {'name': 'x'}).status_code, 403)
+        self.assertEqual(client.post(reverse('edit-profile'), {'first_name': 'x'}).status_code, 403)
+
+    def test_backfill_command(self):
+        name = default_storage.save('events/old.png', BytesIO(make_image(100, 80, 'PNG')))
+        Event.objects.bulk_create([
+            Event(name=f'Old {i}', description='-', date=date(2030, 1, 1), time=time(9),
+                  location='Hall', category=self.category, image=name)
+            for i in range(2)
+        ])
+        call_command('build_image_variants', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(list(Event.objects.values_list('image_variants', flat=True)), [[64], [64]])
+
+    def test_sources_sharing_a_stem_keep_their_own_variants(self):
+        png = default_storage.save('events/a.png', BytesIO(make_image(100, 80, 'PNG')))
+        jpg = default_storage.save('events/a.jpg', BytesIO(make_image(300, 200)))
+        self.assertEqual(images.render_variants(png), [64])
+        self.assertEqual(images.render_variants(jpg), [64, 128, 256])
+        self.assertEqual(images.existing_variants(png), [64])
+        self.assertEqual(images.existing_variants(jpg), [64, 128, 256])
+        with Image.open(default_storage.path(images.variant_name(png, 64, 'jpg'))) as variant:
+            self.assertEqual(variant.height, 51)
+
+    def test_cached_users_see_new_variants(self):
+        backend = auth.CachedModelBackend()
+        name = default_storage.save('profile/me.png', BytesIO(make_image(100, 80, 'PNG')))
+        User.objects.filter(pk=self.admin.pk).update(profile_image=name)
+        self.assertEqual(backend.get_user(self.admin.pk).profile_image_variants, [])
+        images.process_image_field(User, self.admin.pk, 'profile_image', 'profile_image_variants')
+        self.assertEqual(backend.get_user(self.admin.pk).profile_image_variants, [64])
+
+        User.objects.filter(pk=self.admin.pk).update(profile_image_variants=[])
+        cache.delete(auth.user_cache_key(self.admin.pk))
+        self.assertEqual(backend.get_user(self.admin.pk).profile_image_variants, [])
+        call_command('build_image_variants', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(backend.get_user(self.admin.pk).profile_image_variants, [64])
+
+class ParticipantImportTests(TestCase):
+    CSV = (
+        "username,email,password,first_name\n"
+        "ann,ann@example.com,s3cret-pass,Ann\n"
+        "bad name!,bad@example.com,x,\n"
+        "ben,BEN@example.com,s3cret-pass,\n"
+        "ann,other@example.com,x,\n"
+        "taken,taken@example.com,x,\n"
+        "cat,,x,\n"
+        "dan,ben@example.com,x,\n"
+    )
+
+    def setUp(self):
+        User.objects.create_user(username='taken', email='someone@example.com')
+
+    def test_import_reports_row_errors_and_creates_the_rest(self):
+        with ThreadPoolExecutor(2) as pool:
+            result = import_participants(StringIO(self.CSV), chunk_size=2, pool=pool)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.errors], [3, 5, 6, 7, 8])
+        ann = User.objects.get(username='ann')
+        self.assertTrue(ann.check_password('s3cret-pass'))
+        self.assertEqual(ann.first_name, 'Ann')
+        self.assertEqual(set(User.objects.filter(groups__name='Participant').values_list('username', flat=True)),
+                         {'ann', 'ben'})
+        self.assertEqual(stats.get_counts()['participants'], 2)
+
+    def test_pool_spawns_workers(self):
+        with mock.patch('events.importer.ProcessPoolExecutor') as executor:
+            importer.make_pool(2)
+        self.assertEqual(executor.call_args.kwargs['mp_context'].get_start_method(), 'spawn')
+
+    def test_username_taken_during_import_is_a_row_error(self):
+        class RacingPool:
+            # A signup lands while the chunk's passwords are being hashed
+            def map(self, func, items, chunksize=1):
+                User.objects.create_user(username='ben', email='ben2@example.com')
+                return map(func, items)
+
+        result = import_participants(StringIO(self.CSV), pool=RacingPool())
+        self.assertEqual(result.created, 1)
+        self.assertIn((4, "Username already exists."), result.errors)
+        self.assertTrue(User.objects.filter(username='ann', groups__name='Participant').exists())
+
+    def test_upload_over_the_image_limit_is_imported_whole(self):
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='x')
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('people.csv', self.CSV.encode(), content_type='text/csv')
+        with mock.patch.object(images, 'MAX_IMAGE_UPLOAD_SIZE', 16):
+            self.client.post(reverse('participant-import'), {'file': upload})
+        self.assertTrue(User.objects.filter(username='ann').exists())
+
+    def test_missing_columns(self):
+        result = import_participants(StringIO("username,email\nann,ann@example.com\n"))
+        self.assertEqual(result.created, 0)
+        self.assertIn('password', result.errors[0][1])
+
+    def test_command_hashes_in_process_pool(self):
+        path = os.path.join(tempfile.mkdtemp(), 'people.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w') as handle:
+            handle.write("username,email,password\nzoe,zoe@example.com,pw-zoe-123\nyan,yan@example.com,pw-yan-123\n")
+        call_command('import_participants', path, '--workers', '2', stdout=StringIO(), stderr=StringIO())
+        self.assertTrue(User.objects.get(username='yan').check_password('pw-yan-123'))
+
+    def test_import_view_is_admin_only(self):
+        self.client.force_login(make_participant('pat'))
+        self.assertEqual(self.client.get(reverse('participant-import')).status_code, 302)
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='x')
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('people.csv', b"username,email,password\nkim,kim@example.com,pw-kim-123\n")
+        response = self.client.post(reverse('participant-import'), {'file': upload})
+        self.assertEqual(response.context['result'].created, 1)
+
+
+class RosterExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='org', email='org@example.com')
+        cls.organizer.groups.add(Group.objects.create(name='Organizer'))
+        category = Category.objects.create(name='Tech', description='-')
+        cls.early = Event.objects.create(name='Early', description='-', date=date(2030, 1, 1), time=time(9),
+                                         location='Hall', category=category)
+        cls.late = Event.objects.create(name='Late', description='-', date=date(2030, 6, 1), time=time(9),
+                                        location='Hall', category=category)
+        cls.ann, cls.ben = make_participant('ann'), make_participant('ben')
+        cls.early.participants.add(cls.ann, cls.ben)
+        cls.late.participants.add(cls.ben)
+
+    def setUp(self):
+        self.client.force_login(self.organizer)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_event_attendees_csv(self):
+        response = self.client.get(reverse('event-attendees-export', args=[self.early.id]),
+                                   {'columns': 'username,email'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(self.read(response).splitlines(),
+                         ['username,email', 'ann,ann@example.com', 'ben,ben@example.com'])
+
+    def test_csv_cells_cannot_become_formulas(self):
+        Event.objects.filter(pk=self.early.pk).update(name='=HYPERLINK("http://evil")', location='@SUM(A1)')
+        response = self.client.get(reverse('event-attendees-export', args=[self.early.id]),
+                                   {'columns': 'event_name,location,username'})
+        self.assertEqual(self.read(response).splitlines()[1],
+                         '"\'=HYPERLINK(""http://evil"")",\'@SUM(A1),ann')
+
+    def test_roster_ndjson_with_date_range(self):
+        response = self.client.get(reverse('roster-export'), {'format': 'ndjson', 'date_from': '2030-03-01'})
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(rows, [{
+            'event_id': self.late.id, 'event_name': 'Late', 'event_date': '2030-06-01', 'event_time': '09:00:00',
+            'user_id': self.ben.id, 'username': 'ben', 'email': 'ben@example.com',
+        }])
+
+    def test_rejects_unknown_columns_and_participants(self):
+        self.assertEqual(self.client.get(reverse('roster-export'), {'columns': 'password'}).status_code, 400)
+        self.client.force_login(self.ann)
+        self.assertEqual(self.client.get(reverse('roster-export')).status_code, 302)
+
+
+class SeedAndBenchmarkTests(TestCase):
+    def test_seed_is_reproducible_and_idempotent(self):
+        first = seed(participants=30, organizers=2, categories=3, events=10, max_rsvps=5, seed=7)
+        names = list(Event.objects.order_by('id').values_list('name', flat=True))
+        self.assertEqual(seed(participants=30, organizers=2, categories=3, events=10, max_rsvps=5, seed=7), first)
+        self.assertEqual(list(Event.objects.order_by('id').values_list('name', flat=True)), names)
+        self.assertEqual(stats.get_counts()['participants'], 30)
+        event = Event.objects.order_by('id').first()
+        self.assertEqual(event.rsvp_count, event.participants.count())
+
+    def test_benchmark_covers_routes_and_flags_regressions(self):
+        seed(participants=10, organizers=1, categories=2, events=5, max_rsvps=3, seed=1)
+        skipped = []
+        results = benchmark.run(iterations=2, roles=('participant', 'admin'), skipped=skipped)
+        self.assertIn('event-list|participant', results)
+        self.assertIn('user-list|admin', results)
+        self.assertIn('user-calendar-feed|participant', results)
+        # Nothing to fill a series route with yet, and that is reported
+        self.assertIn('occurrence-update', skipped)
+
+        EventSeries.objects.create(name='Weekly', description='-', time=time(18), location='Lab',
+                                   category=Category.objects.first(), start_date=date(2030, 1, 1))
+        series = benchmark.run(iterations=1, roles=('admin',), routes=['occurrence-update', 'series-update'])
+        self.assertEqual(series['occurrence-update|admin']['status'], 200)
+        self.assertEqual(series['series-update|admin']['status'], 200)
+        self.assertTrue(all(row['status'] < 500 for row in results.values()))
+
+        baseline = {key: dict(row) for key, row in results.items()}
+        self.assertEqual(benchmark.compare(results, baseline), [])
+        baseline['event-list|participant']['queries'] -= 1
+        self.assertEqual(len(benchmark.compare(results, baseline)), 1)
+
+
+@override_settings(REQUEST_METRICS=True, METRICS_TOKEN='')
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.user = make_participant('alice')
+        self.client.force_login(self.user)
+
+    def test_server_timing_and_histograms(self):
+        response = self.client.get(reverse('event-list'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+        # Only admins may scrape without a token
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'pass12345'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('events_request_db_queries_count{view="event-list"} 1', body)
+        self.assertIn('events_request_duration_seconds_bucket{view="event-list",le="+Inf"} 1', body)
+        self.assertIn('events_response_size_bytes_sum{view="event-list"}', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_protects_metrics(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_repeated_statements_are_counted(self):
+        sample = metrics.RequestSample()
+        for _ in range(metrics.DUPLICATE_QUERY_THRESHOLD):
+            sample(lambda *args: None, 'SELECT %s', (1,), False, {})
+        sample(lambda *args: None, 'SELECT 2', (), False, {})
+        self.assertEqual((sample.query_count, sample.duplicates), (metrics.DUPLICATE_QUERY_THRESHOLD + 1, 4))
+        metrics.registry.record('event-list', sample)
+        self.assertIn('events_request_n_plus_one_total{view="event-list"} 1', metrics.registry.render())
+
+    def test_middleware_runs_in_async_chains(self):
+        async def get_response(request):
+            await sync_to_async(Category.objects.count)()
+            return HttpResponse('ok')
+
+        middleware = metrics.RequestMetricsMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/events/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('event-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'pass12345'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertNotIn('events_request_duration_seconds', body)
+        self.assertIn('events_throttle_allowed_total', body)
+
+
+@shared_cache
+class ParticipantDirectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Tech', description='Tech talks')
+        cls.past = Event.objects.create(
+            name='Past', description='-', date=date(2000, 1, 1), time=time(9), location='Hall', category=cls.category)
+        cls.soon = Event.objects.create(
+            name='Soon', description='-', date=date(2090, 1, 1), time=time(9), location='Hall', category=cls.category)
+        cls.later = Event.objects.create(
+            name='Later', description='-', date=date(2091, 1, 1), time=time(9), location='Hall', category=cls.category)
+        group, _ = Group.objects.get_or_create(name='Participant')
+        cls.users = User.objects.bulk_create([
+            User(username=f'user{i:02d}', email=f'user{i:02d}@example.com', profile_image_variants=[],
+                 is_participant_member=True)
+            for i in range(60)
+        ])
+        User.groups.through.objects.bulk_create([
+            User.groups.through(customuser_id=user.pk, group_id=group.pk) for user in cls.users
+        ])
+        # Not a participant, so never listed
+        User.objects.create_user('user60', 'user60@example.com', 'pass12345')
+        cls.past.participants.add(cls.users[0])
+        cls.later.participants.add(cls.users[0])
+        cls.soon.participants.add(cls.users[0], cls.users[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.users[0])
+
+    def test_directory_is_paginated_and_annotated(self):
+        self.client.get(reverse('participant-participants-list'))
+        # one query for the page with its aggregates; the session and user
+        # are cached
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('participant-participants-list'))
+        page = response.context['page']
+        self.assertEqual(len(page), 50)
+        first, second, third = page.object_list[:3]
+        self.assertEqual((first.rsvp_total, first.next_event_name), (3, 'Soon'))
+        self.assertEqual((second.rsvp_total, second.next_event_date), (1, date(2090, 1, 1)))
+        self.assertEqual((third.rsvp_total, third.next_event_name), (0, None))
+
+        rest = self.client.get(reverse('participant-participants-list'), {'after': page.next_cursor}).context['page']
+        self.assertEqual([u.username for u in rest], [f'user{i:02d}' for i in range(50, 60)])
+
+    def test_events_fragment_pages_lazily(self):
+        url = reverse('participant-events-fragment', args=[self.users[0].id])
+        with mock.patch('events.views.PARTICIPANT_EVENTS_PAGE_SIZE', 2):
+            response = self.client.get(url)
+            self.assertEqual([e.name for e in response.context['page']], ['Past', 'Soon'])
+            self.assertContains(response, 'data-more')
+            more = self.client.get(url, {'after': response.context['page'].next_cursor})
+        self.assertEqual([e.name for e in more.context['page']], ['Later'])
+        self.assertNotContains(more, 'data-more')
+
+    def test_admin_directory_uses_same_pagination(self):
+        admin = User.objects.create_superuser('root', 'root@example.com', 'pass12345')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('participant-list'))
+        self.assertEqual(len(response.context['page']), 50)
+        self.assertContains(response, 'Soon')
+
+
+class UserListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('root', 'root@example.com', 'pass12345')
+        self.organizers, _ = Group.objects.get_or_create(name='Organizer')
+        self.client.force_login(self.admin)
+
+    def test_role_flags_follow_membership(self):
+        user = make_participant('alice')
+        user.groups.add(self.organizers)
+        user.refresh_from_db()
+        self.assertEqual((user.is_organizer_member, user.is_participant_member), (True, True))
+
+        stale = User.objects.get(pk=user.pk)
+        self.organizers.user_set.remove(user)
+        stale.first_name = 'Alice'
+        stale.save()
+        user.refresh_from_db()
+        self.assertFalse(user.is_organizer_member)
+        stale.save(update_fields=['first_name', 'is_organizer_member'])
+        user.refresh_from_db()
+        self.assertFalse(user.is_organizer_member)
+
+        participants = Group.objects.get(name='Participant')
+        participants.name = 'Attendee'
+        participants.save()
+        user.refresh_from_db()
+        self.assertFalse(user.is_participant_member)
+
+        user.groups.add(self.organizers)
+        self.organizers.delete()
+        user.refresh_from_db()
+        self.assertFalse(user.is_organizer_member)
+
+    def test_role_filter_and_prefix_search(self):
+        ann = make_participant('ann')
+        ann.groups.add(self.organizers)
+        make_participant('anna')
+        bob = User.objects.create_user('bob', 'annex@example.com', 'pass12345')
+        bob.groups.add(self.organizers)
+
+        def usernames(**params):
+            return [u.username for u in self.client.get(reverse('user-list'), params).context['page']]
+
+        # A user in two groups is listed once
+        self.assertEqual(usernames(role='participant'), ['ann', 'anna'])
+        self.assertEqual(usernames(role='organizer'), ['ann', 'bob'])
+        self.assertEqual(usernames(role='organizer', q='ann'), ['ann', 'bob'])
+        self.assertEqual(usernames(role='participant', q='anna'), ['anna'])
+        self.assertEqual(usernames(role='admin'), ['root'])
+        self.assertEqual(usernames(q='b'), ['bob'])
+
+    def test_list_is_keyset_paginated(self):
+        with mock.patch('events.views.USER_LIST_PAGE_SIZE', 2):
+            for name in ('u1', 'u2', 'u3'):
+                make_participant(name)
+            first = self.client.get(reverse('user-list'), {'role': 'participant'}).context['page']
+            second = self.client.get(
+                reverse('user-list'), {'role': 'participant', 'after': first.next_cursor}).context['page']
+        self.assertEqual([u.username for u in first], ['u1', 'u2'])
+        self.assertEqual([u.username for u in second], ['u3'])
+        self.assertFalse(second.has_next)
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_participant('alice')
+        cls.other = make_participant('bob')
+        cls.category = Category.objects.create(name='Tech', description='Tech talks')
+        cls.event = Event.objects.create(
+            name='Meetup', description='-', date=date(2030, 1, 1), time=time(9),
+            location='Hall', category=cls.category, capacity=1,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def rows(self):
+        return self.client.get(reverse('event-list')).context['event_rows']
+
+    def test_rows_are_served_from_cache(self):
+        self.rows()
+        with mock.patch('events.fragments.render_to_string') as render_row:
+            html = self.rows()
+        render_row.assert_not_called()
+        self.assertIn('Meetup', html)
+        self.assertNotIn('csrfmiddlewaretoken', html)
+
+    def test_edits_and_rsvps_change_the_key(self):
+        self.assertIn('>RSVP<', self.rows().replace('\n', '').replace(' ', ''))
+        self.event.name = 'Renamed'
+        self.event.save()
+        self.assertIn('Renamed', self.rows())
+
+        self.category.name = 'Science'
+        self.category.save()
+        self.assertIn('Science', self.rows())
+
+        rsvp.rsvp(self.event, self.other)
+        html = self.rows()
+        self.assertIn('1 / 1', html)
+        self.assertIn('Join Waitlist', html)
+
+        rsvp.rsvp(self.event, self.user)
+        self.assertIn('Leave Waitlist', self.rows())
+
+    def test_role_is_part_of_the_key(self):
+        self.rows()
+        admin = User.objects.create_superuser('root', 'root@example.com', 'pass12345')
+        self.client.force_login(admin)
+        html = self.rows()
+        self.assertIn('Delete', html)
+        self.assertNotIn('Join Waitlist', html)
+
+    def test_dashboard_cards_follow_rsvps(self):
+        self.assertNotContains(self.client.get(reverse('participant-dashboard')), 'Meetup')
+        rsvp.rsvp(self.event, self.user)
+        response = self.client.get(reverse('participant-dashboard'))
+        self.assertContains(response, 'Meetup')
+        self.assertContains(response, 'Total RSVPs:</span> 1')
+
+
+class FileFragmentCacheTests(FragmentCacheTests):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': cache_dir,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+
+
+@shared_cache
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_participant('alice')
+        self.client.force_login(self.user)
+
+    def test_session_and_user_load_without_queries(self):
+        self.client.get(reverse('access-restricted'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('access-restricted'))
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_saves_and_deletes_write_through(self):
+        self.client.get(reverse('access-restricted'))
+        self.client.post(reverse('edit-profile'), {
+            'first_name': 'Alicia', 'last_name': 'Smith', 'email': 'alice@example.com', 'phone_number': '',
+        })
+        self.assertEqual(self.client.get(reverse('profile')).wsgi_request.user.first_name, 'Alicia')
+
+        User.objects.get(pk=self.user.pk).delete()
+        self.assertFalse(self.client.get(reverse('access-restricted')).wsgi_request.user.is_authenticated)
+
+    def test_password_change_ends_cached_session(self):
+        self.client.get(reverse('access-restricted'))
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('another-pass')
+        user.save()
+        self.assertFalse(self.client.get(reverse('access-restricted')).wsgi_request.user.is_authenticated)
+
+    def test_last_login_is_coalesced(self):
+        self.client.logout()
+        self.assertTrue(self.client.login(username='alice', password='pass12345'))
+        first = User.objects.get(pk=self.user.pk).last_login
+        self.assertIsNotNone(first)
+        self.client.logout()
+        self.client.login(username='alice', password='pass12345')
+        self.assertEqual(User.objects.get(pk=self.user.pk).last_login, first)
+
+        User.objects.filter(pk=self.user.pk).update(last_login=first - timedelta(hours=2))
+        self.client.login(username='alice', password='pass12345')
+        self.assertGreater(User.objects.get(pk=self.user.pk).last_login, first)
+
+
+    def test_cache_backed_auth_refuses_locmem(self):
+        # The tests' cache is locmem
+        self.assertEqual({error.id for error in checks.check_shared_cache(None)}, {'events.E001', 'events.E002'})
+        with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db',
+                               AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend']):
+            self.assertEqual(checks.check_shared_cache(None), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                                   'LOCATION': tempfile.gettempdir()}}):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_participant('alice')
+        cls.admin = User.objects.create_superuser('root', 'root@example.com', 'pass12345')
+        cls.category = Category.objects.create(name='Tech', description='Tech talks')
+        cls.event = Event.objects.create(
+            name='Meetup', description='-', date=date(2090, 1, 1), time=time(9), location='Hall',
+            category=cls.category,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_read_pages_under_asgi(self):
+        response = await self.async_client.get(reverse('public-home'))
+        self.assertContains(response, 'Meetup')
+        self.assertEqual(response.context['total_events'], 1)
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('event-list'), {'q': 'meet', 'category': self.category.pk})
+        self.assertContains(response, 'Meetup')
+        response = await self.async_client.get(reverse('admin-dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('admin-dashboard'))
+        self.assertEqual(response.context['counts']['events'], 1)
+
+    async def test_rsvp_round_trip_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('rsvp-event', args=[self.event.id]))
+        self.assertRedirects(response, reverse('event-list'), fetch_redirect_response=False)
+        self.assertTrue(await self.event.participants.filter(pk=self.user.pk).aexists())
+
+        response = await self.async_client.get(reverse('participant-dashboard'))
+        self.assertContains(response, 'Meetup')
+
+        await self.async_client.post(reverse('cancel-rsvp', args=[self.event.id]))
+        self.assertFalse(await self.event.participants.filter(pk=self.user.pk).aexists())
+
+    async def test_fragments_render_off_the_event_loop(self):
+        threads = []
+
+        def off_loop(render):
+            def wrapper(*args):
+                with self.assertRaises(RuntimeError):
+                    asyncio.get_running_loop()
+                threads.append(render.__name__)
+                return render(*args)
+            return wrapper
+
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(fragments, 'render_event_rows', off_loop(fragments.render_event_rows)), \
+                mock.patch.object(fragments, 'render_event_cards', off_loop(fragments.render_event_cards)):
+            self.assertContains(await self.async_client.get(reverse('event-list')), 'Meetup')
+            await self.async_client.get(reverse('participant-dashboard'))
+        self.assertEqual(threads, ['render_event_rows', 'render_event_cards'])
+
+
+class DeploymentBenchmarkTests(TransactionTestCase):
+    # Worker threads open their own connections, which must not queue
+    # behind a test transaction; with a replica configured they read from it
+    databases = '__all__'
+
+    def test_deployment_comparison_reports_both_handlers(self):
+        cache.clear()
+        results = benchmark.compare_deployments([reverse('public-home')], concurrency=2, requests=4)
+        self.assertEqual(results['wsgi']['requests'], 4)
+        self.assertEqual(results['asgi']['requests'], 4)
+        self.assertEqual(results['asgi']['errors'], 0)
+
+
+@mock.patch.dict(settings.DATABASES, {'replica': {}})
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = []
+
+    def middleware(self, write=False, marked=True):
+        def view(request):
+            self.seen.append(router.db_for_read(Event))
+            if write:
+                router.db_for_write(Event)
+                self.seen.append(router.db_for_read(Event))
+            return HttpResponse()
+
+        if marked:
+            view = routers.replica_reads(view)
+
+        # process_view runs inside the middleware's get_response, as in Django's handler
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+        middleware = routers.ReplicaRoutingMiddleware(get_response)
+        return middleware
+
+    def test_marked_views_read_from_replica_until_they_write(self):
+        response = self.middleware()(self.factory.get('/'))
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        response = self.middleware(write=True)(self.factory.get('/'))
+        self.assertEqual(self.seen, ['replica', 'replica', 'default'])
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], routers.REPLICA_STICKY_SECONDS)
+
+    def test_other_views_and_pinned_visitors_use_primary(self):
+        self.middleware(marked=False)(self.factory.get('/'))
+        pinned = self.factory.get('/')
+        pinned.COOKIES[routers.PIN_COOKIE] = '1'
+        self.middleware()(pinned)
+        response = self.middleware()(self.factory.post('/'))
+        self.assertEqual(self.seen, ['default'] * 3)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        # Outside a request everything uses the primary
+        self.assertEqual(router.db_for_read(Event), 'default')
+
+    def test_session_writes_do_not_pin(self):
+        @routers.replica_reads
+        def view(request):
+            router.db_for_write(Session)
+            self.seen.extend([router.db_for_read(Event), router.db_for_read(Session)])
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+        middleware = routers.ReplicaRoutingMiddleware(get_response)
+
+        response = middleware(self.factory.get('/'))
+        self.assertEqual(self.seen, ['replica', 'default'])
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_transactions_read_from_primary(self):
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.middleware()(self.factory.get('/'))
+        self.assertEqual(self.seen, ['default'])
+
+    def test_async_requests(self):
+        async def view(request):
+            self.seen.append(router.db_for_read(Event))
+            return HttpResponse()
+
+        view = routers.replica_reads(view)
+
+        async def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return await view(request)
+        middleware = routers.ReplicaRoutingMiddleware(get_response)
+
+        async_to_sync(middleware)(self.factory.get('/'))
+        self.assertEqual(self.seen, ['replica'])
+
+
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    Routing against a second SQLite database standing in for a lagging
+    replica. Not a TestCase: inside its transaction every read would go to
+    the primary.
+    """
+    @classmethod
+    def setUpClass(cls):
+        # The replica is an in-memory SQLite database that exists only for
+        # these tests; declaring it turns the routing middleware on
+        replica = connections.configure_settings({
+            **connections.settings, 'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        })['replica']
+        cls.enterClassContext(mock.patch.dict(settings.DATABASES, {'replica': replica}))
+        cls.enterClassContext(mock.patch.dict(connections.settings, {'replica': replica}))
+        cls.addClassCleanup(connections.__delitem__, 'replica')
+        call_command('migrate', database='replica', verbosity=0)
+        # Set after the alias exists, so the runner doesn't look for it
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Tech', description='-')
+        Event.objects.create(name='Meetup', description='-', date=date(2030, 1, 1), time=time(18),
+                             location='Hall', category=self.category)
+        # The replica hasn't seen the event yet, and has an older name
+        Category.objects.using('replica').create(pk=self.category.pk, name='Tech (old)', description='-')
+        self.url = reverse('category-calendar-feed', args=[self.category.pk])
+
+    def feed(self):
+        return b''.join(self.client.get(self.url).streaming_content).decode()
+
+    def test_marked_views_read_from_replica(self):
+        body = self.feed()
+        self.assertIn('X-WR-CALNAME:Tech (old)', body)
+        # The streamed rows are read from the replica too
+        self.assertNotIn('Meetup', body)
+
+    def test_writes_go_to_primary_and_pin_later_reads(self):
+        names = []
+
+        @routers.replica_reads
+        def view(request):
+            names.append(Category.objects.get(pk=self.category.pk).name)
+            Category.objects.filter(pk=self.category.pk).update(description='changed')
+            names.append(Category.objects.get(pk=self.category.pk).name)
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+        middleware = routers.ReplicaRoutingMiddleware(get_response)
+
+        response = middleware(RequestFactory().get('/'))
+        self.assertEqual(names, ['Tech (old)', 'Tech'])
+        self.assertEqual(Category.objects.using('default').get().description, 'changed')
+        self.assertEqual(Category.objects.using('replica').get().description, '-')
+
+        self.client.cookies[routers.PIN_COOKIE] = response.cookies[routers.PIN_COOKIE].value
+        body = self.feed()
+        self.assertIn('X-WR-CALNAME:Tech', body)
+        self.assertIn('Meetup', body)
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Tech', description='-')
+        self.event = Event.objects.create(name='Meetup, Q1', description='Line one\nLine two', date=date(2030, 1, 1),
+                                          time=time(18), location='Hall; B', category=self.category)
+        self.other = Event.objects.create(name='Workshop', description='-', date=date(2030, 1, 2), time=time(9),
+                                          location='Lab', category=self.category)
+        self.user = make_participant('alice')
+        rsvp.rsvp(self.event, self.user)
+        self.url = reverse('user-calendar-feed', args=[feeds.feed_token(self.user.pk)])
+
+    def body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_user_feed_lists_rsvped_events(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertIn('private', response['Cache-Control'])
+        body = self.body(response)
+        self.assertIn('SUMMARY:Meetup\\, Q1\r\n', body)
+        self.assertIn('DESCRIPTION:Line one\\nLine two\r\n', body)
+        self.assertIn('DTSTART:20300101T180000\r\n', body)
+        self.assertNotIn('Workshop', body)
+        self.assertEqual(self.client.get(self.url[:-6] + 'x.ics').status_code, 404)
+
+    def test_unchanged_feed_is_not_modified(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        rsvp.rsvp(self.other, self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Workshop', self.body(response))
+
+    def test_category_feed(self):
+        url = reverse('category-calendar-feed', args=[self.category.id])
+        first = self.client.get(url)
+        self.assertIn('public', first['Cache-Control'])
+        self.assertEqual(self.body(first).count('BEGIN:VEVENT'), 2)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.category.name = 'Technology'
+        self.category.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('CATEGORIES:Technology', self.body(response))
+        self.assertEqual(self.client.get(reverse('category-calendar-feed', args=[999])).status_code, 404)
+
+    def test_long_lines_are_folded(self):
+        folded = feeds.fold('SUMMARY:' + 'é' * 60)
+        lines = folded.split('\r\n')
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual(''.join(line[1:] if i else line for i, line in enumerate(lines)), 'SUMMARY:' + 'é' * 60)
+
+
+@shared_cache
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Tech', description='-')
+        self.event = Event.objects.create(name='Meetup', description='-', date=date(2030, 1, 1), time=time(18),
+                                          location='Hall', category=self.category, capacity=1)
+        self.user = make_participant('alice')
+        self.other = make_participant('bob')
+
+    def revalidate(self, url, response, **headers):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **headers)
+
+    def test_home_is_not_modified_until_content_changes(self):
+        url = reverse('public-home')
+        first = self.client.get(url)
+        self.assertNotIn('Last-Modified', first)
+        # Counters plus one aggregate per table; none joins the events table
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+        self.assertEqual(len(ctx), 5)
+        self.assertFalse([query for query in ctx.captured_queries if 'events_event"' in query['sql']
+                          and 'JOIN' in query['sql'].upper()])
+
+        self.category.name = 'Technology'
+        self.category.save()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_deleting_an_event_is_not_hidden_by_a_date(self):
+        Event.objects.create(name='Later', description='-', date=date(2030, 2, 1), time=time(9),
+                             location='Hall', category=self.category)
+        url = reverse('public-home')
+        since = http_date(clock.time() + 60)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+        first = self.client.get(url)
+        self.event.delete()
+        # No timestamp moves on a delete, so only the ETag may validate
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_event_list_validators_follow_rsvps_and_viewer(self):
+        url = reverse('event-list')
+        self.client.force_login(self.user)
+        # The first visit sets the CSRF cookie the ETag covers
+        self.client.get(url)
+        first = self.client.get(url)
+        self.assertIn('private', first['Cache-Control'])
+        with self.assertNumQueries(5):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+        self.assertNotIn('Last-Modified', first)
+        self.assertNotEqual(self.client.get(url, {'q': 'meet'})['ETag'], first['ETag'])
+
+        rsvp.rsvp(self.event, self.other)
+        second = self.revalidate(url, first)
+        self.assertEqual(second.status_code, 200)
+        # Joining the waitlist doesn't touch the event but changes the row
+        rsvp.rsvp(self.event, self.user)
+        self.assertEqual(self.revalidate(url, second).status_code, 200)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.revalidate(url, second).status_code, 200)
+
+    def test_new_csrf_secret_changes_the_etag(self):
+        client = Client(enforce_csrf_checks=True)
+
+        def csrf_token(response):
+            return re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode())[1]
+
+        def log_in():
+            page = client.get(reverse('login'))
+            client.post(reverse('login'), {
+                'username': 'alice', 'password': 'pass12345', 'csrfmiddlewaretoken': csrf_token(page)})
+
+        rsvp.rsvp(self.event, self.user)
+        url = reverse('event-list')
+        log_in()
+        first = client.get(url)
+        # Signing in again rotates the secret the page's forms were built on
+        log_in()
+        second = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=second['ETag']).status_code, 304)
+        response = client.post(reverse('cancel-rsvp', args=[self.event.id]),
+                               {'csrfmiddlewaretoken': csrf_token(second)})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(self.event.participants.exists())
+
+
+@shared_cache
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_participant('alice')
+        cls.tech = Category.objects.create(name='Tech', description='-')
+        cls.art = Category.objects.create(name='Art', description='-')
+        start = date(2030, 1, 1)
+        cls.events = [
+            Event.objects.create(name=f'Event {i}', description='-', date=start + timedelta(days=i), time=time(9),
+                                 location='Hall', category=cls.tech if i % 2 else cls.art)
+            for i in range(5)
+        ]
+        cls.events[1].participants.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_sparse_fields_and_cursor_pagination(self):
+        first = self.get('api-events', fields='id,name,category_name', limit=2)
+        self.assertEqual(first['data'], [
+            {'id': self.events[0].id, 'name': 'Event 0', 'category_name': 'Art'},
+            {'id': self.events[1].id, 'name': 'Event 1', 'category_name': 'Tech'},
+        ])
+        ids = [row['id'] for row in first['data']]
+        cursor = first['next_cursor']
+        while cursor:
+            page = self.get('api-events', fields='id', limit=2, cursor=cursor)
+            ids += [row['id'] for row in page['data']]
+            cursor = page['next_cursor']
+        self.assertEqual(ids, [event.id for event in self.events])
+        self.assertEqual(self.get('api-events', fields='id', limit=5)['next_cursor'], None)
+        self.assertEqual(len(self.get('api-events', category=self.tech.id)['data']), 2)
+
+    def test_updated_since_returns_changes_in_order(self):
+        since = timezone.now()
+        self.events[3].name = 'Renamed'
+        self.events[3].save()
+        rsvp.rsvp(self.events[0], self.user)
+        page = self.get('api-events', fields='id,name,updated_at', updated_since=since.isoformat())
+        self.assertEqual([row['id'] for row in page['data']], [self.events[3].id, self.events[0].id])
+        # updated_at keeps full precision, so it can be fed back in
+        latest = page['data'][-1]['updated_at']
+        self.assertEqual(self.get('api-events', updated_since=latest)['data'], [])
+
+    def test_deletions_are_synced_from_tombstones(self):
+        since = timezone.now().isoformat()
+        self.assertEqual(self.client.get(reverse('api-deleted-events')).status_code, 400)
+        rsvp.cancel(self.events[1], self.user)
+        # Deleting Art takes events 0 and 2 with it
+        event_ids, category_id = [self.events[i].id for i in (4, 0, 2)], self.art.id
+        self.events[4].delete()
+        self.art.delete()
+        deleted = [row['id'] for row in self.get('api-deleted-events', updated_since=since)['data']]
+        self.assertEqual(sorted(deleted), sorted(event_ids))
+        self.assertEqual(self.get('api-deleted-categories', updated_since=since)['data'][0]['id'], category_id)
+        cancelled = self.get('api-my-cancelled-rsvps', updated_since=since)['data']
+        self.assertEqual([row['id'] for row in cancelled], [self.events[1].id])
+        self.assertEqual(self.get('api-my-cancelled-rsvps', updated_since=cancelled[0]['deleted_at'])['data'], [])
+
+        self.client.force_login(make_participant('bob'))
+        self.assertEqual(self.get('api-my-cancelled-rsvps', updated_since=since)['data'], [])
+        old = (timezone.now() - timedelta(days=api.API_DELETION_RETENTION_DAYS + 1)).isoformat()
+        self.assertEqual(self.client.get(reverse('api-deleted-events'), {'updated_since': old}).status_code, 410)
+
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=365)):
+            call_command('cleanup', stdout=StringIO())
+        self.assertFalse(Deletion.objects.exists())
+
+    def test_categories_and_my_rsvps(self):
+        self.assertEqual([row['name'] for row in self.get('api-categories')['data']], ['Art', 'Tech'])
+        self.assertEqual(self.get('api-my-rsvps', fields='id')['data'], [{'id': self.events[1].id}])
+
+    def test_errors(self):
+        for params in ({'fields': 'id,secret'}, {'cursor': 'garbage'}, {'limit': 0}, {'updated_since': 'soon'}):
+            response = self.client.get(reverse('api-events'), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api-events')).status_code, 401)
+
+    def test_page_is_one_query(self):
+        self.client.get(reverse('api-events'))
+        with self.assertNumQueries(1):
+            b''.join(self.client.get(reverse('api-events'), {'fields': 'id,category_name', 'limit': 1000}).streaming_content)
+
+
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.root)
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.root))
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def setUp(self):
+        self.hashed = staticfiles_storage.stored_name('css/output.css')
+        self.url = '/static/' + self.hashed
+        with open(os.path.join(self.root, 'css', 'output.css'), 'rb') as original:
+            self.original = original.read()
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_collectstatic_fingerprints_and_precompresses(self):
+        self.assertRegex(self.hashed, r'^css/output\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(os.path.join(self.root, self.hashed + '.gz')))
+        self.assertEqual(staticfiles.brotli is not None, os.path.exists(os.path.join(self.root, self.hashed + '.br')))
+        self.assertContains(self.client.get(reverse('public-home')), self.hashed)
+
+    def test_best_variant_with_immutable_caching(self):
+        best = 'br' if staticfiles.brotli is not None else 'gzip'
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], best)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertLess(len(self.body(response)), len(self.original))
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=1.0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(self.body(response)), self.original)
+
+        response = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(self.body(response), self.original)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_refused_encodings_are_not_sent(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(self.body(response), self.original)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='*;q=0.5, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_middleware_runs_in_async_chains(self):
+        async def get_response(request):
+            return HttpResponse('app')
+
+        middleware = staticfiles.StaticFilesMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        factory = RequestFactory()
+        response = async_to_sync(middleware)(factory.get(self.url, HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(gzip.decompress(self.body(response)), self.original)
+        self.assertEqual(async_to_sync(middleware)(factory.get('/events/')).content, b'app')
+
+    def test_unhashed_names_revalidate(self):
+        response = self.client.get('/static/css/output.css')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={staticfiles.MUTABLE_MAX_AGE}')
+        self.assertEqual(self.client.get('/static/css/missing.css').status_code, 404)
+
+    def test_benchmark_reports_savings(self):
+        results = benchmark.static_transfer(['css/output.css'], iterations=2)['css/output.css']
+        self.assertEqual(results['before']['bytes'], len(self.original))
+        self.assertLess(results['gzip']['bytes'], results['identity']['bytes'])
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.data = make_image(64, 48)
+        self.name = default_storage.save('events/photo.jpg', BytesIO(self.data))
+        self.url = settings.MEDIA_URL + self.name
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_serves_with_validators_and_cached_metadata(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn(f'max-age={media.MEDIA_MAX_AGE}', response['Cache-Control'])
+        self.assertEqual(self.body(response), self.data)
+
+        with mock.patch.object(media.os, 'stat', side_effect=AssertionError('stat called')), \
+                self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            again = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(again.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.data)}')
+        self.assertEqual(self.body(response), self.data[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(self.body(response), self.data[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+        # An invalid range is ignored, not refused
+        response = self.client.get(self.url, HTTP_RANGE='bytes=19-10')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+
+        # A stale If-Range gets the whole, current file
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+
+    def test_sendfile_offload(self):
+        with mock.patch.object(media, 'MEDIA_SENDFILE', 'x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.name)
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+        with mock.patch.object(media, 'MEDIA_SENDFILE', 'x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, self.name))
+
+    def test_missing_outside_and_rewritten_files(self):
+        self.assertEqual(self.client.get(settings.MEDIA_URL + 'events/nope.jpg').status_code, 404)
+        self.assertEqual(self.client.get(settings.MEDIA_URL + 'events/../../etc/passwd').status_code, 404)
+        self.assertEqual(self.client.get(settings.MEDIA_URL + 'other/file.txt').status_code, 404)
+
+        # Rewritten variants are re-read rather than served from stale metadata
+        widths = images.render_variants(self.name)
+        variant = images.variant_name(self.name, widths[0], 'jpg')
+        self.assertEqual(self.client.get(settings.MEDIA_URL + variant).status_code, 200)
+        self.assertIsNotNone(cache.get(media.metadata_key(variant)))
+        images.render_variants(self.name)
+        self.assertIsNone(cache.get(media.metadata_key(variant)))
+
+        default_storage.delete(self.name)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_files_changed_by_other_processes(self):
+        # Served once, then rewritten where this process's cache can't hear of it
+        first = self.client.get(self.url)
+        self.body(first)
+        data = make_image(80, 60)
+        with open(os.path.join(self.media_root, self.name), 'wb') as handle:
+            handle.write(data)
+        os.utime(os.path.join(self.media_root, self.name), (1, 1))
+        response = self.client.get(self.url)
+        self.assertEqual(self.body(response), data)
+        self.assertEqual(response['ETag'], media.etag(len(data), 1))
+        self.assertEqual(cache.get(media.metadata_key(self.name))[:2], (len(data), 1))
+
+        # A miss is only remembered briefly
+        with mock.patch.object(media, 'cache', wraps=cache) as spy:
+            self.client.get(settings.MEDIA_URL + 'variants/later.jpg')
+        spy.set.assert_called_once_with(media.metadata_key('variants/later.jpg'), media.MISSING,
+                                        media.MEDIA_MISSING_TIMEOUT)
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pass12345')
+
+    def login(self, username='alice', **extra):
+        return self.client.post(reverse('login'), {'username': username, 'password': 'wrong'}, **extra)
+
+    def test_login_is_rejected_before_hashing_or_queries(self):
+        limits = {'login': (('ip', 100, 60), ('username', 3, 60))}
+        with mock.patch.object(throttle, 'THROTTLE_LIMITS', limits):
+            for _ in range(3):
+                self.assertEqual(self.login().status_code, 200)
+            with mock.patch('events.views.authenticate') as authenticate, self.assertNumQueries(0):
+                response = self.login()
+            self.assertEqual(response.status_code, 429)
+            self.assertIn(int(response['Retry-After']), range(1, 21))
+            authenticate.assert_not_called()
+            # Other accounts from the same address still get through
+            self.assertNotEqual(self.login('bob').status_code, 429)
+
+        rendered = metrics.registry.render()
+        self.assertIn('events_throttle_allowed_total{scope="login"} 4', rendered)
+        self.assertIn('events_throttle_rejected_total{bucket="login:username"} 1', rendered)
+
+    @override_settings(REQUEST_METRICS=False, METRICS_TOKEN='secret')
+    def test_counters_are_served_without_request_metrics(self):
+        with mock.patch.object(throttle, 'THROTTLE_LIMITS', {'login': (('username', 1, 60),)}):
+            self.login()
+            self.assertEqual(self.login().status_code, 429)
+        body = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn('events_throttle_allowed_total{scope="login"} 1', body)
+        self.assertIn('events_throttle_rejected_total{bucket="login:username"} 1', body)
+
+    def test_buckets_refill_and_key_by_forwarded_address(self):
+        limits = {'signup': (('ip', 2, 60),)}
+        request = RequestFactory().post('/signup/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.0.9')
+        with mock.patch.object(throttle, 'THROTTLE_LIMITS', limits), \
+                mock.patch.object(throttle, 'THROTTLE_PROXY_COUNT', 1):
+            self.assertEqual(throttle.client_ip(request), '10.0.0.9')
+            self.assertIsNone(throttle.take(request, 'signup', now=1000))
+            self.assertIsNone(throttle.take(request, 'signup', now=1000))
+            self.assertEqual(throttle.take(request, 'signup', now=1010), ('ip', 20))
+            # One token back every 30 seconds
+            self.assertIsNone(throttle.take(request, 'signup', now=1030))
+
+    def test_signup_and_password_reset_are_limited(self):
+        limits = {'signup': (('ip', 1, 60),), 'password_reset': (('ip', 10, 60), ('email', 1, 60))}
+        with mock.patch.object(throttle, 'THROTTLE_LIMITS', limits):
+            self.client.post(reverse('signup'), {'username': ''})
+            self.assertEqual(self.client.post(reverse('signup'), {'username': ''}).status_code, 429)
+
+            self.client.post(reverse('password_reset'), {'email': 'alice@example.com'})
+            response = self.client.post(reverse('password_reset'), {'email': 'ALICE@example.com'})
+            self.assertEqual(response.status_code, 429)
+
+
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.category = Category.objects.create(name='Tech', description='-')
+        self.user = make_participant('alice')
+
+    def make_series(self, **fields):
+        fields = {
+            'name': 'Weekly meetup', 'description': '-', 'time': time(18), 'location': 'Lab',
+            'category': self.category, 'start_date': self.today, **fields,
+        }
+        return EventSeries.objects.create(**fields)
+
+    def dates(self, series, start, end):
+        return list(recurrence.rule_dates(series, start, end))
+
+    def test_rules_expand_within_the_window(self):
+        weekly = EventSeries(start_date=date(2024, 1, 3), frequency=EventSeries.WEEKLY, interval=2, weekdays='MO,WE')
+        self.assertEqual(self.dates(weekly, date(2024, 1, 1), date(2024, 1, 31)),
+                         [date(2024, 1, 3), date(2024, 1, 15), date(2024, 1, 17), date(2024, 1, 29), date(2024, 1, 31)])
+        # Entered at the window's period, decades after the start, yet the
+        # same dates as walking the rule from the start
+        walked = EventSeries(start_date=weekly.start_date, frequency=weekly.frequency, interval=2,
+                             weekdays='MO,WE', count=10 ** 6)
+        window = (date(2074, 1, 1), date(2074, 1, 31))
+        self.assertEqual(self.dates(weekly, *window), self.dates(walked, *window))
+        self.assertEqual(len(self.dates(weekly, *window)), 4)
+
+        monthly = EventSeries(start_date=date(2024, 1, 31), frequency=EventSeries.MONTHLY, interval=1)
+        self.assertEqual(self.dates(monthly, date(2024, 1, 1), date(2024, 5, 31)),
+                         [date(2024, 1, 31), date(2024, 3, 31), date(2024, 5, 31)])
+
+        daily = EventSeries(start_date=date(2024, 1, 1), frequency=EventSeries.DAILY, interval=3, count=4)
+        self.assertEqual(self.dates(daily, date(2024, 1, 5), date(2024, 12, 31)), [date(2024, 1, 7), date(2024, 1, 10)])
+        daily.count, daily.until = None, date(2024, 1, 8)
+        self.assertEqual(self.dates(daily, date(2024, 1, 1), date(2024, 12, 31)),
+                         [date(2024, 1, 1), date(2024, 1, 4), date(2024, 1, 7)])
+        self.assertEqual(recurrence.format_rule(weekly), 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE')
+
+    def test_event_list_merges_occurrences_across_pages(self):
+        for name, days in (('Alpha', 1), ('Bravo', 8), ('Charlie', 15), ('Delta', 22)):
+            Event.objects.create(name=name, description='-', date=self.today + timedelta(days=days), time=time(9),
+                                 location='Hall', category=self.category)
+        self.make_series(start_date=self.today + timedelta(days=2), frequency=EventSeries.WEEKLY, count=4)
+        self.client.force_login(self.user)
+        url = reverse('event-list')
+
+        with mock.patch('events.views.EVENT_LIST_PAGE_SIZE', 2):
+            first = self.client.get(url)
+            html = first.content.decode()
+            self.assertEqual(html.count('Weekly meetup'), 1)
+            self.assertLess(html.index('Alpha'), html.index('Weekly meetup'))
+            self.assertLess(html.index('Weekly meetup'), html.index('Bravo'))
+
+            second = self.client.get(url, {'after': first.context['page'].next_cursor})
+            self.assertEqual(second.content.decode().count('Weekly meetup'), 3)
+
+            back = self.client.get(url, {'before': second.context['page'].previous_cursor})
+            self.assertEqual(back.content.decode().count('Weekly meetup'), 1)
+
+    def test_occurrence_rsvps_and_exceptions_are_stored_only_when_needed(self):
+        series = self.make_series(capacity=1)
+        day = self.today.isoformat()
+        self.assertFalse(Occurrence.objects.exists())
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('occurrence-rsvp', args=[series.id, day])).status_code, 405)
+        OutboundEmail.objects.all().delete()
+        self.client.post(reverse('occurrence-rsvp', args=[series.id, day]))
+        occurrence = Occurrence.objects.get()
+        self.assertEqual((occurrence.date, occurrence.rsvp_count), (self.today, 1))
+        self.assertEqual(OutboundEmail.objects.get().subject, 'RSVP Confirmation for Weekly meetup')
+        self.assertContains(self.client.get(reverse('participant-dashboard')), 'Weekly meetup')
+
+        other = make_participant('bob')
+        self.assertEqual(rsvp.rsvp_occurrence(series, self.today, other), rsvp.OCCURRENCE_FULL)
+        self.client.post(reverse('occurrence-cancel-rsvp', args=[series.id, day]))
+        self.assertFalse(Occurrence.objects.exists())
+        # Dates off the rule don't exist
+        tomorrow = (self.today + timedelta(days=1)).isoformat()
+        self.assertEqual(self.client.post(reverse('occurrence-rsvp', args=[series.id, tomorrow])).status_code, 404)
+
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='x')
+        self.client.force_login(admin)
+        self.client.post(reverse('occurrence-update', args=[series.id, day]), {'cancelled': 'on', 'location': ''})
+        self.assertTrue(Occurrence.objects.get().cancelled)
+        self.assertEqual(rsvp.rsvp_occurrence(series, self.today, other), rsvp.OCCURRENCE_CANCELLED)
+        edit_url = reverse('occurrence-update', args=[series.id, day])
+        self.assertNotContains(self.client.get(reverse('event-list')), edit_url)
+        self.client.post(edit_url, {'location': ''})
+        self.assertFalse(Occurrence.objects.exists())
+        self.assertContains(self.client.get(reverse('event-list')), edit_url)
+
+    def test_deleting_an_attendee_frees_their_occurrence_seat(self):
+        series = self.make_series(capacity=1, frequency=EventSeries.DAILY)
+        tomorrow = self.today + timedelta(days=1)
+        other, late = make_participant('bob'), make_participant('carol')
+        self.assertEqual(rsvp.rsvp_occurrence(series, self.today, self.user), rsvp.RSVPED)
+        self.assertEqual(rsvp.rsvp_occurrence(series, self.today, other), rsvp.OCCURRENCE_FULL)
+        Occurrence.objects.create(series=series, date=tomorrow, location='Annex')
+        self.assertEqual(rsvp.rsvp_occurrence(series, tomorrow, self.user), rsvp.RSVPED)
+
+        self.user.delete()
+        # The plain date had only that RSVP; the moved one is kept as an exception
+        self.assertFalse(Occurrence.objects.filter(date=self.today).exists())
+        self.assertEqual(Occurrence.objects.get(date=tomorrow).rsvp_count, 0)
+        self.assertEqual(rsvp.rsvp_occurrence(series, self.today, other), rsvp.RSVPED)
+        self.assertEqual(rsvp.rsvp_occurrence(series, tomorrow, late), rsvp.RSVPED)
+
+    def test_series_form_and_dashboard_counts(self):
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='x')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('series-create'), {
+            'name': 'Standup', 'description': '-', 'category': self.category.id, 'time': '09:00',
+            'location': 'Room 1', 'start_date': self.today.isoformat(), 'frequency': 'weekly',
+            'interval': 1, 'weekdays': 'xx',
+        })
+        self.assertContains(response, 'Unknown weekday')
+        response = self.client.post(reverse('series-create'), {
+            'name': 'Standup', 'description': '-', 'category': self.category.id, 'time': '09:00',
+            'location': 'Room 1', 'start_date': self.today.isoformat(), 'frequency': 'daily', 'interval': 1,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get(reverse('admin-dashboard')).context['counts']['today_events'], 1)
@@ -0,0 +1,95 @@
+import hashlib
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .metrics import registry
+
+# scope -> ((bucket, capacity, period in seconds), ...). A bucket holds
+# ``capacity`` tokens and refills completely over ``period``; a request
+# spends one token from every bucket in its scope.
+DEFAULT_THROTTLE_LIMITS = {
+    'login': (('ip', 20, 5 * 60), ('username', 10, 15 * 60)),
+    'signup': (('ip', 5, 60 * 60),),
+    'password_reset': (('ip', 5, 15 * 60), ('email', 3, 60 * 60)),
+}
+THROTTLE_LIMITS = {**DEFAULT_THROTTLE_LIMITS, **getattr(settings, 'THROTTLE_LIMITS', {})}
+# Reverse proxies in front of the app that append to X-Forwarded-For
+THROTTLE_PROXY_COUNT = getattr(settings, 'THROTTLE_PROXY_COUNT', 0)
+
+# Makes each take-from-buckets atomic within a process; workers sharing a
+# cache may let a few extra requests through when they race
+_lock = threading.Lock()
+
+
+def client_ip(request):
+    if THROTTLE_PROXY_COUNT:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        if len(forwarded) >= THROTTLE_PROXY_COUNT and forwarded[-THROTTLE_PROXY_COUNT]:
+            return forwarded[-THROTTLE_PROXY_COUNT]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+IDENTIFIERS = {
+    'ip': client_ip,
+    'username': lambda request: request.POST.get('username', '').strip().lower(),
+    'email': lambda request: request.POST.get('email', '').strip().lower(),
+}
+
+
+def bucket_key(scope, bucket, ident):
+    # Hashed so user-supplied names make safe, bounded cache keys
+    return f"throttle:{scope}:{bucket}:{hashlib.sha256(ident.encode()).hexdigest()[:32]}"
+
+
+def take(request, scope, now=None):
+    """
+    Spend a token from each of ``scope``'s buckets for this request. Return
+    ``None`` if allowed, else ``(bucket, seconds until a token is back)``;
+    a rejected request spends nothing.
+    """
+    now = time.time() if now is None else now
+    buckets = []
+    for bucket, capacity, period in THROTTLE_LIMITS[scope]:
+        ident = IDENTIFIERS[bucket](request)
+        if ident:
+            buckets.append((bucket, capacity, period, bucket_key(scope, bucket, ident)))
+    with _lock:
+        stored = cache.get_many([key for *_, key in buckets])
+        updates = {}
+        for bucket, capacity, period, key in buckets:
+            tokens, updated = stored.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * capacity / period)
+            if tokens < 1:
+                registry.record_throttle(scope, bucket)
+                return bucket, math.ceil(round((1 - tokens) * period / capacity, 6))
+            updates[key] = (tokens - 1, now, period)
+        for key, (tokens, updated, period) in updates.items():
+            # An expired bucket is a full one
+            cache.set(key, (tokens, updated), period)
+    registry.record_throttle(scope)
+    return None
+
+
+def rate_limited(scope):
+    """
+    Answer 429 once the client or account is out of tokens for ``scope``,
+    before the view does any password hashing or database work.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            rejected = take(request, scope)
+            if rejected is not None:
+                response = HttpResponse(
+                    "Too many attempts. Please try again later.", status=429, content_type='text/plain')
+                response['Retry-After'] = rejected[1]
+                return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
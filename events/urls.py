@@ -12,6 +12,7 @@ urlpatterns = [
     # path('logout/', views.custom_logout, name='logout'),
     path('logout/', CustomLogoutView.as_view(), name='logout'), 
     path('activate/<uidb64>/<token>/', views.activate_account, name='activate'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('access-restricted/', views.access_restricted, name='access-restricted'),
     path('profile/', ProfileView.as_view(), name='profile'),
     path('profile/edit/', EditProfileView.as_view(), name='edit-profile'),
@@ -22,6 +23,7 @@ urlpatterns = [
     
     # User list for admins
     path('users/', views.user_list, name='user-list'),
+    path('users/groups/', views.user_groups_assign, name='user-groups-assign'),
 
     # Redirect
     path('redirect-after-login/', views.redirect_after_login, name='redirect-after-login'),
@@ -38,6 +40,29 @@ urlpatterns = [
     path('events/create/', views.create_event, name='event-create'),
     path('events/<int:id>/edit/', views.update_event, name='event-update'),
     path('events/<int:id>/delete/', views.delete_event, name='event-delete'),
+    path('events/<int:id>/roster/', views.event_roster, name='event-roster'),
+    path('events/<int:event_id>/attendees/export/', views.export_event_attendees, name='event-attendees-export'),
+    path('events/rsvps/export/', views.export_roster, name='roster-export'),
+
+    # Recurring series
+    path('series/create/', views.create_series, name='series-create'),
+    path('series/<int:id>/edit/', views.update_series, name='series-update'),
+    path('series/<int:id>/delete/', views.delete_series, name='series-delete'),
+    path('series/<int:series_id>/<str:day>/edit/', views.update_occurrence, name='occurrence-update'),
+    path('series/<int:series_id>/<str:day>/rsvp/', views.rsvp_occurrence, name='occurrence-rsvp'),
+    path('series/<int:series_id>/<str:day>/cancel_rsvp/', views.cancel_occurrence_rsvp, name='occurrence-cancel-rsvp'),
+
+    # JSON API
+    path('api/v1/events/', views.api_events, name='api-events'),
+    path('api/v1/categories/', views.api_categories, name='api-categories'),
+    path('api/v1/me/rsvps/', views.api_my_rsvps, name='api-my-rsvps'),
+    path('api/v1/events/deleted/', views.api_deleted_events, name='api-deleted-events'),
+    path('api/v1/categories/deleted/', views.api_deleted_categories, name='api-deleted-categories'),
+    path('api/v1/me/rsvps/cancelled/', views.api_my_cancelled_rsvps, name='api-my-cancelled-rsvps'),
+
+    # Calendar feeds
+    path('calendar/<str:token>.ics', views.user_calendar_feed, name='user-calendar-feed'),
+    path('categories/<int:id>/calendar.ics', views.category_calendar_feed, name='category-calendar-feed'),
 
     # Category
     path('categories/', views.category_list, name='category-list'),
@@ -48,7 +73,9 @@ urlpatterns = [
     # Participant
     path('participants/', views.participant_list, name='participant-list'),
     path('participants/add/', views.participant_add, name='participant-add'),
+    path('participants/import/', views.participant_import, name='participant-import'),
     path('participants/<int:id>/', views.participant_detail, name='participant-detail'),
+    path('participants/<int:id>/events/', views.participant_events_fragment, name='participant-events-fragment'),
     path('participants/<int:id>/edit/', views.participant_edit, name='participant-edit'),
     path('participants/<int:id>/delete/', views.delete_participant, name='participant-delete'),
     path('participant/participants/', views.participant_list_view, name='participant-participants-list'),
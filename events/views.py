@@ -1,54 +1,114 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+import heapq
+import io
+from datetime import date, timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.template.response import TemplateResponse
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.models import Group
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.contrib.auth import authenticate, login
 from django.contrib import messages
-from .models import Event, Category
-from .forms import EventForm, CategoryForm, EditProfileForm, CustomPasswordChangeForm, CustomPasswordResetForm, CustomPasswordResetConfirmForm
+from .models import Event, EventSeries, Category, Deletion, Occurrence, WaitlistEntry
+from .forms import EventForm, EventSeriesForm, OccurrenceForm, EventFilterForm, UserFilterForm, RosterAddForm, RosterMoveForm, GroupAssignForm, CategoryForm, EditProfileForm, CustomPasswordChangeForm, CustomPasswordResetForm, CustomPasswordResetConfirmForm
 from django.utils.timezone import now
 from django.views.decorators.http import require_http_methods
-from django.db.models import Prefetch
-from django.utils.http import urlsafe_base64_decode
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.http import http_date, urlsafe_base64_decode
 from django.utils.encoding import force_str
 from django.contrib.auth.tokens import default_token_generator
 from django.views.generic import TemplateView, UpdateView
 from django.views import View
 from django.contrib.auth.views import LoginView, LogoutView, PasswordChangeView, PasswordResetView, PasswordResetConfirmView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth import get_user_model
+from .pagination import CursorPaginator
+from .roles import aget_roles, assign_groups, get_roles
+from .images import limit_image_uploads
+from .routers import replica_reads
+from .throttle import rate_limited
+from . import stats
+from . import recurrence
+from . import rsvp
+from .search import filter_events
+from .importer import import_participants
+from . import exports
+from . import metrics
+from . import api
+from . import conditional
+from . import feeds
+from . import fragments
+from . import media
 
 User = get_user_model()
 CustomUser = get_user_model()
 
 # Role checkers
 def is_admin(user):
-    return user.is_superuser
+    return get_roles(user).is_admin
 
 def is_organizer(user):
-    return user.groups.filter(name='Organizer').exists()
+    return get_roles(user).is_organizer
 
 def is_participant(user):
-    return user.groups.filter(name='Participant').exists()
+    return get_roles(user).is_participant
+
+def is_admin_or_organizer(user):
+    roles = get_roles(user)
+    return roles.is_admin or roles.is_organizer
 
 def is_admin_or_organizer_or_participant(user):
-    return is_admin(user) or is_organizer(user) or is_participant(user)
+    roles = get_roles(user)
+    return roles.is_admin or roles.is_organizer or roles.is_participant
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
+
+# The high-traffic read pages and the RSVP endpoints below are async: their
+# queries go through the async ORM, and templates are returned as
+# TemplateResponse so rendering (context processors included) runs in a worker
+# thread instead of on the event loop.
 
 # CBV for Public Home View
+@method_decorator(replica_reads, name='dispatch')
 class PublicHomeView(TemplateView):
     template_name = 'events/public_home.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['total_events'] = Event.objects.count()
-        context['total_participants'] = User.objects.filter(groups__name='Participant').count()
-        context['total_categories'] = Category.objects.count()
-        context['upcoming_events'] = Event.objects.filter(date__gte=now().date()).order_by('date')[:2]
-
-        return context
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        today = now().date()
+        counts, version, roles = await asyncio.gather(
+            stats.aget_counts(today), conditional.acontent_version(), aget_roles(user))
+        etag = conditional.validators(request, user, roles, version, today, sorted(counts.items()))
+        response = conditional.not_modified(request, user, etag)
+        if response is not None:
+            return response
+
+        upcoming = Event.objects.select_related('category').filter(date__gte=today).order_by('date', 'time')[:2]
+        upcoming_events = await alist(upcoming)
+        if version['series_total']:
+            end = today + timedelta(days=SERIES_LIST_DAYS)
+            occurrences = await recurrence.aoccurrences(recurrence.active_series(today, end), today, end, limit=2)
+            upcoming_events = list(heapq.merge(upcoming_events, occurrences, key=recurrence.sort_key))[:2]
+        context = self.get_context_data(**kwargs)
+        context['total_events'] = counts['events']
+        context['total_participants'] = counts['participants']
+        context['total_categories'] = counts['categories']
+        context['upcoming_events'] = upcoming_events
+
+        return conditional.set_validators(self.render_to_response(context), user, etag)
 
 # CBV for Signup View
+@method_decorator(rate_limited('signup'), name='post')
 class SignupView(View):
     template_name = "events/signup.html"
 
@@ -85,18 +145,19 @@ class SignupView(View):
             form_errors["password2"] = "Passwords do not match."
 
         if not form_errors:
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password=password1,
-                first_name=first_name,
-                last_name=last_name,
-                is_active=False
-            )
-            user.save()
-
-            participant_group, _ = Group.objects.get_or_create(name='Participant')
-            user.groups.add(participant_group)
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=username,
+                    email=email,
+                    password=password1,
+                    first_name=first_name,
+                    last_name=last_name,
+                    is_active=False
+                )
+                user.save()
+
+                participant_group, _ = Group.objects.get_or_create(name='Participant')
+                user.groups.add(participant_group)
 
             messages.success(request, "Account created successfully! Please check your email to activate your account.")
             return redirect('login')
@@ -124,6 +185,7 @@ def activate_account(request, uidb64, token):
         return render(request, "events/activation_invalid.html")
 
 # CBV for Custom Login Form
+@method_decorator(rate_limited('login'), name='post')
 class CustomLoginView(LoginView):
     template_name = 'events/login.html'
     
@@ -151,54 +213,61 @@ class CustomLogoutView(LogoutView):
     next_page = reverse_lazy('public-home')
 
 # CBV for Admin Dashboard View
-@method_decorator(user_passes_test(is_admin), name='dispatch')
+@method_decorator(replica_reads, name='dispatch')
+@method_decorator(user_passes_test(is_admin), name='get')
 class AdminDashboardView(TemplateView):
     template_name = 'events/admin_dashboard.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    async def get(self, request, *args, **kwargs):
         today = now().date()
-        context['today'] = today
-        context['counts'] = {
-            "events": Event.objects.count(),
-            "categories": Category.objects.count(),
-            "participants": User.objects.filter(groups__name="Participant").count(),
-            "groups": Group.objects.count(),
-            "today_events": Event.objects.filter(date=today).count(),
-        }
-        return context
+        # All dashboard totals come from one StatCounter query; series
+        # occurrences aren't stored, so today's are expanded and added
+        counts = await stats.aget_counts(today)
+        counts['today_events'] += len(
+            await recurrence.aoccurrences(recurrence.active_series(today, today), today, today))
+        context = self.get_context_data(today=today, counts=counts, **kwargs)
+        return self.render_to_response(context)
 
 # CBV for Organizer Dashboard View
 organizer_dashboard_decorator = [login_required, user_passes_test(is_organizer)]
-@method_decorator(organizer_dashboard_decorator, name='dispatch')
+@method_decorator(replica_reads, name='dispatch')
+@method_decorator(organizer_dashboard_decorator, name='get')
 class OrganizerDashboardView(TemplateView):
     template_name = 'events/organizer_dashboard.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['counts'] = {
-            "events": Event.objects.count(),
-            "categories": Category.objects.count(),
-            "participants": User.objects.filter(groups__name='Participant').count(),
-        }
-        return context
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(counts=await stats.aget_counts(), **kwargs)
+        return self.render_to_response(context)
 
 # Participant Dashboard
+@replica_reads
 @login_required
 @user_passes_test(is_participant)
-def participant_dashboard(request):
-    return render(request, 'events/participant_dashboard.html')
+async def participant_dashboard(request):
+    user = await request.auser()
+    events = await alist(user.rsvp_events.select_related('category').order_by(*EVENT_LIST_ORDERING))
+    # Only occurrences with RSVPs are stored, so the user's are all rows
+    stored = await alist(Occurrence.objects.filter(participants=user, cancelled=False)
+                         .select_related('series__category').order_by('date', 'series_id'))
+    occurrences = [recurrence.SeriesOccurrence(occurrence.series, occurrence.date, occurrence) for occurrence in stored]
+    # Fragment cache I/O and rendering are blocking
+    cards = await sync_to_async(fragments.render_event_cards)(
+        heapq.merge(events, occurrences, key=recurrence.sort_key))
+    return TemplateResponse(request, 'events/participant_dashboard.html', {
+        'event_cards': cards,
+        'calendar_url': request.build_absolute_uri(
+            reverse('user-calendar-feed', args=[feeds.feed_token(user.pk)])),
+    })
 
 # Participant-only participants list
+@replica_reads
 @login_required
 @user_passes_test(is_participant)
 def participant_list_view(request):
-    participants = User.objects.filter(groups__name='Participant').prefetch_related(
-        Prefetch('rsvp_events', queryset=Event.objects.all())
-    ).order_by('username')
-
+    page = participant_directory_page(request)
     return render(request, 'events/participant_list_view.html', {
-        'participants': participants,
+        'participants': page,
+        'page': page,
     })
 
 # Redirect after login
@@ -215,12 +284,80 @@ def redirect_after_login(request):
         return redirect('public-home')
 
 # Event Views
+EVENT_LIST_PAGE_SIZE = 25
+EVENT_LIST_ORDERING = ('date', 'time', 'id')
+# Series occurrences are listed from today (or the From filter) this many days ahead
+SERIES_LIST_DAYS = getattr(settings, 'SERIES_LIST_DAYS', 60)
+
+def annotate_rsvps(queryset, user):
+    RSVP = Event.participants.through
+    return queryset.annotate(
+        participant_count=F('rsvp_count'),
+        is_rsvped=Exists(RSVP.objects.filter(event_id=OuterRef('pk'), customuser_id=user.pk)),
+        is_waitlisted=Exists(WaitlistEntry.objects.filter(event_id=OuterRef('pk'), user_id=user.pk)),
+    )
+
+async def page_occurrences(page, filters, user):
+    """
+    Occurrences of recurring series that fall in the stretch of the event
+    list ``page`` covers: after the previous page's last event, up to this
+    page's last (or open-ended at either end). They are expanded for that
+    stretch only, within the date filters or the next SERIES_LIST_DAYS.
+    """
+    start = filters.get('date_from') or now().date()
+    end = filters.get('date_to') or start + timedelta(days=SERIES_LIST_DAYS)
+    series = recurrence.active_series(start, end)
+    if filters.get('category'):
+        series = series.filter(category=filters['category'])
+    if filters.get('q'):
+        q = filters['q']
+        series = series.filter(Q(name__icontains=q) | Q(location__icontains=q) | Q(description__icontains=q))
+    return await recurrence.aoccurrences(
+        series, start, end, user,
+        after=page.start_after[:2] if page.start_after else None,
+        through=page.end_at[:2] if page.end_at else None,
+    )
+
+@replica_reads
 @login_required
-def event_list(request):
-    events = Event.objects.select_related("category").prefetch_related("participants").all()
-    return render(request, "events/event_list.html", {"events": events})
+async def event_list(request):
+    user = await request.auser()
+    roles = await aget_roles(user)
+    # Validators come from aggregates, before the page is queried or rendered
+    if roles.is_participant:
+        version, waitlist = await asyncio.gather(conditional.acontent_version(), conditional.awaitlist_version(user))
+    else:
+        version, waitlist = await conditional.acontent_version(), None
+    etag = conditional.validators(request, user, roles, version, waitlist, now().date())
+    response = conditional.not_modified(request, user, etag)
+    if response is not None:
+        return response
+
+    filters = EventFilterForm(request.GET or None)
+    events = Event.objects.select_related("category")
+    # Validating the category choice queries the database
+    valid = await sync_to_async(filters.is_valid)()
+    if valid:
+        events = filter_events(events, **filters.cleaned_data)
+    events = annotate_rsvps(events, user)
+    paginator = CursorPaginator(events, EVENT_LIST_ORDERING, page_size=EVENT_LIST_PAGE_SIZE)
+    page = await paginator.aget_page(after=request.GET.get('after'), before=request.GET.get('before'))
+    rows = page
+    if version['series_total']:
+        occurrences = await page_occurrences(page, filters.cleaned_data if valid else {}, user)
+        rows = heapq.merge(page, occurrences, key=recurrence.sort_key)
+    # Fragment cache I/O and rendering are blocking
+    event_rows = await sync_to_async(fragments.render_event_rows)(rows, roles)
+    response = TemplateResponse(request, "events/event_list.html", {
+        "events": page,
+        "event_rows": event_rows,
+        "page": page,
+        "filters": filters,
+    })
+    return conditional.set_validators(response, user, etag)
 
 @login_required
+@limit_image_uploads
 def create_event(request):
     if request.method == 'POST':
         form = EventForm(request.POST, request.FILES)
@@ -237,6 +374,7 @@ def update_event(request, id):
     form = EventForm(request.POST or None, instance=event)
     if form.is_valid():
         form.save()
+        rsvp.promote_waitlist(event)
         return redirect('event-list')
     return render(request, "events/event_form.html", {"form": form, "title": "Edit Event"})
 
@@ -247,6 +385,347 @@ def delete_event(request, id):
     event.delete()
     return redirect('event-list')
 
+# Recurring series
+@login_required
+@user_passes_test(is_admin_or_organizer)
+def create_series(request):
+    form = EventSeriesForm(request.POST or None)
+    if form.is_valid():
+        form.save()
+        return redirect('event-list')
+    return render(request, "events/event_form.html", {"form": form, "title": "Create Recurring Event"})
+
+@login_required
+@user_passes_test(is_admin_or_organizer)
+def update_series(request, id):
+    series = get_object_or_404(EventSeries, id=id)
+    form = EventSeriesForm(request.POST or None, instance=series)
+    if form.is_valid():
+        form.save()
+        return redirect('event-list')
+    return render(request, "events/event_form.html", {
+        "form": form, "title": "Edit Recurring Event",
+        "delete_url": reverse('series-delete', args=[series.id]),
+    })
+
+@login_required
+@user_passes_test(is_admin_or_organizer)
+@require_http_methods(["POST"])
+def delete_series(request, id):
+    get_object_or_404(EventSeries, id=id).delete()
+    return redirect('event-list')
+
+def series_date_or_404(series, day):
+    """The date in an occurrence URL, if the series' rule produces it."""
+    try:
+        day = date.fromisoformat(day)
+    except ValueError:
+        raise Http404("No such date.")
+    if not recurrence.is_occurrence(series, day):
+        raise Http404("The series doesn't take place on that date.")
+    return day
+
+@login_required
+@user_passes_test(is_admin_or_organizer)
+def update_occurrence(request, series_id, day):
+    series = get_object_or_404(EventSeries, id=series_id)
+    day = series_date_or_404(series, day)
+    occurrence = Occurrence.objects.filter(series=series, date=day).first() or Occurrence(series=series, date=day)
+    form = OccurrenceForm(request.POST or None, instance=occurrence)
+    if form.is_valid():
+        occurrence = form.save(commit=False)
+        # Only exceptions and dates with RSVPs are stored
+        if occurrence.is_exception or occurrence.rsvp_count:
+            occurrence.save()
+        elif occurrence.pk:
+            occurrence.delete()
+        return redirect('event-list')
+    return render(request, "events/event_form.html", {"form": form, "title": f"{series.name} on {day}"})
+
+# Roster management
+ROSTER_PAGE_SIZE = 50
+WAITLIST_ORDERING = ('created_at', 'id')
+
+def selected_ids(request, name='users'):
+    return [int(value) for value in request.POST.getlist(name) if value.isdigit()]
+
+def roster_result_message(request, admitted, waitlisted):
+    if admitted:
+        messages.success(request, f"Added {len(admitted)} attendee(s).")
+    if waitlisted:
+        messages.info(request, f"The event is full: {len(waitlisted)} user(s) joined the waitlist.")
+    if not admitted and not waitlisted:
+        messages.warning(request, "Everyone selected is already attending.")
+
+@login_required
+@user_passes_test(is_admin_or_organizer)
+def event_roster(request, id):
+    event = get_object_or_404(Event.objects.select_related('category'), id=id)
+    add_form = RosterAddForm()
+    move_form = RosterMoveForm(event=event)
+
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'add':
+            add_form = RosterAddForm(request.POST)
+            if add_form.is_valid():
+                roster_result_message(request, *rsvp.bulk_add(event, add_form.cleaned_data['users']))
+                return redirect('event-roster', id=event.id)
+        elif action == 'remove':
+            removed = rsvp.bulk_remove(event, selected_ids(request))
+            messages.success(request, f"Removed {len(removed)} attendee(s).")
+            return redirect('event-roster', id=event.id)
+        elif action == 'move':
+            move_form = RosterMoveForm(request.POST, event=event)
+            if move_form.is_valid():
+                roster_result_message(request, *rsvp.move(event, move_form.cleaned_data['target'], selected_ids(request)))
+                return redirect('event-roster', id=event.id)
+        else:
+            return HttpResponseBadRequest("Unknown roster action.")
+
+    attendees = User.objects.filter(rsvp_events=event).only('username', 'first_name', 'last_name', 'email')
+    paginator = CursorPaginator(attendees, PARTICIPANT_DIRECTORY_ORDERING, page_size=ROSTER_PAGE_SIZE)
+    page = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+    waitlist = WaitlistEntry.objects.filter(event=event)
+    waitlist_page = CursorPaginator(
+        waitlist.select_related('user'), WAITLIST_ORDERING, page_size=ROSTER_PAGE_SIZE,
+    ).get_page(after=request.GET.get('waitlist_after'), before=request.GET.get('waitlist_before'))
+
+    return render(request, 'events/event_roster.html', {
+        'event': event,
+        'attendees': page,
+        'page': page,
+        'waitlist': waitlist_page,
+        'waitlist_total': waitlist.count(),
+        'add_form': add_form,
+        'move_form': move_form,
+    })
+
+# Roster exports
+def roster_export_response(request, default_columns, filename, event_id=None):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return HttpResponseBadRequest("Unsupported format. Use csv or ndjson.")
+    try:
+        columns = exports.parse_columns(request.GET.get('columns'), default_columns)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    dates = EventFilterForm(request.GET)
+    if not dates.is_valid():
+        return HttpResponseBadRequest("Invalid date range.")
+    rows = exports.roster_rows(
+        columns,
+        event_id=event_id,
+        date_from=dates.cleaned_data['date_from'],
+        date_to=dates.cleaned_data['date_to'],
+    )
+    response = StreamingHttpResponse(exports.stream_export(fmt, columns, rows), content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+@login_required
+@user_passes_test(is_admin_or_organizer)
+def export_event_attendees(request, event_id):
+    event = get_object_or_404(Event, id=event_id)
+    return roster_export_response(request, exports.ATTENDEE_COLUMNS, f"event-{event.id}-attendees", event_id=event.id)
+
+@login_required
+@user_passes_test(is_admin_or_organizer)
+def export_roster(request):
+    return roster_export_response(request, exports.ROSTER_COLUMNS, "rsvp-roster")
+
+# JSON API (read-only)
+def api_error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+def api_page(request, resource, queryset):
+    """
+    Stream one page of ``queryset``: ``?fields=`` picks the fields,
+    ``?limit=`` and ``?cursor=`` page through it, and ``?updated_since=``
+    returns only rows changed after that time, oldest change first.
+    """
+    params = api.ApiQueryForm(request.GET)
+    if not params.is_valid():
+        return api_error(params.errors.as_text())
+    try:
+        names = resource.parse_fields(params.cleaned_data['fields'])
+    except ValueError as exc:
+        return api_error(str(exc))
+
+    ordering = resource.ordering
+    updated_since = params.cleaned_data['updated_since']
+    if updated_since is not None:
+        queryset = queryset.filter(**{f'{resource.changed_field}__gt': updated_since})
+        ordering = resource.sync_ordering
+    cursor = params.cleaned_data['cursor']
+    try:
+        cursor_values = api.decode_cursor(resource.model, ordering, cursor) if cursor else None
+    except ValueError as exc:
+        return api_error(str(exc))
+
+    limit = params.cleaned_data['limit'] or api.API_PAGE_SIZE
+    rows, columns = api.page_rows(resource, queryset, names, ordering, cursor_values, limit)
+    return StreamingHttpResponse(
+        api.stream_page(resource, rows, columns, names, ordering, limit), content_type='application/json')
+
+def api_login_required(view_func):
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return api_error("Authentication required.", status=401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+@replica_reads
+@api_login_required
+@require_http_methods(["GET", "HEAD"])
+def api_events(request):
+    events = Event.objects.all()
+    category = request.GET.get('category')
+    if category:
+        if not category.isdigit():
+            return api_error("category must be an id.")
+        events = events.filter(category_id=category)
+    return api_page(request, api.EVENTS, events)
+
+@replica_reads
+@api_login_required
+@require_http_methods(["GET", "HEAD"])
+def api_categories(request):
+    return api_page(request, api.CATEGORIES, Category.objects.all())
+
+@replica_reads
+@api_login_required
+@require_http_methods(["GET", "HEAD"])
+def api_my_rsvps(request):
+    return api_page(request, api.EVENTS, Event.objects.filter(participants=request.user))
+
+def api_deletions(request, kind, user=None):
+    """
+    Tombstones for delta sync: ids removed from a collection after the
+    required ``?updated_since=``. 410 once that is past the retention
+    window, when the client has to fetch the collection in full.
+    """
+    since = api.ApiQueryForm(request.GET)
+    if not since.is_valid() or since.cleaned_data['updated_since'] is None:
+        return api_error("updated_since is required.")
+    if since.cleaned_data['updated_since'] < now() - timedelta(days=api.API_DELETION_RETENTION_DAYS):
+        return api_error("Deletions this old are no longer kept; fetch the collection in full.", status=410)
+    deletions = Deletion.objects.filter(kind=kind, user=user)
+    return api_page(request, api.DELETIONS, deletions)
+
+@replica_reads
+@api_login_required
+@require_http_methods(["GET", "HEAD"])
+def api_deleted_events(request):
+    return api_deletions(request, Deletion.EVENT)
+
+@replica_reads
+@api_login_required
+@require_http_methods(["GET", "HEAD"])
+def api_deleted_categories(request):
+    return api_deletions(request, Deletion.CATEGORY)
+
+@replica_reads
+@api_login_required
+@require_http_methods(["GET", "HEAD"])
+def api_my_cancelled_rsvps(request):
+    # A deleted event is only in the events' tombstones
+    return api_deletions(request, Deletion.RSVP, request.user)
+
+# Calendar feeds
+def calendar_response(request, name, events, etag, last_modified):
+    # Calendar clients poll: an unchanged feed is answered from the
+    # validators alone, before any event row is read
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(
+            feeds.stream_calendar(name, events, request.get_host()), content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+@replica_reads
+def user_calendar_feed(request, token):
+    user_id = feeds.user_id_for_token(token)
+    feed = feeds.user_feed(user_id) if user_id is not None else None
+    if feed is None:
+        raise Http404("No such calendar.")
+    etag, last_modified = feeds.validators(
+        f'user-{user_id}', feed['total'], feed['event_changed'], feed['category_changed'])
+    events = Event.objects.filter(participants=user_id)
+    response = calendar_response(request, f"{feed['username']}'s events", events, etag, last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@replica_reads
+def category_calendar_feed(request, id):
+    feed = feeds.category_feed(id)
+    if feed is None:
+        raise Http404("No such category.")
+    etag, last_modified = feeds.validators(
+        f'category-{id}', feed['total'], feed['updated_at'], feed['event_changed'])
+    events = Event.objects.filter(category_id=id)
+    response = calendar_response(request, feed['name'], events, etag, last_modified)
+    patch_cache_control(response, public=True, max_age=feeds.FEED_MAX_AGE)
+    return response
+
+# Media files
+@require_http_methods(['GET', 'HEAD'])
+def media_file(request, path):
+    """
+    Event and profile images and their variants, with validators, long
+    cache lifetimes and single byte ranges. Metadata comes from the cache,
+    so a request for an unchanged image neither stats the file nor touches
+    the database; with ``MEDIA_SENDFILE`` set the body is left to the
+    front-end server.
+    """
+    meta = media.get_metadata(path)
+    if meta is None:
+        raise Http404("No such file.")
+    size, mtime, content_type = meta
+    etag = media.etag(size, mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if response is not None:
+        return media.set_cache_headers(response, size, mtime)
+
+    file_path = media.file_path(path)
+    response = media.sendfile_response(path, file_path, content_type)
+    if response is not None:
+        return media.set_cache_headers(response, size, mtime)
+
+    try:
+        handle = open(file_path, 'rb')
+    except FileNotFoundError:
+        # Deleted since its metadata was cached
+        media.invalidate([path])
+        raise Http404("No such file.")
+    size, mtime, content_type = media.refresh_metadata(path, handle, meta)
+    etag = media.etag(size, mtime)
+
+    # A range only applies to the copy the client already has part of
+    if_range = request.META.get('HTTP_IF_RANGE')
+    byte_range = None
+    if not if_range or if_range in (etag, http_date(mtime)):
+        byte_range = media.parse_range(request.META.get('HTTP_RANGE'), size)
+    if byte_range is False:
+        handle.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return media.set_cache_headers(response, size, mtime)
+
+    if byte_range is None:
+        response = FileResponse(handle, content_type=content_type)
+        del response['Content-Disposition']
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(media.read_range(handle, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    return media.set_cache_headers(response, size, mtime)
+
 # Category Views
 @login_required
 def category_list(request):
@@ -278,6 +757,28 @@ def delete_category(request, id):
     return redirect('category-list')
 
 # Participant Views
+PARTICIPANT_DIRECTORY_PAGE_SIZE = 50
+PARTICIPANT_DIRECTORY_ORDERING = ('username', 'id')
+PARTICIPANT_EVENTS_PAGE_SIZE = 20
+
+def annotate_participants(queryset):
+    RSVP = Event.participants.through
+    rsvps = RSVP.objects.filter(customuser_id=OuterRef('pk')).order_by().values('customuser_id')
+    upcoming = Event.objects.filter(
+        participants=OuterRef('pk'), date__gte=now().date(),
+    ).order_by(*EVENT_LIST_ORDERING)
+    return queryset.annotate(
+        rsvp_total=Coalesce(Subquery(rsvps.annotate(total=Count('*')).values('total')), 0),
+        next_event_name=Subquery(upcoming.values('name')[:1]),
+        next_event_date=Subquery(upcoming.values('date')[:1]),
+    )
+
+def participant_directory_page(request):
+    participants = annotate_participants(User.objects.filter(is_participant_member=True))
+    paginator = CursorPaginator(participants, PARTICIPANT_DIRECTORY_ORDERING, page_size=PARTICIPANT_DIRECTORY_PAGE_SIZE)
+    return paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+@replica_reads
 @login_required
 def participant_list(request):
     user = request.user
@@ -287,14 +788,28 @@ def participant_list(request):
     if is_participant(user):
         return redirect('participant-participants-list')
 
-    participants = User.objects.filter(groups__name='Participant').order_by('username')
+    page = participant_directory_page(request)
     is_admin_flag = is_admin(user)
 
     return render(request, 'events/participant_list.html', {
-        'participants': participants,
+        'participants': page,
+        'page': page,
         'is_admin': is_admin_flag,
     })
 
+@replica_reads
+@login_required
+@user_passes_test(is_admin_or_organizer_or_participant)
+def participant_events_fragment(request, id):
+    participant = get_object_or_404(User, id=id)
+    events = Event.objects.filter(participants=participant).select_related('category')
+    paginator = CursorPaginator(events, EVENT_LIST_ORDERING, page_size=PARTICIPANT_EVENTS_PAGE_SIZE)
+    page = paginator.get_page(after=request.GET.get('after'))
+    return render(request, 'events/partials/participant_events.html', {
+        'participant': participant,
+        'page': page,
+    })
+
 @login_required
 @user_passes_test(is_admin)
 def participant_add(request):
@@ -322,6 +837,22 @@ def participant_add(request):
 
     return render(request, 'events/participant_add.html')
 
+@login_required
+@user_passes_test(is_admin)
+def participant_import(request):
+    result = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, "Please choose a CSV file to import.")
+        else:
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            result = import_participants(stream)
+            if result.created:
+                messages.success(request, f"Imported {result.created} participants.")
+
+    return render(request, 'events/participant_import.html', {'result': result})
+
 @login_required
 @user_passes_test(is_admin)
 def participant_detail(request, id):
@@ -341,13 +872,7 @@ def participant_detail(request, id):
         participant.save()
 
         selected_groups = request.POST.getlist('groups')
-        participant.groups.clear()
-        for group_id in selected_groups:
-            try:
-                group = Group.objects.get(id=group_id)
-                participant.groups.add(group)
-            except Group.DoesNotExist:
-                pass
+        participant.groups.set(Group.objects.filter(id__in=[g for g in selected_groups if g.isdigit()]))
 
         messages.success(request, "User updated successfully!")
         return redirect('participant-detail', id=participant.id)
@@ -383,13 +908,7 @@ def participant_edit(request, id):
                 participant.last_name = last_name
                 participant.save()
 
-                participant.groups.clear()
-                for group_id in selected_groups:
-                    try:
-                        group = Group.objects.get(id=group_id)
-                        participant.groups.add(group)
-                    except Group.DoesNotExist:
-                        pass
+                participant.groups.set(Group.objects.filter(id__in=[g for g in selected_groups if g.isdigit()]))
 
                 messages.success(request, "Participant updated successfully!")
                 return redirect('participant-list')
@@ -444,56 +963,124 @@ def delete_group(request, id):
     return redirect('group-list')
 
 # User list for admins only
+USER_LIST_PAGE_SIZE = 50
+USER_LIST_ORDERING = ('username', 'id')
+USER_ROLE_FILTERS = {
+    'admin': {'is_superuser': True},
+    'organizer': {'is_organizer_member': True},
+    'participant': {'is_participant_member': True},
+}
+
+@replica_reads
 @login_required
 @user_passes_test(is_admin)
 def user_list(request):
-    role_filter = request.GET.get('role', 'all')
-    roles = ['Admin', 'Organizer', 'Participant']
-
-    if role_filter == 'admin':
-        users = User.objects.filter(is_superuser=True)
-    elif role_filter == 'organizer':
-        users = User.objects.filter(groups__name='Organizer')
-    elif role_filter == 'participant':
-        users = User.objects.filter(groups__name='Participant')
-    else:
-        users = User.objects.all()
-
-    users = users.prefetch_related('groups').order_by('username')
+    filters = UserFilterForm(request.GET or None)
+    role_filter, query = 'all', ''
+    if filters.is_valid():
+        role_filter = filters.cleaned_data['role'] or 'all'
+        query = filters.cleaned_data['q']
+
+    # Role and prefix filters hit the user table's own indexes; no join
+    # through the groups table, so no duplicate rows either
+    users = User.objects.filter(**USER_ROLE_FILTERS.get(role_filter, {}))
+    if query:
+        users = users.filter(Q(username__startswith=query) | Q(email__startswith=query))
+    users = users.prefetch_related('groups')
+    paginator = CursorPaginator(users, USER_LIST_ORDERING, page_size=USER_LIST_PAGE_SIZE)
+    page = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
 
     context = {
-        'users': users,
+        'users': page,
+        'page': page,
+        'filters': filters,
+        'group_form': GroupAssignForm(),
         'role_filter': role_filter,
-        'roles': roles,
     }
     return render(request, 'events/user_list.html', context)
 
-# RSVP
 @login_required
-@user_passes_test(is_participant)
-def rsvp_event(request, event_id):
-    event = get_object_or_404(Event, id=event_id)
-
-    if request.user in event.participants.all():
-        messages.warning(request, "You have already RSVPed for this event!")
+@user_passes_test(is_admin)
+@require_http_methods(["POST"])
+def user_groups_assign(request):
+    form = GroupAssignForm(request.POST)
+    user_ids = selected_ids(request)
+    if not form.is_valid() or not user_ids:
+        messages.error(request, "Choose a group and at least one user.")
     else:
-        event.participants.add(request.user)
-        messages.success(request, "You have successfully RSVPed for this event!")
+        group = form.cleaned_data['group']
+        if form.cleaned_data['action'] == 'add':
+            assign_groups(user_ids, add=[group])
+            messages.success(request, f"Added {len(user_ids)} user(s) to {group.name}.")
+        else:
+            assign_groups(user_ids, remove=[group])
+            messages.success(request, f"Removed {len(user_ids)} user(s) from {group.name}.")
+    return redirect('user-list')
 
+# RSVP
+RSVP_MESSAGES = {
+    rsvp.RSVPED: (messages.SUCCESS, "You have successfully RSVPed for this event!"),
+    rsvp.ALREADY_RSVPED: (messages.WARNING, "You have already RSVPed for this event!"),
+    rsvp.WAITLISTED: (messages.INFO, "This event is full. You have been added to the waitlist."),
+    rsvp.ALREADY_WAITLISTED: (messages.WARNING, "You are already on the waitlist for this event."),
+    rsvp.CANCELLED: (messages.SUCCESS, "Your RSVP has been cancelled."),
+    rsvp.LEFT_WAITLIST: (messages.SUCCESS, "You have left the waitlist."),
+    rsvp.NOT_RSVPED: (messages.WARNING, "You have not RSVPed for this event."),
+}
+
+@login_required
+@user_passes_test(is_participant)
+async def rsvp_event(request, event_id):
+    event = await aget_object_or_404(Event, id=event_id)
+    # The RSVP service runs its own transactions, which need a sync thread
+    outcome = await sync_to_async(rsvp.rsvp)(event, await request.auser())
+    level, message = RSVP_MESSAGES[outcome]
+    messages.add_message(request, level, message)
     return redirect('event-list')
 
 @login_required
-def cancel_rsvp(request, event_id):
-    event = get_object_or_404(Event, id=event_id)
+async def cancel_rsvp(request, event_id):
+    event = await aget_object_or_404(Event, id=event_id)
+    level, message = RSVP_MESSAGES[await sync_to_async(rsvp.cancel)(event, await request.auser())]
+    messages.add_message(request, level, message)
+    return redirect('event-list')
 
-    if request.user in event.participants.all():
-        event.participants.remove(request.user)
-        messages.success(request, "Your RSVP has been cancelled.")
-    else:
-        messages.warning(request, "You have not RSVPed for this event.")
+OCCURRENCE_MESSAGES = {
+    **RSVP_MESSAGES,
+    rsvp.OCCURRENCE_FULL: (messages.WARNING, "This date is full."),
+    rsvp.OCCURRENCE_CANCELLED: (messages.WARNING, "This date has been cancelled."),
+}
+
+@login_required
+@user_passes_test(is_participant)
+@require_http_methods(["POST"])
+def rsvp_occurrence(request, series_id, day):
+    series = get_object_or_404(EventSeries, id=series_id)
+    level, message = OCCURRENCE_MESSAGES[rsvp.rsvp_occurrence(series, series_date_or_404(series, day), request.user)]
+    messages.add_message(request, level, message)
+    return redirect('event-list')
 
+@login_required
+@require_http_methods(["POST"])
+def cancel_occurrence_rsvp(request, series_id, day):
+    series = get_object_or_404(EventSeries, id=series_id)
+    level, message = OCCURRENCE_MESSAGES[rsvp.cancel_occurrence(series, series_date_or_404(series, day), request.user)]
+    messages.add_message(request, level, message)
     return redirect('event-list')
 
+# Prometheus scrape endpoint: the login throttle's counters, plus the
+# RequestMetricsMiddleware histograms when REQUEST_METRICS is on
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = (
+        request.headers.get('Authorization') == f'Bearer {token}' if token
+        else request.user.is_authenticated and is_admin(request.user)
+    )
+    if not authorized:
+        return HttpResponse(status=403)
+    body = metrics.registry.render(requests=getattr(settings, 'REQUEST_METRICS', False))
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Restriction
 def access_restricted(request):
     return render(request, "events/access_restricted.html")
@@ -505,6 +1092,7 @@ class ProfileView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         user = self.request.user
         context['profile_image'] = user.profile_image
+        context['profile_image_variants'] = user.profile_image_variants
         context['name'] = user.get_full_name() or user.username
         context['email'] = user.email
         context['phone_number'] = user.phone_number
@@ -513,6 +1101,7 @@ class ProfileView(LoginRequiredMixin, TemplateView):
         context['last_login'] = user.last_login
         return context
     
+@method_decorator(limit_image_uploads, name='dispatch')
 class EditProfileView(LoginRequiredMixin, UpdateView):
     model = CustomUser
     form_class = EditProfileForm
@@ -527,6 +1116,7 @@ class CustomPasswordChangeView(LoginRequiredMixin, PasswordChangeView):
     template_name = 'accounts/change_password.html'
     success_url = reverse_lazy('profile')
 
+@method_decorator(rate_limited('password_reset'), name='post')
 class CustomPasswordResetView(PasswordResetView):
     template_name = 'accounts/reset_password.html'
     email_template_name = 'accounts/password_reset_email.html'
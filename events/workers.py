@@ -0,0 +1,11 @@
+import os
+
+import django
+
+# Kept free of model imports: spawned pool workers unpickle ``setup_worker`` before
+# the app registry exists.
+
+
+def setup_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()